@@ -0,0 +1,79 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Callable, Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    個別に投入された要素を動的なマイクロバッチにまとめて fn に渡す。
+    最初の要素が届いてから max_wait 秒、または max_batch_size 件に達した時点でバッチを確定する。
+    fn (同期・CPUバウンド) は executor 上で実行し、イベントループをブロックしない。
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[T]], List[R]],
+        max_batch_size: int,
+        max_wait: float,
+        executor: Optional[Executor] = None,
+    ):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.executor = executor
+        self._queue: "asyncio.Queue[Tuple[T, asyncio.Future]]" = asyncio.Queue()
+        self._runner: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    async def submit(self, item: T) -> R:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[T, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.fn, items)
+                if len(results) != len(items):
+                    # zip で対応付けるため、件数が違うと一部の future が完了しないまま残る
+                    raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
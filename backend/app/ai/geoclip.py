@@ -0,0 +1,84 @@
+from typing import List, Protocol, Tuple
+
+from PIL import Image
+
+# (緯度, 経度, 確率)
+Prediction = Tuple[float, float, float]
+
+# GeoCLIP の画像エンコーダ (CLIP ViT) の入力サイズ
+INPUT_SIZE = 224
+
+
+class GeoLocator(Protocol):
+    def predict(self, images: List[Image.Image], top_k: int) -> List[List[Prediction]]:
+        ...
+
+
+def configure_torch_threads(num_threads: int) -> None:
+    """
+    推論のスレッド数を設定する。
+    ワーカー1プロセスで1つのバッチを処理するため、intra-op のみ並列化し inter-op は1にする。
+    """
+    import torch
+
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # 既に並列処理が始まっている場合は変更できない
+        pass
+
+
+def load_image(data: bytes) -> Image.Image:
+    """モデル入力用に画像を読み込む (JPEG は draft() で縮小デコード)"""
+    from io import BytesIO
+    from PIL import ImageOps
+
+    img = Image.open(BytesIO(data))
+    img.draft("RGB", (INPUT_SIZE * 2, INPUT_SIZE * 2))
+    img = ImageOps.exif_transpose(img)
+    return img.convert("RGB")
+
+
+class GeoCLIPLocator:
+    """
+    GeoCLIP によるバッチ推論。
+    GPS ギャラリー (候補座標) の特徴量はロード時に1度だけ計算し、
+    推論時は画像特徴量との内積だけで確率を求める。
+    """
+
+    def __init__(self, quantize: bool = False):
+        import torch
+        import torch.nn.functional as F
+        from geoclip import GeoCLIP
+
+        model = GeoCLIP()
+        model.eval()
+        if quantize:
+            # Linear 層を int8 の動的量子化に置き換える (CPU推論の高速化・省メモリ)
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+        with torch.inference_mode():
+            self._gallery = model.gps_gallery
+            self._location_features = F.normalize(model.location_encoder(self._gallery), dim=1)
+            self._logit_scale = model.logit_scale.exp()
+        # 候補座標 (約10万件) の Python のリストへの変換は重いため、推論ごとではなくロード時に1度だけ行う
+        self._gallery_coords = self._gallery.tolist()
+        self._model = model
+
+    def predict(self, images: List[Image.Image], top_k: int) -> List[List[Prediction]]:
+        import torch
+        import torch.nn.functional as F
+
+        with torch.inference_mode():
+            pixels = self._model.image_encoder.preprocess_image(images)
+            features = F.normalize(self._model.image_encoder(pixels), dim=1)
+            probs = (self._logit_scale * features @ self._location_features.T).softmax(dim=-1)
+            top = torch.topk(probs, top_k, dim=1)
+
+        gallery = self._gallery_coords
+        return [
+            [(gallery[i][0], gallery[i][1], p) for i, p in zip(indices, values)]
+            for indices, values in zip(top.indices.tolist(), top.values.tolist())
+        ]
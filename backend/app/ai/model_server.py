@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from app.ai.batcher import MicroBatcher
+from app.ai.geoclip import GeoLocator, Prediction
+
+logger = logging.getLogger(__name__)
+
+# GeoCLIP の推論サーバー (サイドカー) とクライアント。
+#
+# torch と GeoCLIP の重みはプロセスごとに数百MB〜1GB を占め、読み込みにも数秒〜数十秒かかる。
+# ワーカーを複数プロセス起動するとその分だけ増えるため、モデルは推論サーバー1プロセスにだけ
+# 読み込み、各ワーカーは RemoteLocator 経由でローカルソケット越しに推論を依頼する
+# (クライアント側は torch を import しない)。複数クライアントからの依頼は
+# サーバー側の MicroBatcher でまとめて推論する。
+#
+# アドレス: "/path/to.sock" (Unix ドメインソケット) または "host:port" (TCP)
+#
+# メッセージ: [u32 ヘッダー長][u32 本文長][ヘッダー (JSON)][本文] (ビッグエンディアン)
+#   predict 要求 : {"op": "predict", "top_k": k, "images": [[幅, 高さ], ...]} + RGB 画素を連結したもの
+#   predict 応答 : {"predictions": [[[緯度, 経度, 確率], ...], ...]}
+#   stats 要求   : {"op": "stats"} -> {"pid", "rss_bytes", "load_seconds", "requests", "images"}
+#   エラー       : {"error": "..."}
+
+_FRAME = struct.Struct(">II")
+
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    """プロセスの常駐メモリ (Linux の /proc を読む。取得できなければ自プロセスの最大値)"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _split_address(address: str) -> Tuple[Optional[str], Optional[int]]:
+    if "/" in address:
+        return None, None
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def encode_message(header: Dict[str, Any], body: bytes = b"") -> bytes:
+    head = json.dumps(header, separators=(",", ":")).encode()
+    return _FRAME.pack(len(head), len(body)) + head + body
+
+
+def encode_images(images: List[Image.Image]) -> Tuple[List[List[int]], bytes]:
+    sizes, chunks = [], []
+    for image in images:
+        image = image if image.mode == "RGB" else image.convert("RGB")
+        sizes.append(list(image.size))
+        chunks.append(image.tobytes())
+    return sizes, b"".join(chunks)
+
+
+def decode_images(sizes: List[List[int]], body: bytes) -> List[Image.Image]:
+    images, offset = [], 0
+    for width, height in sizes:
+        length = width * height * 3
+        images.append(Image.frombytes("RGB", (width, height), body[offset:offset + length]))
+        offset += length
+    return images
+
+
+# --- サーバー ---
+
+class ModelServer:
+    def __init__(self, locator: GeoLocator, max_batch_size: int, max_wait: float, load_seconds: float = 0.0):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="geoclip")
+        # 画像1枚ずつ投入し、接続をまたいでバッチにまとめる (top_k は最大値で推論して切り詰める)
+        self._top_k = 1
+        self.batcher: MicroBatcher = MicroBatcher(
+            lambda images: locator.predict(images, self._top_k),
+            max_batch_size=max_batch_size,
+            max_wait=max_wait,
+            executor=self._executor,
+        )
+        self.load_seconds = load_seconds
+        self.requests = 0
+        self.images = 0
+
+    async def _predict(self, header: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+        top_k = int(header["top_k"])
+        self._top_k = max(self._top_k, top_k)
+        images = await asyncio.to_thread(decode_images, header["images"], body)
+        results = await asyncio.gather(*(self.batcher.submit(image) for image in images))
+        self.requests += 1
+        self.images += len(images)
+        return {"predictions": [[list(p) for p in result[:top_k]] for result in results]}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "rss_bytes": rss_bytes(),
+            "load_seconds": self.load_seconds,
+            "requests": self.requests,
+            "images": self.images,
+        }
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    head_len, body_len = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+                except asyncio.IncompleteReadError:
+                    break
+                header = json.loads(await reader.readexactly(head_len))
+                body = await reader.readexactly(body_len)
+                try:
+                    if header.get("op") == "stats":
+                        reply = self.stats()
+                    elif header.get("op") == "predict":
+                        reply = await self._predict(header, body)
+                    else:
+                        reply = {"error": f"Unknown op: {header.get('op')}"}
+                except Exception as e:
+                    logger.exception("Prediction failed")
+                    reply = {"error": str(e)}
+                writer.write(encode_message(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # クライアントがタイムアウトなどで接続を閉じた (応答は捨てられる)
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, address: str) -> None:
+        host, port = _split_address(address)
+        if port is None:
+            if os.path.exists(address):
+                os.unlink(address)
+            server = await asyncio.start_unix_server(self.handle, path=address)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        self.batcher.start()
+        logger.info("GeoCLIP model server listening on %s (loaded in %.1fs)", address, self.load_seconds)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+            self._executor.shutdown(wait=False)
+
+
+# --- クライアント ---
+
+class RemoteLocator:
+    """
+    推論サーバーに依頼する GeoLocator。predict は同期 (ブロッキング) で、
+    GeolocationWorker の推論用スレッドから呼ばれる。接続は使い回し、切れたら1度だけ再接続する。
+    """
+
+    def __init__(self, address: str, timeout: float = 120.0):
+        self.address = address
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        host, port = _split_address(self.address)
+        if port is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.address)
+        else:
+            sock = socket.create_connection((host, port), timeout=self.timeout)
+        return sock
+
+    def _recv_exactly(self, n: int) -> bytes:
+        chunks, remaining = [], n
+        while remaining:
+            chunk = self._sock.recv(min(remaining, 1 << 20))
+            if not chunk:
+                raise ConnectionError("Model server closed the connection")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def _exchange(self, message: bytes) -> Dict[str, Any]:
+        """
+        要求を送り、応答を最後まで読む。途中で失敗した場合 (タイムアウトを含む) は接続を捨てる。
+        遅れて届いた応答が次の要求の応答として読まれ、別の画像の結果が返るのを防ぐため。
+        """
+        try:
+            if self._sock is None:
+                self._sock = self._connect()
+            self._sock.sendall(message)
+            head_len, body_len = _FRAME.unpack(self._recv_exactly(_FRAME.size))
+            header = json.loads(self._recv_exactly(head_len))
+            self._recv_exactly(body_len)
+            return header
+        except BaseException:
+            self.close()
+            raise
+
+    def _call(self, message: bytes) -> Dict[str, Any]:
+        with self._lock:
+            try:
+                header = self._exchange(message)
+            except ConnectionError:
+                # 使い回していた接続がサーバーの再起動などで切れていた場合は1度だけ再接続する
+                header = self._exchange(message)
+        if "error" in header:
+            raise RuntimeError(f"Model server error: {header['error']}")
+        return header
+
+    def predict(self, images: List[Image.Image], top_k: int) -> List[List[Prediction]]:
+        sizes, body = encode_images(images)
+        reply = self._call(encode_message({"op": "predict", "top_k": top_k, "images": sizes}, body))
+        predictions = reply["predictions"]
+        if len(predictions) != len(images):
+            # MicroBatcher は結果を件数で対応付けるため、件数が合わない応答は使わない
+            raise RuntimeError(f"Model server returned {len(predictions)} results for {len(images)} images")
+        return [[tuple(p) for p in result] for result in predictions]
+
+    def stats(self) -> Dict[str, Any]:
+        return self._call(encode_message({"op": "stats"}))
+
+    def wait_ready(self, timeout: float) -> Dict[str, Any]:
+        """サーバーが応答するまで待つ (モデルの読み込み中は接続できない)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.stats()
+            except OSError:
+                self.close()
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
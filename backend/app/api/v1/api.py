@@ -1,6 +1,6 @@
 #ルーターの集約場所
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, images, pin, tags
+from app.api.v1.endpoints import auth, images, pin, storage, tags, uploads
 
 api_router = APIRouter()
 
@@ -8,4 +8,6 @@ api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(images.router, prefix="/images", tags=["images"])
 api_router.include_router(pin.router, prefix="/pin", tags=["pin"])
-api_router.include_router(tags.router, prefix="/tags", tags=["tags"])
\ No newline at end of file
+api_router.include_router(tags.router, prefix="/tags", tags=["tags"])
+api_router.include_router(uploads.router, prefix="/uploads", tags=["uploads"])
+api_router.include_router(storage.router, prefix="/storage", tags=["storage"])
@@ -1,9 +1,14 @@
 from datetime import datetime
-from typing import List
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Path, Body
+from typing import List, Literal, Optional
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Path, Body, Request, Response
+from fastapi.responses import StreamingResponse
 from app.api import deps
+from app.core import response_cache
 from app.services import image_service
-from app.schemas.image import ImageResponse, ImageUpdate
+from app.schemas.image import (
+    BatchUploadResponse, BulkDeleteResponse, ImageFilter, ImageListResponse, ImageResponse, ImageUpdate, SimilarImageResponse,
+)
+from app.schemas.upload import DirectUploadComplete, DirectUploadCreate, DirectUploadTicket
 
 router = APIRouter()
 
@@ -13,29 +18,121 @@ router = APIRouter()
 # ------------------------------------------------------------------
 @router.post("", response_model=ImageResponse, status_code=201)
 async def create_image(
+    response: Response,
     file: UploadFile = File(...),
     current_user = Depends(deps.get_current_user)
 ):
     """
     画像ファイルを受け付け、ストレージに保存。
     GPS有無に応じてDBを作成 (location_status: EXIF_PRESENT or NO_GPS)
+    同じ内容の画像が登録済みの場合は保存せず、既存の画像を duplicate=true で返す (200)
     """
-    return await image_service.create_image(file, current_user.id)
+    image = await image_service.create_image(file, current_user.id)
+    if image.get("duplicate"):
+        response.status_code = 200
+    return image
+
+# ------------------------------------------------------------------
+# ①' 一括アップロード (F-02)
+# 設計: POST /api/v1/images/batch
+# ------------------------------------------------------------------
+@router.post("/batch", response_model=BatchUploadResponse)
+async def create_images_batch(
+    files: List[UploadFile] = File(...),
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    複数の画像ファイルをまとめて登録する（旅行の写真の一括取り込み用）
+    ファイルごとの結果を返し、一部が失敗しても他のファイルは登録される
+    """
+    return await image_service.create_images_batch(files, current_user.id)
+
+# ------------------------------------------------------------------
+# ①'' 直接アップロード (署名付きURL)
+# 設計: POST /api/v1/images/direct → upload_url へ PUT → POST /api/v1/images/direct/complete
+# ------------------------------------------------------------------
+@router.post("/direct", response_model=DirectUploadTicket, response_model_exclude_none=True)
+async def create_direct_upload(
+    upload_in: DirectUploadCreate,
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    元画像をストレージへ直接アップロードするための署名付きURLを発行する
+    (API サーバーは画像本文を中継しない)
+    """
+    return await image_service.create_direct_upload(
+        current_user.id, upload_in.filename, upload_in.size, upload_in.content_hash
+    )
+
+@router.post("/direct/complete", response_model=ImageResponse, status_code=201)
+async def complete_direct_upload(
+    complete_in: DirectUploadComplete,
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    アップロード済みのオブジェクトを画像として登録する (POST /images と同じレスポンス)
+    重複の検出はワーカーが後から行い、登録済みの画像と同じ内容であればこの画像を削除する
+    """
+    return await image_service.complete_direct_upload(current_user.id, complete_in.path)
 
 # ------------------------------------------------------------------
 # ② ギャラリー取得 (F-08)
 # 設計: GET /api/v1/images
 # ------------------------------------------------------------------
-@router.get("", response_model=List[ImageResponse])
+@router.get("", response_model=ImageListResponse)
 async def read_images(
+    request: Request,
+    response: Response,
     limit: int = Query(20, ge=1, le=100),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="前ページの next_cursor"),
+    embed: bool = Query(False, description="位置情報とタグを含めて返す"),
+    offset: int = Query(0, ge=0, deprecated=True, description="cursor を使用してください"),
+    taken_from: Optional[datetime] = Query(None, description="撮影日時の下限 (以上)"),
+    taken_to: Optional[datetime] = Query(None, description="撮影日時の上限 (未満)"),
+    tags: Optional[List[str]] = Query(None, description="タグ名 (複数指定可)"),
+    tag_mode: Literal["any", "all"] = Query("any", description="any: いずれかを含む / all: すべてを含む"),
+    favorite: Optional[bool] = Query(None, description="お気に入りで絞り込む"),
+    status: Optional[List[str]] = Query(None, description="location_status (複数指定可)"),
+    q: Optional[str] = Query(None, min_length=1, max_length=100, description="タイトル・コメント・地名の部分一致"),
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    登録済みの全画像を一覧取得（キーセットページネーション対応）
+    次ページは next_cursor を cursor に指定して取得する
+    絞り込み条件を指定した場合、位置情報とタグは常に含まれる
+    ETag 付きで返し、If-None-Match が一致すれば 304 を返す
+    """
+    filters = ImageFilter(
+        taken_from=taken_from,
+        taken_to=taken_to,
+        tags=tags,
+        tag_mode=tag_mode,
+        is_favorite=favorite,
+        statuses=status,
+        query=q,
+    )
+    page, etag = await response_cache.get_or_load(
+        "images", current_user.id,
+        {"limit": limit, "offset": offset, "cursor": cursor, "embed": embed, "filters": filters.model_dump(mode="json")},
+        lambda: image_service.get_images_list(current_user.id, limit, offset, cursor, embed, filters),
+    )
+    return response_cache.respond(request, response, page, etag)
+
+# ------------------------------------------------------------------
+# ②' ライブラリ全件エクスポート
+# 設計: GET /api/v1/images/export
+# ------------------------------------------------------------------
+@router.get("/export")
+async def export_images(
     current_user = Depends(deps.get_current_user)
 ):
     """
-    登録済みの全画像を一覧取得（ページネーション対応）
+    全画像を位置情報・タグ込みで NDJSON (1行1画像) としてストリーミングで返す
     """
-    return await image_service.get_images_list(current_user.id, limit, offset)
+    return StreamingResponse(
+        image_service.export_images_ndjson(current_user.id),
+        media_type="application/x-ndjson",
+    )
 
 # ------------------------------------------------------------------
 # ③ 詳細情報取得 (F-06)
@@ -43,13 +140,36 @@ async def read_images(
 # ------------------------------------------------------------------
 @router.get("/{id}", response_model=ImageResponse)
 async def read_image_detail(
+    request: Request,
+    response: Response,
     id: int = Path(..., title="The ID of the image to get"),
     current_user = Depends(deps.get_current_user)
 ):
     """
     特定の画像IDに基づき、詳細情報を取得
     """
-    return await image_service.get_image_detail(id, current_user.id)
+    image, etag = await response_cache.get_or_load(
+        "image", current_user.id, {"id": id},
+        lambda: image_service.get_image_detail(id, current_user.id),
+    )
+    return response_cache.respond(request, response, image, etag)
+
+# ------------------------------------------------------------------
+# ③' 似た画像 (知覚ハッシュ)
+# 設計: GET /api/v1/images/{id}/similar
+# ------------------------------------------------------------------
+@router.get("/{id}/similar", response_model=List[SimilarImageResponse])
+async def read_similar_images(
+    id: int,
+    max_distance: int = Query(8, ge=0, le=32, description="ハミング距離の上限 (64bit 中)"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    見た目が近い画像 (再圧縮・リサイズされた同じ写真など) を近い順に取得
+    知覚ハッシュ未計算の画像は対象外
+    """
+    return await image_service.get_similar_images(id, current_user.id, max_distance, limit)
 
 # ------------------------------------------------------------------
 # ④ 画像更新 (F-07)
@@ -65,7 +185,7 @@ async def update_image(
     画像のメタ情報（タイトル、コメント、お気に入り等）を更新
     ※ 今回はservice層に関数を作らずここでsupabaseを呼ぶ簡易実装例
     """
-    # 詳細情報を再取得して返す（locations情報なども含めるため）
+    # 更新後の詳細情報（locations・tags込み）を返す
     return await image_service.update_image_info(id, current_user.id, image_in)
 
 # ------------------------------------------------------------------
@@ -81,4 +201,19 @@ async def delete_image(
     画像データと関連DBレコードを削除
     """
     await image_service.delete_image(id, current_user.id)
-    return # 204 No Content
\ No newline at end of file
+    return # 204 No Content
+
+# ------------------------------------------------------------------
+# ⑤' 一括削除 (F-07)
+# 設計: DELETE /api/v1/images?ids=1&ids=2
+# ------------------------------------------------------------------
+@router.delete("", response_model=BulkDeleteResponse)
+async def delete_images(
+    ids: List[int] = Query(..., description="削除する画像ID (複数指定可)"),
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    複数の画像をまとめて削除し、削除できたIDを返す
+    ストレージ上のファイルはバックグラウンドで削除される
+    """
+    return {"deleted": await image_service.delete_images(ids, current_user.id)}
@@ -1,43 +1,97 @@
-from typing import List
-from fastapi import APIRouter, Query, Depends
+from typing import List, Optional, Tuple, Union
+from fastapi import APIRouter, Query, Depends, Request, Response
 from app.api import deps
-from app.db.supabase import supabase
-from app.schemas.pin import PinResponse
+from app.core import response_cache
+from app.core.config import settings
+from app.repositories import location_repository
+from app.schemas.pin import PinClusterResponse, PinResponse
+from app.services import pin_codec
 
 router = APIRouter()
 
-@router.get("/images", response_model=List[PinResponse])
+# 地図タイル1枚 (256px) あたりの経度幅は 360 / 2^zoom 度
+TILE_PX = 256
+
+def cluster_cell_deg(zoom: int) -> float:
+    """ズームレベルに応じたクラスタ1マスの大きさ (度)"""
+    return 360.0 / (2 ** zoom) * (settings.PIN_CLUSTER_CELL_PX / TILE_PX)
+
+def normalize_lon_range(min_lon: float, max_lon: float) -> Tuple[float, float]:
+    """
+    地図を横にスクロールすると ±180 を超える経度が来るため [-180, 180] に正規化する。
+    幅が360度以上なら全世界。正規化後に min_lon > max_lon なら180度線をまたぐ範囲。
+    """
+    if max_lon - min_lon >= 360:
+        return -180.0, 180.0
+    west = (min_lon + 180) % 360 - 180
+    east = (max_lon + 180) % 360 - 180
+    if east == -180:
+        east = 180.0
+    return west, east
+
+@router.get(
+    "/images",
+    response_model=List[Union[PinResponse, PinClusterResponse]],
+    responses={200: {"content": {pin_codec.COLUMNAR: {}, pin_codec.BINARY: {}}}},
+)
 async def get_map_pins(
+    request: Request,
+    response: Response,
     min_lat: float = Query(..., description="表示範囲の南端"),
     max_lat: float = Query(..., description="表示範囲の北端"),
     min_lon: float = Query(..., description="表示範囲の西端"),
     max_lon: float = Query(..., description="表示範囲の東端"),
+    include_ai: bool = Query(False, description="AI (GeoCLIP) の推定位置も含める"),
+    zoom: Optional[int] = Query(None, ge=0, le=22, description="地図のズームレベル。低ズームではクラスタを返す"),
     current_user = Depends(deps.get_current_user)
 ):
     """
     指定された地図範囲内にある画像ピンを取得する。
+    zoom が PIN_CLUSTER_MAX_ZOOM 未満の場合は、グリッド単位のクラスタ
+    (count, 重心, 代表サムネイル) を返す。
+
+    Accept に application/vnd.pinaly.pins+json (列形式 JSON) または
+    application/vnd.pinaly.pins (バイナリ) を指定すると、件数の多い範囲向けの
+    コンパクトな形式で返す (形式は app/services/pin_codec.py を参照)。
     """
-    # 範囲検索 + ユーザーフィルタ
-    res = supabase.table("locations")\
-        .select("latitude, longitude, images!inner(id, thumbnail_url, title, location_status, user_id)")\
-        .gte("latitude", min_lat)\
-        .lte("latitude", max_lat)\
-        .gte("longitude", min_lon)\
-        .lte("longitude", max_lon)\
-        .eq("images.user_id", current_user.id)\
-        .in_("images.location_status", ["EXIF_PRESENT", "CONFIRMED", "USER_MANUAL"])\
-        .execute()
-        
-    pins = []
-    for item in res.data:
-        img = item.get("images")
-        if img:
-            pins.append({
-                "id": img["id"],
-                "latitude": item["latitude"],
-                "longitude": item["longitude"],
-                "thumbnail_url": img["thumbnail_url"],
-                "title": img.get("title")
-            })
-            
-    return pins
\ No newline at end of file
+    statuses = ["EXIF_PRESENT", "CONFIRMED", "USER_MANUAL"]
+    if include_ai:
+        statuses.append("AI_PREDICTED")
+
+    min_lon, max_lon = normalize_lon_range(min_lon, max_lon)
+
+    async def load():
+        if zoom is not None and zoom < settings.PIN_CLUSTER_MAX_ZOOM:
+            return await location_repository.find_pin_clusters(
+                current_user.id, min_lat, max_lat, min_lon, max_lon,
+                cell_deg=cluster_cell_deg(zoom),
+                statuses=statuses,
+            )
+
+        # 範囲検索 + ユーザーフィルタ (SQL側で絞り込み済み)
+        # thumbnail_url は派生画像 (marker) があればそちらが返る
+        return await location_repository.find_pins_in_bbox(
+            current_user.id, min_lat, max_lat, min_lon, max_lon,
+            statuses=statuses,
+        )
+
+    # クラスタの大きさはズームで決まるため、個別ピンの範囲 (zoom >= PIN_CLUSTER_MAX_ZOOM) ではキーに含めない
+    cluster_zoom = zoom if zoom is not None and zoom < settings.PIN_CLUSTER_MAX_ZOOM else None
+    pins, etag = await response_cache.get_or_load(
+        "pins", current_user.id,
+        {"bbox": [min_lat, max_lat, min_lon, max_lon], "statuses": statuses, "zoom": cluster_zoom},
+        load,
+    )
+
+    media_type = pin_codec.negotiate(request.headers.get("accept"))
+    if media_type is None:
+        response.headers["Vary"] = "Accept"
+        return response_cache.respond(request, response, pins, etag)
+
+    # 形式ごとに別の表現なので ETag も区別する。行ごとのモデル検証は行わない
+    etag = f'{etag[:-1]}-{"bin" if media_type == pin_codec.BINARY else "col"}"'
+    headers = {"ETag": etag, "Cache-Control": response_cache.CACHE_CONTROL, "Vary": "Accept"}
+    if response_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    body = pin_codec.encode(pins, media_type, clusters=cluster_zoom is not None)
+    return Response(content=body, media_type=media_type, headers=headers)
@@ -0,0 +1,32 @@
+import jwt
+from fastapi import APIRouter, HTTPException, Request
+from app.core.config import settings
+from app.db import storage
+
+router = APIRouter()
+
+# ------------------------------------------------------------------
+# 署名付きアップロードURLの受け口 (STORAGE_BACKEND="local" の場合のみ)
+# 設計: PUT /api/v1/storage/upload/{token}
+# Supabase Storage の場合、クライアントは Supabase へ直接 PUT するためここは使われない
+# ------------------------------------------------------------------
+@router.put("/upload/{token}", status_code=200)
+async def upload_object(token: str, request: Request):
+    """
+    トークンが示すパスへリクエスト本文をそのまま保存する (認証はトークンの署名で行う)
+    """
+    if settings.STORAGE_BACKEND != "local":
+        raise HTTPException(status_code=404, detail="Not Found")
+    try:
+        bucket, path = storage.verify_local_upload_token(token)
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=403, detail="Invalid or expired upload token")
+
+    size = int(request.headers.get("content-length") or 0)
+    if size > settings.UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="File too large")
+    try:
+        await storage.upload_stream(bucket, path, request.stream(), size, request.headers.get("content-type"))
+    except FileExistsError:
+        raise HTTPException(status_code=409, detail="Object already exists")
+    return {"path": path}
@@ -1,17 +1,28 @@
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 from app.api import deps
-from app.db.supabase import supabase
-from app.schemas.tag import TagResponse
+from app.core import response_cache
+from app.schemas.tag import TagSuggestion
+from app.services import tag_service
 
 router = APIRouter()
 
-@router.get("", response_model=List[TagResponse])
+@router.get("", response_model=List[TagSuggestion], response_model_exclude_none=True)
 async def read_tags(
+    request: Request,
+    response: Response,
+    prefix: str = Query("", max_length=100, description="前方一致で絞り込む文字列"),
+    limit: int = Query(20, ge=1, le=100),
+    mine: bool = Query(False, description="自分が使用したタグのみ (使用回数の多い順)"),
     current_user = Depends(deps.get_current_user)
 ):
     """
-    登録されている全タグを取得する（入力補完用）
+    タグを前方一致で取得する（入力補完用）
+    DB ではなくメモリ上のインデックスから返す
     """
-    res = supabase.table("tags").select("*").order("name").execute()
-    return res.data
\ No newline at end of file
+    if mine:
+        tags = await tag_service.suggest_for_user(current_user.id, prefix, limit)
+    else:
+        tags = tag_service.suggest(prefix, limit)
+    # インデックス自体がキャッシュなので、ここでは ETag (304) だけを付ける
+    return response_cache.respond(request, response, tags, response_cache.make_etag(tags))
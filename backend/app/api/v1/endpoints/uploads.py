@@ -0,0 +1,87 @@
+from fastapi import APIRouter, Depends, Header, Request, Response
+from app.api import deps
+from app.schemas.image import ImageResponse
+from app.schemas.upload import UploadCreate, UploadStatus
+from app.services import resumable_upload_service
+
+router = APIRouter()
+
+# ------------------------------------------------------------------
+# 再開可能なアップロード (大きな写真・モバイル回線向け)
+# 1. POST   /api/v1/uploads                  セッション作成
+# 2. PUT    /api/v1/uploads/{id}             Upload-Offset ヘッダーの位置から続きを送信
+#    HEAD   /api/v1/uploads/{id}             途切れた場合は受信済みサイズを確認して再送
+# 3. POST   /api/v1/uploads/{id}/complete    画像として登録 (POST /images と同じ処理)
+# ------------------------------------------------------------------
+def _offset_headers(response: Response, status: dict) -> dict:
+    response.headers["Upload-Offset"] = str(status["offset"])
+    response.headers["Upload-Length"] = str(status["size"])
+    return status
+
+@router.post("", response_model=UploadStatus, status_code=201)
+async def create_upload(
+    upload_in: UploadCreate,
+    response: Response,
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    アップロードセッションを作成する
+    """
+    status = await resumable_upload_service.create_session(
+        current_user.id, upload_in.filename, upload_in.size, upload_in.content_type
+    )
+    return _offset_headers(response, status)
+
+@router.api_route("/{upload_id}", methods=["GET", "HEAD"], response_model=UploadStatus)
+async def read_upload(
+    upload_id: str,
+    response: Response,
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    受信済みサイズ (offset) を返す。Upload-Offset ヘッダーにも同じ値を入れる
+    """
+    status = await resumable_upload_service.get_status(upload_id, current_user.id)
+    return _offset_headers(response, status)
+
+@router.put("/{upload_id}", response_model=UploadStatus)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., ge=0),
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    リクエストボディをチャンクとして追記する
+    Upload-Offset が受信済みサイズと一致しない場合は 409
+    """
+    status = await resumable_upload_service.append_chunk(
+        upload_id, current_user.id, upload_offset, request.stream()
+    )
+    return _offset_headers(response, status)
+
+@router.post("/{upload_id}/complete", response_model=ImageResponse, status_code=201)
+async def complete_upload(
+    upload_id: str,
+    response: Response,
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    全体を受信済みであれば画像として登録する
+    同じ内容の画像が登録済みの場合は既存の画像を duplicate=true で返す (200)
+    """
+    image = await resumable_upload_service.complete(upload_id, current_user.id)
+    if image.get("duplicate"):
+        response.status_code = 200
+    return image
+
+@router.delete("/{upload_id}", status_code=204)
+async def abort_upload(
+    upload_id: str,
+    current_user = Depends(deps.get_current_user)
+):
+    """
+    アップロードを中止し、受信済みのデータを破棄する
+    """
+    await resumable_upload_service.abort(upload_id, current_user.id)
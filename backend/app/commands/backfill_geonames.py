@@ -0,0 +1,73 @@
+"""
+登録済みの位置 (EXIF / AI 推定) の地名 (locations.geoname) をオフラインの逆ジオコーディングで埋める。
+
+    python -m app.commands.backfill_geonames [--batch 1000] [--limit N] [--all]
+
+GEONAMES_PATH の都市データを読み込み、geoname が NULL の行を id 順にたどって
+最寄りの地名をまとめて設定する (1バッチにつき取得・更新の2往復)。
+最寄りの地点が GEONAMES_MAX_DISTANCE_KM より遠い行 (海上など) は NULL のまま残る。
+--all を指定すると設定済みの行も含めて付け直す (都市データを差し替えた場合など)。
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.db.supabase import close_db
+from app.repositories import location_repository
+from app.services import geoname_service
+
+
+async def backfill(batch: int, limit: int, all_rows: bool) -> None:
+    started = time.perf_counter()
+    geocoder = await asyncio.to_thread(geoname_service.get_geocoder)
+    print(
+        f"loaded {len(geocoder)} places from {settings.GEONAMES_PATH} "
+        f"({geocoder.nbytes / 2**20:.1f} MB, {time.perf_counter() - started:.1f}s)"
+    )
+
+    scanned = updated = 0
+    lookup_seconds = 0.0
+    last_id = 0
+    started = time.perf_counter()
+    try:
+        while not limit or scanned < limit:
+            size = batch if not limit else min(batch, limit - scanned)
+            rows = await location_repository.find_locations_after(last_id, size, missing_only=not all_rows)
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            scanned += len(rows)
+
+            lookup_started = time.perf_counter()
+            names = geocoder.lookup([row["latitude"] for row in rows], [row["longitude"] for row in rows])
+            lookup_seconds += time.perf_counter() - lookup_started
+
+            # 未設定の行だけを対象にする場合、地名が見つからなかった行は更新しない
+            pairs = [(row["id"], name) for row, name in zip(rows, names) if all_rows or name is not None]
+            if pairs:
+                ids, geonames = map(list, zip(*pairs))
+                updated += await location_repository.set_geonames(ids, geonames)
+
+            elapsed = time.perf_counter() - started
+            print(
+                f"scanned={scanned} updated={updated} ({scanned / elapsed:.0f} rows/sec, "
+                f"lookups {scanned / max(lookup_seconds, 1e-9):.0f}/sec)"
+            )
+    finally:
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=0, help="処理件数の上限 (0 = 全件)")
+    parser.add_argument("--all", action="store_true", help="geoname が設定済みの行も付け直す")
+    args = parser.parse_args()
+    if not settings.GEONAMES_PATH:
+        raise SystemExit("GEONAMES_PATH is not set")
+    asyncio.run(backfill(args.batch, args.limit, args.all))
+
+
+if __name__ == "__main__":
+    main()
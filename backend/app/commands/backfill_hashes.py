@@ -0,0 +1,94 @@
+"""
+既存画像の内容ハッシュ (重複検出用) と知覚ハッシュ (似た画像の検出用) を一括計算する。
+
+    python -m app.commands.backfill_hashes [--batch 100] [--concurrency 4] [--limit N] [--phash]
+
+images.content_hash が NULL の行 (--phash 指定時は phash が NULL の行も) を id 順にたどり、
+元画像をダウンロードしてハッシュを保存する。
+同じユーザーに同じ内容の画像が既にある行は一意制約で更新できないため、重複として報告する。
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+
+from app.core.config import settings
+from app.db import storage
+from app.db.supabase import close_db, get_db
+from app.repositories import image_repository
+from app.services import imaging
+
+
+async def _fetch_batch(after_id: int, batch: int, with_phash: bool):
+    query = get_db().table("images")\
+        .select("id, user_id, image_url, content_hash")\
+        .gt("id", after_id)
+    if with_phash:
+        query = query.or_("content_hash.is.null,phash.is.null")
+    else:
+        query = query.is_("content_hash", "null")
+    res = await query.order("id").limit(batch).execute()
+    return res.data
+
+
+def _hashes(data: bytes, with_phash: bool):
+    fields = {"content_hash": hashlib.sha256(data).hexdigest()}
+    if with_phash:
+        fields["phash"] = imaging.perceptual_hash(data)
+    return fields
+
+
+async def backfill(batch: int, concurrency: int, limit: int, with_phash: bool) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    done = failed = duplicates = 0
+    last_id = 0
+    started = time.perf_counter()
+
+    async def process(row) -> str:
+        path = storage.path_from_public_url(settings.STORAGE_BUCKET, row["image_url"])
+        if path is None:
+            print(f"skip id={row['id']}: unknown image_url {row['image_url']}")
+            return "failed"
+        async with semaphore:
+            try:
+                data = await storage.download(settings.STORAGE_BUCKET, path)
+                fields = await asyncio.to_thread(_hashes, data, with_phash)
+                await image_repository.update_image(row["id"], row["user_id"], fields)
+                return "done"
+            except Exception as e:
+                # 23505: 同じユーザーに同じ内容の画像が登録済み
+                if getattr(e, "code", None) == "23505":
+                    print(f"duplicate id={row['id']}: content_hash={fields['content_hash']}")
+                    return "duplicate"
+                print(f"failed id={row['id']}: {e}")
+                return "failed"
+
+    while not limit or done + failed + duplicates < limit:
+        size = batch if not limit else min(batch, limit - done - failed - duplicates)
+        rows = await _fetch_batch(last_id, size, with_phash)
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        results = await asyncio.gather(*(process(row) for row in rows))
+        done += results.count("done")
+        failed += results.count("failed")
+        duplicates += results.count("duplicate")
+        elapsed = time.perf_counter() - started
+        print(f"processed={done} duplicates={duplicates} failed={failed} ({done / elapsed:.1f} images/sec)")
+
+    await storage.close_storage()
+    await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=0, help="処理件数の上限 (0 = 全件)")
+    parser.add_argument("--phash", action="store_true", help="知覚ハッシュも計算する")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.batch, args.concurrency, args.limit, args.phash))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+既存画像のサムネイル (派生画像) を一括生成する。
+
+    python -m app.commands.backfill_thumbnails [--batch 100] [--concurrency 4] [--limit N]
+
+images.derivatives が NULL の行を id 順にたどり、元画像から派生画像を作成する。
+"""
+import argparse
+import asyncio
+import time
+
+from app.core.config import settings
+from app.db import storage
+from app.db.supabase import close_db, get_db
+from app.services import thumbnail_service
+
+
+async def _fetch_batch(after_id: int, batch: int):
+    res = await get_db().table("images")\
+        .select("id, user_id, image_url")\
+        .is_("derivatives", "null")\
+        .gt("id", after_id)\
+        .order("id")\
+        .limit(batch)\
+        .execute()
+    return res.data
+
+
+async def backfill(batch: int, concurrency: int, limit: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    done = failed = 0
+    last_id = 0
+    started = time.perf_counter()
+
+    async def process(row) -> bool:
+        path = storage.path_from_public_url(settings.STORAGE_BUCKET, row["image_url"])
+        if path is None:
+            print(f"skip id={row['id']}: unknown image_url {row['image_url']}")
+            return False
+        async with semaphore:
+            try:
+                await thumbnail_service.generate_thumbnails(row["id"], row["user_id"], settings.STORAGE_BUCKET, path)
+                return True
+            except Exception as e:
+                print(f"failed id={row['id']}: {e}")
+                return False
+
+    while not limit or done + failed < limit:
+        size = batch if not limit else min(batch, limit - done - failed)
+        rows = await _fetch_batch(last_id, size)
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+        results = await asyncio.gather(*(process(row) for row in rows))
+        done += sum(results)
+        failed += len(results) - sum(results)
+        elapsed = time.perf_counter() - started
+        print(f"processed={done} failed={failed} ({done / elapsed:.1f} images/sec)")
+
+    thumbnail_service.shutdown()
+    await storage.close_storage()
+    await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=0, help="処理件数の上限 (0 = 全件)")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.batch, args.concurrency, args.limit))
+
+
+if __name__ == "__main__":
+    main()
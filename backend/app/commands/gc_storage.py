@@ -0,0 +1,124 @@
+"""
+どの画像からも参照されていないストレージ上のオブジェクト (孤立オブジェクト) を削除する。
+
+    python -m app.commands.gc_storage [--page 1000] [--min-age-hours 24] [--dry-run]
+
+バケットをフォルダごとに名前順でページングしながら走査し、ページ単位で
+referenced_storage_keys (migrations/013_storage_gc.sql) に参照の有無を問い合わせて削除する。
+アップロード途中 (DB 登録前) のオブジェクトを消さないよう、更新から min-age-hours 未満のものは対象外。
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.db import storage
+from app.db.supabase import close_db
+from app.repositories import image_repository
+
+
+def storage_key(path: str) -> Optional[str]:
+    """
+    オブジェクトのパス -> 参照元の画像のキー (元画像のパスから拡張子を除いたもの)
+        USER_ID/UUID.jpg               -> USER_ID/UUID
+        USER_ID/thumbs/UUID_grid.webp  -> USER_ID/UUID
+    """
+    folder, _, filename = path.rpartition("/")
+    stem = filename.rsplit(".", 1)[0] if "." in filename else None
+    if not stem:
+        return None
+    if folder == "thumbs" or folder.endswith("/thumbs"):
+        folder = folder[: -len("thumbs")].rstrip("/")
+        stem = stem.rsplit("_", 1)[0]
+    return f"{folder}/{stem}" if folder else stem
+
+
+class GcStats:
+    def __init__(self):
+        self.scanned = 0
+        self.orphans = 0
+        self.reclaimed_bytes = 0
+        self.started = time.perf_counter()
+
+    def report(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        per_10k = elapsed / self.scanned * 10000 if self.scanned else 0.0
+        return (
+            f"scanned={self.scanned} orphans={self.orphans} "
+            f"reclaimed={self.reclaimed_bytes / 1024 / 1024:.1f}MB ({self.reclaimed_bytes} bytes) "
+            f"elapsed={elapsed:.1f}s ({per_10k:.2f}s per 10k objects)"
+        )
+
+
+async def _find_orphans(url_prefix: str, objects: List[Dict], cutoff: datetime) -> List[Dict]:
+    candidates = [
+        obj for obj in objects
+        if obj["key"] is not None and obj["updated_at"] is not None and obj["updated_at"] < cutoff
+    ]
+    if not candidates:
+        return []
+    referenced = set(await image_repository.find_referenced_storage_keys(
+        url_prefix, list({obj["key"] for obj in candidates})
+    ))
+    return [obj for obj in candidates if obj["key"] not in referenced]
+
+
+async def sweep(prefix: str, page: int, cutoff: datetime, dry_run: bool, stats: GcStats) -> None:
+    bucket = settings.STORAGE_BUCKET
+    url_prefix = storage.get_public_url(bucket, "")
+    offset = 0
+    while True:
+        entries = await storage.list_objects(bucket, prefix, page, offset)
+        objects = []
+        for entry in entries:
+            if entry["folder"]:
+                await sweep(f"{prefix}{entry['name']}/", page, cutoff, dry_run, stats)
+            else:
+                path = prefix + entry["name"]
+                objects.append({**entry, "path": path, "key": storage_key(path)})
+
+        orphans = await _find_orphans(url_prefix, objects, cutoff)
+        if orphans and not dry_run:
+            await storage.remove(bucket, [obj["path"] for obj in orphans])
+        stats.scanned += len(objects)
+        stats.orphans += len(orphans)
+        stats.reclaimed_bytes += sum(obj["size"] for obj in orphans)
+        if orphans:
+            print(f"{prefix or '/'} {stats.report()}")
+
+        if len(entries) < page:
+            break
+        # 削除した分だけ後ろの要素が前に詰まる
+        offset += len(entries) - (0 if dry_run else len(orphans))
+
+
+async def gc(page: int, min_age_hours: float, dry_run: bool) -> None:
+    stats = GcStats()
+    try:
+        url_prefix = storage.get_public_url(settings.STORAGE_BUCKET, "")
+        foreign = await image_repository.count_foreign_image_urls(url_prefix)
+        if foreign:
+            # 公開URLの形式 (ホスト・バケット) が変わっていると参照を判定できない
+            print(f"abort: {foreign} images have image_url outside {url_prefix}")
+            return
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=min_age_hours)
+        await sweep("", page, cutoff, dry_run, stats)
+        print(("[dry-run] " if dry_run else "") + "done " + stats.report())
+    finally:
+        await storage.close_storage()
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page", type=int, default=1000, help="1回の一覧取得・参照確認の件数")
+    parser.add_argument("--min-age-hours", type=float, default=24.0, help="これより新しいオブジェクトは削除しない")
+    parser.add_argument("--dry-run", action="store_true", help="削除せずに件数とサイズだけを表示する")
+    args = parser.parse_args()
+    asyncio.run(gc(args.page, args.min_age_hours, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
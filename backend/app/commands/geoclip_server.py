@@ -0,0 +1,42 @@
+"""
+GeoCLIP の推論サーバー (モデルを1プロセスにだけ読み込み、ワーカー間で共有する)。
+
+    python -m app.commands.geoclip_server [--address /tmp/pinaly-geoclip.sock]
+
+ワーカー側で GEOCLIP_SERVER_ADDRESS に同じアドレスを設定すると、
+geoclip_worker はモデルを読み込まずにこのサーバーへ推論を依頼する。
+複数のワーカーからの依頼は GEOCLIP_BATCH_SIZE / GEOCLIP_BATCH_TIMEOUT_MS でまとめて推論する。
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from app.ai.geoclip import GeoCLIPLocator, configure_torch_threads
+from app.ai.model_server import ModelServer
+from app.core.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--address", default=settings.GEOCLIP_SERVER_ADDRESS or "/tmp/pinaly-geoclip.sock",
+        help='待ち受けるアドレス ("/path/to.sock" または "host:port")',
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    configure_torch_threads(settings.GEOCLIP_NUM_THREADS)
+    locator = GeoCLIPLocator(quantize=settings.GEOCLIP_QUANTIZE)
+    server = ModelServer(
+        locator,
+        max_batch_size=settings.GEOCLIP_BATCH_SIZE,
+        max_wait=settings.GEOCLIP_BATCH_TIMEOUT_MS / 1000,
+        load_seconds=time.perf_counter() - started,
+    )
+    asyncio.run(server.serve(args.address))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+GPS情報のない画像 (location_status=NO_GPS) の撮影場所を GeoCLIP で推定するワーカー。
+
+    python -m app.commands.geoclip_worker [--once]
+
+推定結果は locations (source_type="AI", rank 1..k) に登録し、
+画像のステータスを AI_PREDICTED にする (地図では include_ai=true で表示)。
+GEOCLIP_SERVER_ADDRESS を設定した場合はモデルを読み込まず、推論サーバー
+(python -m app.commands.geoclip_server) に依頼する。
+"""
+import argparse
+import asyncio
+import logging
+
+from app.ai.geoclip import GeoCLIPLocator, configure_torch_threads
+from app.ai.model_server import RemoteLocator
+from app.core.config import settings
+from app.db.storage import close_storage
+from app.db.supabase import close_db
+from app.services.geolocation_service import GeolocationWorker
+
+
+async def _run(worker: GeolocationWorker, once: bool) -> None:
+    try:
+        if once:
+            worker.batcher.start()
+            processed = await worker.run_once()
+            await worker.batcher.stop()
+            print(f"processed={processed}")
+        else:
+            await worker.run_forever()
+    finally:
+        await close_storage()
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="待機中の画像を1回分だけ処理して終了する")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if settings.GEOCLIP_SERVER_ADDRESS:
+        locator = RemoteLocator(settings.GEOCLIP_SERVER_ADDRESS)
+    else:
+        configure_torch_threads(settings.GEOCLIP_NUM_THREADS)
+        locator = GeoCLIPLocator(quantize=settings.GEOCLIP_QUANTIZE)
+    asyncio.run(_run(GeolocationWorker(locator), args.once))
+
+
+if __name__ == "__main__":
+    main()
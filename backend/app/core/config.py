@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import Dict, List, Optional, Union
 from pydantic import AnyHttpUrl, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -15,7 +15,115 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
-    
+
+    # --- 認証 (アクセストークン検証) ---
+    # "remote": 毎回 supabase.auth.get_user で検証する
+    # "local" : SECRET_KEY (HS系) または JWKS (RS/ES系) で署名と有効期限をローカル検証し、
+    #           未知の kid・形式のトークンのみ Supabase に問い合わせる
+    AUTH_VERIFY_MODE: str = "remote"
+    AUTH_JWT_AUDIENCE: str = "authenticated"
+    # ローカル検証に成功したトークンのキャッシュ (remote モード・Supabase に問い合わせた結果はキャッシュしない)
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    AUTH_TOKEN_CACHE_TTL_SECONDS: int = 300
+    AUTH_JWKS_TTL_SECONDS: int = 600
+
+    # --- DB接続 (PostgREST / httpx コネクションプール) ---
+    DB_POOL_MAX_CONNECTIONS: int = 100
+    DB_POOL_MAX_KEEPALIVE: int = 20
+    DB_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    DB_TIMEOUT_SECONDS: float = 10.0
+
+    # --- アップロード / ストレージ ---
+    UPLOAD_MAX_BYTES: int = 30 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+    UPLOAD_PHASH_ENABLED: bool = False  # 知覚ハッシュ (似た画像の検出用) をアップロード時に計算する
+    # 再開可能アップロード (POST /uploads) の受信中データの置き場所 (空 = OS の一時ディレクトリ)
+    UPLOAD_SESSION_DIR: str = ""
+    UPLOAD_SESSION_TTL_SECONDS: int = 24 * 60 * 60
+
+    # --- ストレージ ---
+    STORAGE_BACKEND: str = "supabase"  # "supabase" / "local" (開発・テスト用)
+    STORAGE_BUCKET: str = "images"     # 元画像・派生画像を置くバケット
+    STORAGE_LOCAL_ROOT: str = "./storage"
+    # local の公開URL・署名付きURLの先頭 (API サーバー自身のURL)
+    STORAGE_PUBLIC_BASE_URL: str = "http://localhost:8000"
+    STORAGE_SIGNED_URL_TTL_SECONDS: int = 2 * 60 * 60
+    STORAGE_TIMEOUT_SECONDS: float = 60.0
+    STORAGE_REMOVE_BATCH_SIZE: int = 1000  # 1回の削除リクエストで送るパス数
+    IMAGE_DELETE_MAX_IDS: int = 1000       # DELETE /images で1回に指定できる画像数
+
+    # 一括アップロード: 1リクエストのファイル数・合計サイズ上限と、ストレージへの同時アップロード数
+    BATCH_UPLOAD_MAX_FILES: int = 500
+    BATCH_UPLOAD_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    BATCH_UPLOAD_CONCURRENCY: int = 8
+
+    # --- サムネイル (派生画像) ---
+    # 名前 -> 長辺ピクセル数。marker: 地図ピン, grid: ギャラリー, preview: 詳細表示
+    THUMBNAIL_SIZES: Dict[str, int] = {"marker": 96, "grid": 400, "preview": 1280}
+    THUMBNAIL_FORMAT: str = "WEBP"  # "WEBP" / "AVIF" (AVIF は Pillow が libavif 付きでビルドされている場合のみ)
+    THUMBNAIL_QUALITY: int = 80
+    THUMBNAIL_WORKERS: int = 0  # プロセスプールのワーカー数 (0 = CPUコア数)
+
+    # --- ギャラリー ---
+    EXPORT_PAGE_SIZE: int = 1000  # NDJSON エクスポートで1回に読む件数
+
+    # --- 読み取りキャッシュ (一覧・詳細・地図ピン・タグ) ---
+    # 既定 (None) は READ_CACHE_REDIS_URL を設定した場合のみ有効。
+    # プロセス内キャッシュは他のプロセス (ジョブワーカー・別の API ワーカー) での更新を検知できないため、
+    # True を明示するのは API を1プロセスで動かし、ワーカーも使わない場合 (開発環境など) に限ること
+    READ_CACHE_ENABLED: Optional[bool] = None
+    READ_CACHE_SIZE: int = 10000           # プロセス内キャッシュの件数 (世代番号を持つユーザー数の上限も兼ねる)
+    READ_CACHE_TTL_SECONDS: int = 60       # 別プロセスでの更新 (ワーカーなど) が反映されるまでの最大時間
+    READ_CACHE_REDIS_URL: str = ""         # 設定すると Redis を使い、複数プロセスで世代番号を共有する
+
+    # --- タグ入力補完 ---
+    TAG_INDEX_PAGE_SIZE: int = 1000             # 起動時に tags を読み込む1回あたりの件数
+    TAG_INDEX_REFRESH_SECONDS: float = 300.0    # 他プロセスで作成されたタグを取り込む間隔 (0 = しない)
+    TAG_USER_CACHE_SIZE: int = 10000            # ユーザー別 (使用回数順) インデックスのキャッシュ件数
+    TAG_USER_CACHE_TTL_SECONDS: int = 300
+
+    # --- 地図ピン ---
+    # このズーム未満ではピンをグリッド単位のクラスタに集約して返す
+    PIN_CLUSTER_MAX_ZOOM: int = 13
+    PIN_CLUSTER_CELL_PX: int = 60  # クラスタ1マスの大きさ (画面上のピクセル数)
+
+    # --- AI位置推定 (GeoCLIP) ---
+    GEOCLIP_TOP_K: int = 5
+    GEOCLIP_BATCH_SIZE: int = 16           # マイクロバッチの最大件数
+    GEOCLIP_BATCH_TIMEOUT_MS: int = 50     # 最初の1件からバッチ確定までの最大待ち時間
+    GEOCLIP_NUM_THREADS: int = 0           # torch の intra-op スレッド数 (0 = torch の既定値)
+    GEOCLIP_QUANTIZE: bool = False         # Linear 層の int8 動的量子化
+    GEOCLIP_POLL_INTERVAL_SECONDS: float = 5.0
+    GEOCLIP_PROCESSING_TIMEOUT_SECONDS: int = 600  # この時間内に推定が終わらない画像は再取得される
+    GEOCLIP_MAX_ATTEMPTS: int = 3                  # 再取得を繰り返した画像は AI_FAILED にする
+    # 推論サーバー (python -m app.commands.geoclip_server) のアドレス。"/path/to.sock" または "host:port"
+    # 設定するとワーカーはモデルを読み込まず、サーバーに推論を依頼する (重みはサーバー1プロセスだけが持つ)
+    GEOCLIP_SERVER_ADDRESS: str = ""
+
+    # --- 逆ジオコーディング (locations.geoname) ---
+    GEONAMES_PATH: str = ""                 # GeoNames の都市データ (cities1000.txt など)。空なら geoname を埋めない
+    GEONAMES_MIN_POPULATION: int = 0        # これより人口の少ない地点は読み込まない
+    GEONAMES_MAX_DISTANCE_KM: float = 50.0  # 最寄りの地点がこれより遠ければ geoname は NULL (海上など)
+
+    # --- ジョブキュー / ワーカー (python -m app.worker) ---
+    WORKER_CONCURRENCY: Dict[str, int] = {"thumbnails": 4, "storage_cleanup": 2, "content_hash": 2}  # ジョブ種別ごとの同時実行数
+    WORKER_MAX_ATTEMPTS: int = 5
+    WORKER_VISIBILITY_TIMEOUT_SECONDS: int = 300  # この時間内に完了しないジョブは再取得される
+    WORKER_BACKOFF_BASE_SECONDS: float = 5.0
+    WORKER_BACKOFF_MAX_SECONDS: float = 600.0
+    WORKER_POLL_INTERVAL_SECONDS: float = 1.0
+    WORKER_METRICS_INTERVAL_SECONDS: float = 60.0
+
+    # --- 計測 ---
+    # GET /metrics (Prometheus 形式) とリクエスト単位の計測。既定では無効
+    METRICS_ENABLED: bool = False
+    # 設定すると GET /metrics に "Authorization: Bearer <METRICS_TOKEN>" を要求する。
+    # 空のまま有効にする場合は、リバースプロキシなどで /metrics を外部から遮断すること
+    METRICS_TOKEN: str = ""
+    # ?profile=1 でサンプリングプロファイラの結果 (collapsed 形式のスタック) を返す。開発環境のみで有効にすること
+    PROFILE_ENABLED: bool = False
+    PROFILE_SAMPLE_INTERVAL_MS: float = 1.0
+
     # CORS設定
     BACKEND_CORS_ORIGINS: List[Union[str, AnyHttpUrl]] = []
 
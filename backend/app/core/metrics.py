@@ -0,0 +1,265 @@
+import contextvars
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+# リクエスト単位の計測と Prometheus 形式の出力 (GET /metrics)。
+# prometheus_client には依存せず、プロセス内で集計する (ワーカープロセスごとの値になる)。
+#
+#   with metrics.span("auth", "get_current_user"):
+#       ...
+#
+# span() は処理時間を pinaly_upstream_seconds に記録し、実行中のリクエストの
+# 上流呼び出し回数 (種別ごと) に加算する。DB / ストレージの httpx クライアントには
+# httpx_hooks() を event_hooks に渡すことで、.execute() などの呼び出しがすべて計測される。
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(256 * 4 ** i for i in range(10))  # 256B .. 64MB
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] += amount
+
+    def total(self, **labels: str) -> float:
+        """labels に一致する系列の合計 (指定しないラベルはすべて合算)"""
+        indexes = {self.labels.index(name): value for name, value in labels.items()}
+        with self._lock:
+            return sum(
+                total for values, total in self._values.items()
+                if all(values[i] == value for i, value in indexes.items())
+            )
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {_format_value(total)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+        # ラベル値 -> (バケットごとの件数 (累積ではない), [合計, 件数])
+        self._series: Dict[LabelValues, Tuple[List[int], list]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = ([0] * len(self.buckets), [0.0, 0])
+            series[0][index] += 1
+            series[1][0] += value
+            series[1][1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((values, list(counts), list(totals)) for values, (counts, totals) in self._series.items())
+        for values, counts, (total, count) in snapshot:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {count}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "pinaly_http_request_duration_seconds", "HTTP request latency by route",
+    LATENCY_BUCKETS, ("method", "route", "status"),
+)
+REQUEST_BYTES = Histogram(
+    "pinaly_http_request_size_bytes", "HTTP request body size by route",
+    SIZE_BUCKETS, ("method", "route"),
+)
+RESPONSE_BYTES = Histogram(
+    "pinaly_http_response_size_bytes", "HTTP response body size by route",
+    SIZE_BUCKETS, ("method", "route"),
+)
+REQUEST_UPSTREAM_CALLS = Histogram(
+    "pinaly_http_upstream_calls", "Upstream calls (db / storage / auth ...) made while serving one request",
+    COUNT_BUCKETS, ("method", "route", "kind"),
+)
+UPSTREAM_SECONDS = Histogram(
+    "pinaly_upstream_seconds", "Latency of upstream calls and instrumented spans",
+    LATENCY_BUCKETS, ("kind", "name"),
+)
+UPSTREAM_ERRORS = Counter(
+    "pinaly_upstream_errors_total", "Upstream calls that raised or returned an error status",
+    ("kind", "name"),
+)
+
+REGISTRY = [REQUEST_SECONDS, REQUEST_BYTES, RESPONSE_BYTES, REQUEST_UPSTREAM_CALLS, UPSTREAM_SECONDS, UPSTREAM_ERRORS]
+
+
+class RequestStats:
+    """1リクエストの間に行われた上流呼び出しの種別ごとの回数と合計時間"""
+
+    def __init__(self):
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, seconds: float) -> None:
+        # 同期の依存関数・run_in_threadpool からも呼ばれる
+        with self._lock:
+            self.calls[kind] += 1
+            self.seconds[kind] += seconds
+
+    def server_timing(self) -> str:
+        """Server-Timing ヘッダーの値 (ブラウザの開発者ツールで内訳を確認できる)"""
+        with self._lock:
+            items = sorted(self.seconds.items())
+            return ", ".join(
+                f'{kind};dur={seconds * 1000:.1f};desc="{self.calls[kind]} calls"' for kind, seconds in items
+            )
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def current_request() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def record(kind: str, name: str, seconds: float, error: bool = False) -> None:
+    UPSTREAM_SECONDS.observe(seconds, kind, name)
+    if error:
+        UPSTREAM_ERRORS.inc(kind, name)
+    stats = _current.get()
+    if stats is not None:
+        stats.add(kind, seconds)
+
+
+@contextmanager
+def span(kind: str, name: str) -> Iterator[None]:
+    """with ブロックの処理時間を kind / name で記録する (async 関数の中でも使える)"""
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(kind, name, time.perf_counter() - started, error)
+
+
+def httpx_hooks(kind: str, name: Callable[[httpx.Request], str]) -> Dict[str, list]:
+    """
+    httpx.AsyncClient(event_hooks=...) 用のフック。
+    リクエスト送信からレスポンスヘッダー受信までを1回の上流呼び出しとして記録する。
+    """
+
+    async def on_request(request: httpx.Request) -> None:
+        request.extensions["metrics_started"] = time.perf_counter()
+
+    async def on_response(response: httpx.Response) -> None:
+        started = response.request.extensions.get("metrics_started")
+        if started is not None:
+            record(kind, name(response.request), time.perf_counter() - started, response.status_code >= 500)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ルート (パスのテンプレート) ごとのレイテンシ・リクエスト/レスポンスのサイズ・
+    1リクエストあたりの上流呼び出し回数を記録する ASGI ミドルウェア。
+    レスポンスには上流呼び出しの内訳を Server-Timing ヘッダーで付ける。
+    """
+
+    def __init__(self, app, exclude_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+        received = sent = 0
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def timed_send(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = stats.server_timing()
+                if timing:
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, timed_send)
+        finally:
+            _current.reset(token)
+            # 未マッチのパス (404) はラベルの種類が増えすぎないよう1つにまとめる
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = scope["method"]
+            REQUEST_SECONDS.observe(time.perf_counter() - started, method, route, str(status))
+            REQUEST_BYTES.observe(received, method, route)
+            RESPONSE_BYTES.observe(sent, method, route)
+            for kind in dict.fromkeys(("db", "storage", "auth", *stats.calls)):
+                REQUEST_UPSTREAM_CALLS.observe(stats.calls.get(kind, 0), method, route, kind)
@@ -0,0 +1,60 @@
+import json
+from fastapi import HTTPException
+from typing import Dict, Optional
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class BodySizeLimitMiddleware:
+    """
+    リクエストボディのサイズ上限を強制する ASGI ミドルウェア。
+    Content-Length が上限を超える場合は本文を受信する前に 413 を返し、
+    chunked 転送など長さ不明の場合も受信量が上限を超えた時点で打ち切る。
+    path_limits でパスごとに上限を上書きできる (一括アップロードなど)。
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.path_limits.get(scope["path"].rstrip("/"), self.max_bytes)
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None:
+            # 数字以外 (空・負数・"10, 10" など) は不正なリクエストとして扱う
+            if not content_length.isdigit():
+                await self._reject(send, 400, "Invalid Content-Length")
+                return
+            if int(content_length) > max_bytes:
+                await self._reject(send, 413, "Request body too large")
+                return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, send: Send, status: int, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,78 @@
+import bisect
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+def normalize(text: str) -> str:
+    """前方一致の比較用キー (大文字・小文字、全角・半角の違いを無視)"""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+class PrefixIndex:
+    """
+    名前の前方一致検索用のソート済みインデックス。
+    キーを正規化した文字列の昇順で保持し、bisect で先頭位置を求めて limit 件だけ読む。
+    更新 (replace / add) はロックで保護する。参照はイベントループ上で行うためロックしない。
+    """
+
+    def __init__(self, items: Iterable[Tuple[int, str]] = ()):
+        self._lock = threading.Lock()
+        self._keys: List[str] = []
+        self._values: List[Dict[str, Any]] = []
+        self._ids = set()
+        self.replace(items)
+
+    def replace(self, items: Iterable[Tuple[int, str]]) -> None:
+        """全件を入れ替える (起動時・定期リフレッシュ用)"""
+        entries = sorted((normalize(name), tag_id, name) for tag_id, name in items)
+        keys = [key for key, _, _ in entries]
+        values = [{"id": tag_id, "name": name} for _, tag_id, name in entries]
+        with self._lock:
+            self._keys, self._values = keys, values
+            self._ids = {value["id"] for value in values}
+
+    def add(self, items: Iterable[Tuple[int, str]]) -> None:
+        """未登録のものだけ追加する"""
+        with self._lock:
+            for tag_id, name in items:
+                if tag_id in self._ids:
+                    continue
+                key = normalize(name)
+                pos = bisect.bisect_right(self._keys, key)
+                self._keys.insert(pos, key)
+                self._values.insert(pos, {"id": tag_id, "name": name})
+                self._ids.add(tag_id)
+
+    def search(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        keys, values = self._keys, self._values
+        key = normalize(prefix)
+        start = bisect.bisect_left(keys, key)
+        results = []
+        for i in range(start, min(start + limit, len(keys))):
+            if not keys[i].startswith(key):
+                break
+            results.append(values[i])
+        return results
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class RankedPrefixIndex:
+    """
+    使用回数で順位付けする前方一致インデックス (ユーザーごとの少数のタグ向け)。
+    一致したものを件数の多い順 -> 名前順で返す。
+    """
+
+    def __init__(self, items: Iterable[Tuple[int, str, int]]):
+        entries = sorted((normalize(name), tag_id, name, count) for tag_id, name, count in items)
+        self._keys = [entry[0] for entry in entries]
+        self._entries = entries
+
+    def search(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        key = normalize(prefix)
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_left(self._keys, key + "\U0010ffff") if key else len(self._keys)
+        matched = sorted(self._entries[start:end], key=lambda e: (-e[3], e[0]))
+        return [{"id": tag_id, "name": name, "count": count} for _, tag_id, name, count in matched[:limit]]
@@ -0,0 +1,100 @@
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# 開発用のサンプリングプロファイラ (?profile=1)。
+# 一定間隔で全スレッドのスタックを採取し、flamegraph.pl / speedscope などで読める
+# collapsed 形式 ("スレッド;関数;関数;... 回数" を1行ずつ) で返す。
+# イベントループ・スレッドプールの待機中 (アイドル) のサンプルは除外する。
+
+_IDLE_FILES = ("selectors.py", "threading.py", "queue.py")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename.rsplit("/", 1)[-1]
+    return f"{code.co_name} ({filename}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileMiddleware:
+    """
+    ?profile=1 を付けたリクエストの処理中にサンプリングし、本来のレスポンスの代わりに
+    collapsed 形式のスタックを text/plain で返す (PROFILE_ENABLED の場合のみ有効にすること)。
+    """
+
+    def __init__(self, app, interval: float = 0.001):
+        self.app = app
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or b"profile=1" not in scope.get("query_string", b"").split(b"&"):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def discard(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        profiler = SamplingProfiler(self.interval)
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+
+        body = profiler.collapsed().encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                # 本来のレスポンスのステータスと処理時間
+                (b"x-profile-status", str(status).encode()),
+                (b"x-profile-elapsed", f"{time.perf_counter() - started:.3f}".encode()),
+                (b"x-profile-samples", str(sum(profiler.samples.values())).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+# ユーザー単位の読み取りキャッシュ (一覧・詳細・地図ピン・タグ)。
+#
+# キャッシュキーには「ユーザーの世代番号」を含める。画像の登録・更新・削除で
+# bump(user_id) すると世代が変わり、そのユーザーの古いエントリは参照されなくなる
+# (消す必要はなく、LRU / TTL で追い出される)。他ユーザーのエントリには影響しない。
+#
+# バックエンド:
+#   - READ_CACHE_REDIS_URL を設定した場合: Redis (要 pip install redis)。世代番号も Redis で共有するため、
+#     ジョブワーカーや複数の API プロセスでの更新もすぐに反映される
+#   - それ以外: プロセス内 (TTLCache)。別プロセスでの更新は検知できないため、
+#     READ_CACHE_ENABLED=True を明示した場合だけ使う (既定では Redis がなければキャッシュしない)
+#
+# 値と一緒に ETag (内容のハッシュ) を保持し、If-None-Match が一致すれば 304 を返せるようにする。
+
+CACHE_REQUESTS = metrics.Counter(
+    "pinaly_read_cache_requests_total", "Read cache lookups by namespace and result (hit / miss)",
+    ("namespace", "result"),
+)
+metrics.REGISTRY.append(CACHE_REQUESTS)
+
+
+def make_etag(value: Any) -> str:
+    body = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str, ensure_ascii=False)
+    return f'W/"{hashlib.sha1(body.encode()).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # 弱い比較 (W/ の有無は無視する)
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+
+class LocalBackend:
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations: Dict[str, int] = {}
+        self._max_users = maxsize
+        # 世代番号が 0 に戻っても (再起動・リセット)、以前のキーと衝突しないようにする
+        self._epoch = uuid.uuid4().hex[:8]
+
+    async def generation(self, user_id: str) -> str:
+        return f"{self._epoch}.{self._generations.get(user_id, 0)}"
+
+    async def bump(self, user_id: str) -> None:
+        if user_id not in self._generations and len(self._generations) >= self._max_users:
+            # 世代番号はユーザーごとに増えるため、上限に達したらまとめて捨てる。
+            # 1人分だけ捨てると 0 に戻った世代番号で古いエントリが見えてしまうため、全体を作り直す
+            self._generations.clear()
+            self._entries.clear()
+            self._epoch = uuid.uuid4().hex[:8]
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    async def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, entry: Tuple[str, Any]) -> None:
+        self._entries.set(key, entry)
+
+
+class RedisBackend:
+    def __init__(self, url: str, ttl: float):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.ttl = int(ttl)
+
+    async def generation(self, user_id: str) -> str:
+        value = await self._redis.get(f"pinaly:gen:{user_id}")
+        return value.decode() if value else "0"
+
+    async def bump(self, user_id: str) -> None:
+        await self._redis.incr(f"pinaly:gen:{user_id}")
+
+    async def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        raw = await self._redis.get(f"pinaly:cache:{key}")
+        if raw is None:
+            return None
+        etag, value = json.loads(raw)
+        return etag, value
+
+    async def set(self, key: str, entry: Tuple[str, Any]) -> None:
+        await self._redis.set(f"pinaly:cache:{key}", json.dumps(entry, default=str), ex=self.ttl)
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if settings.READ_CACHE_REDIS_URL:
+            _backend = RedisBackend(settings.READ_CACHE_REDIS_URL, settings.READ_CACHE_TTL_SECONDS)
+        else:
+            _backend = LocalBackend(settings.READ_CACHE_SIZE, settings.READ_CACHE_TTL_SECONDS)
+    return _backend
+
+
+def enabled() -> bool:
+    """READ_CACHE_ENABLED が未設定なら、Redis (プロセス間で無効化を共有できる) がある場合だけ有効"""
+    if settings.READ_CACHE_ENABLED is None:
+        return bool(settings.READ_CACHE_REDIS_URL)
+    return settings.READ_CACHE_ENABLED
+
+
+async def generation(user_id: str) -> str:
+    return await get_backend().generation(user_id)
+
+
+async def bump(user_id: str) -> None:
+    """ユーザーのライブラリが変わったときに呼ぶ (そのユーザーのキャッシュをすべて無効にする)"""
+    if enabled():
+        await get_backend().bump(user_id)
+
+
+async def get_or_load(
+    namespace: str,
+    user_id: str,
+    params: Dict[str, Any],
+    loader: Callable[[], Awaitable[Any]],
+) -> Tuple[Any, str]:
+    """
+    (値, ETag) を返す。キャッシュになければ loader() を呼んで保存する。
+    params はキャッシュキーになるため、結果に影響する引数をすべて含めること。
+    """
+    if not enabled():
+        value = await loader()
+        return value, make_etag(value)
+
+    backend = get_backend()
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+    key = f"{namespace}:{user_id}:{await backend.generation(user_id)}:{digest}"
+    entry = await backend.get(key)
+    if entry is not None:
+        CACHE_REQUESTS.inc(namespace, "hit")
+        return entry[1], entry[0]
+
+    CACHE_REQUESTS.inc(namespace, "miss")
+    value = await loader()
+    etag = make_etag(value)
+    await backend.set(key, (etag, value))
+    return value, etag
+
+
+# ブラウザにも保存させるが、使う前に必ず If-None-Match で再検証させる
+CACHE_CONTROL = "private, no-cache"
+
+
+def respond(request: Request, response: Response, value: Any, etag: str) -> Any:
+    """
+    エンドポイントの戻り値を作る。If-None-Match が ETag と一致すれば本文なしの 304、
+    それ以外は ETag ヘッダーを付けて value をそのまま返す (response_model で検証される)。
+    """
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return value
+
+
+async def close() -> None:
+    global _backend
+    if _backend is not None and hasattr(_backend, "close"):
+        await _backend.close()
+    _backend = None
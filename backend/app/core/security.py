@@ -0,0 +1,132 @@
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+import jwt
+from jwt import PyJWKClient
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.supabase import supabase
+
+# ローカル検証に対応しているアルゴリズム
+HMAC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+ASYMMETRIC_ALGORITHMS = {"RS256", "RS384", "RS512", "ES256", "ES384", "ES512", "EdDSA"}
+
+
+class UnverifiableTokenError(Exception):
+    """ローカルでは検証できない (未知の kid・形式) トークン。Supabase に問い合わせる。"""
+
+
+@dataclass
+class AuthUser:
+    """
+    JWT のクレームから組み立てたユーザー情報。
+    supabase.auth.get_user() が返す User と同じ属性名で参照できるようにしている。
+    """
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    aud: Optional[str] = None
+    user_metadata: Dict[str, Any] = field(default_factory=dict)
+    app_metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_claims(cls, claims: Dict[str, Any]) -> "AuthUser":
+        return cls(
+            id=claims["sub"],
+            email=claims.get("email"),
+            role=claims.get("role"),
+            aud=claims.get("aud"),
+            user_metadata=claims.get("user_metadata") or {},
+            app_metadata=claims.get("app_metadata") or {},
+        )
+
+
+# 検証済みトークン -> ユーザー のキャッシュ (キーはトークンのハッシュ)
+token_cache = TTLCache(
+    maxsize=settings.AUTH_TOKEN_CACHE_SIZE,
+    ttl=settings.AUTH_TOKEN_CACHE_TTL_SECONDS,
+)
+
+# 非対称鍵で署名されたトークン用の JWKS (kid ごとに鍵をキャッシュ)
+_jwks_client = PyJWKClient(
+    f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json",
+    cache_keys=True,
+    lifespan=settings.AUTH_JWKS_TTL_SECONDS,
+    headers={"apikey": settings.SUPABASE_KEY},
+)
+
+
+def _cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def verify_token_locally(token: str) -> Tuple[AuthUser, Dict[str, Any]]:
+    """
+    署名と有効期限をローカルで検証する。
+    - HS系: 設定の SECRET_KEY / ALGORITHM で検証
+    - RS/ES系: JWKS から kid に対応する公開鍵を取得して検証
+    検証できない形式なら UnverifiableTokenError、不正なトークンなら jwt.InvalidTokenError。
+    """
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.DecodeError as e:
+        raise UnverifiableTokenError(str(e))
+
+    alg = header.get("alg")
+    kid = header.get("kid")
+
+    if alg in HMAC_ALGORITHMS:
+        if alg != settings.ALGORITHM:
+            raise UnverifiableTokenError(f"Unexpected algorithm: {alg}")
+        key = settings.SECRET_KEY
+    elif alg in ASYMMETRIC_ALGORITHMS and kid:
+        try:
+            key = _jwks_client.get_signing_key(kid).key
+        except jwt.PyJWKClientError as e:
+            raise UnverifiableTokenError(str(e))
+    else:
+        raise UnverifiableTokenError(f"Unsupported token header: alg={alg}, kid={kid}")
+
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=[alg],
+        audience=settings.AUTH_JWT_AUDIENCE,
+        options={"require": ["exp", "sub"]},
+    )
+    return AuthUser.from_claims(claims), claims
+
+
+def _verify_remotely(token: str):
+    user_response = supabase.auth.get_user(token)
+    if not user_response or not user_response.user:
+        raise jwt.InvalidTokenError("User not found")
+    return user_response.user
+
+
+def authenticate(token: str):
+    """
+    トークンを検証してユーザーを返す。
+    ローカルで署名を検証できたトークンだけをキャッシュする。
+    Supabase に問い合わせた結果 (remote モード・ローカルで検証できないトークン) はキャッシュせず、
+    ログアウトや失効したセッションが次のリクエストから拒否されるようにする。
+    """
+    if settings.AUTH_VERIFY_MODE != "local":
+        return _verify_remotely(token)
+
+    key = _cache_key(token)
+    user = token_cache.get(key)
+    if user is not None:
+        return user
+
+    try:
+        user, claims = verify_token_locally(token)
+    except UnverifiableTokenError:
+        return _verify_remotely(token)
+
+    # 有効期限を超えてキャッシュしない
+    token_cache.set(key, user, ttl=claims["exp"] - time.time())
+    return user
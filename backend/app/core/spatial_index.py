@@ -0,0 +1,152 @@
+import math
+from typing import Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _unit_vectors(lat, lon):
+    import numpy as np
+
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1).astype(np.float32)
+
+
+def chord_to_km(chord):
+    """単位球上の弦の長さ -> 大円距離 (km)"""
+    import numpy as np
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.asarray(chord) / 2, 1.0))
+
+
+def km_to_chord(km: float) -> float:
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+class SphereKDTree:
+    """
+    地表の点の最近傍検索用の k-d 木 (NumPy の配列だけで表現する)。
+
+    緯度経度を単位球上の3次元ベクトルに変換して扱うため、180度線や極付近でも
+    ユークリッド距離 (弦の長さ) の大小が大円距離の大小と一致する。
+    木は中央値で分割した完全二分木で、ノードはヒープ順 (子は 2i+1, 2i+2) の配列、
+    葉は同じ大きさに揃えた点の配列 (leaf_size 件程度) として持つ。
+
+    検索は問い合わせ点をまとめてベクトル化して行う:
+      1. 各点が属する葉まで降り、その葉の中の最近傍で探索半径を決める
+      2. 根から、探索半径の球と交わる子だけをたどって候補の葉を列挙する
+      3. 候補の葉の点との距離を一括で計算し、問い合わせ点ごとに最小を取る
+    """
+
+    def __init__(self, lat, lon, leaf_size: int = 32):
+        import numpy as np
+
+        points = _unit_vectors(lat, lon).reshape(-1, 3)
+        n = len(points)
+        self.size = n
+        self.depth = max(0, math.ceil(math.log2(max(n, 1) / leaf_size)))
+        n_internal = 2 ** self.depth - 1
+
+        self.split_dim = np.zeros(n_internal, dtype=np.int8)
+        self.split_value = np.zeros(n_internal, dtype=np.float32)
+        # ノードごとの点の添字。各階層で中央値により2つに分ける
+        groups = [np.arange(n)]
+        for level in range(self.depth):
+            children = []
+            for offset, idx in enumerate(groups):
+                node = 2 ** level - 1 + offset
+                if len(idx) == 0:
+                    children += [idx, idx]
+                    continue
+                coords = points[idx]
+                dim = int(np.argmax(coords.max(axis=0) - coords.min(axis=0)))
+                half = len(idx) // 2
+                order = np.argpartition(coords[:, dim], half)
+                left, right = idx[order[:half]], idx[order[half:]]
+                self.split_dim[node] = dim
+                self.split_value[node] = points[right, dim].min()
+                children += [left, right]
+            groups = children
+
+        # 葉を同じ大きさに揃える (足りない分は球から遠い点で埋め、添字は -1)
+        width = max((len(idx) for idx in groups), default=0) or 1
+        self.leaf_points = np.full((len(groups), width, 3), 4.0, dtype=np.float32)
+        self.leaf_index = np.full((len(groups), width), -1, dtype=np.int32)
+        for leaf, idx in enumerate(groups):
+            self.leaf_points[leaf, :len(idx)] = points[idx]
+            self.leaf_index[leaf, :len(idx)] = idx
+
+    @property
+    def nbytes(self) -> int:
+        return self.split_dim.nbytes + self.split_value.nbytes + self.leaf_points.nbytes + self.leaf_index.nbytes
+
+    def _leaf_min(self, query, leaves) -> Tuple:
+        import numpy as np
+
+        diff = self.leaf_points[leaves] - query[:, None, :]
+        dist2 = np.einsum("ijk,ijk->ij", diff, diff)
+        slot = dist2.argmin(axis=1)
+        rows = np.arange(len(leaves))
+        return dist2[rows, slot], self.leaf_index[leaves, slot]
+
+    def _query_chunk(self, query, max_chord: float) -> Tuple:
+        import numpy as np
+
+        n_internal = 2 ** self.depth - 1
+        rows = np.arange(len(query))
+
+        # 1. 所属する葉の最近傍 -> 探索半径
+        node = np.zeros(len(query), dtype=np.int64)
+        for _ in range(self.depth):
+            dim = self.split_dim[node]
+            node = 2 * node + 1 + (query[rows, dim] >= self.split_value[node])
+        best2, _ = self._leaf_min(query, node - n_internal)
+        radius = np.sqrt(best2) * 1.0001 + 1e-6  # float32 の丸め誤差の分だけ広げる
+        # 上限より遠い近傍は不要なので、探索範囲も上限までに抑える (周りに点のない海上などで速くなる)
+        radius = np.minimum(radius, max_chord)
+
+        # 2. 探索半径の球と交わる葉を列挙する
+        owner = rows
+        node = np.zeros(len(query), dtype=np.int64)
+        for _ in range(self.depth):
+            delta = query[owner, self.split_dim[node]] - self.split_value[node]
+            go_left = delta < radius[owner]
+            go_right = delta >= -radius[owner]
+            owner = np.concatenate([owner[go_left], owner[go_right]])
+            node = np.concatenate([2 * node[go_left] + 1, 2 * node[go_right] + 2])
+
+        # 3. 候補の葉ごとの最近傍から、問い合わせ点ごとの最小を取る
+        dist2, index = self._leaf_min(query[owner], node - n_internal)
+        order = np.lexsort((dist2, owner))
+        first = order[np.concatenate([[True], owner[order][1:] != owner[order][:-1]])]
+        chord, index = np.sqrt(dist2[first]), index[first]
+        # 候補の葉がなかった点 (上限内に点がない) は owner に現れないため、全体の配列に戻す
+        result_chord = np.full(len(query), np.inf, dtype=np.float32)
+        result_index = np.full(len(query), -1, dtype=np.int32)
+        result_chord[owner[first]] = chord
+        result_index[owner[first]] = index
+        far = result_chord > max_chord
+        result_chord[far], result_index[far] = np.inf, -1
+        return result_chord, result_index
+
+    def query(self, lat, lon, max_km: float = math.inf, chunk_size: int = 8192) -> Tuple:
+        """
+        各点の最近傍を返す: (大円距離 km の配列, 元の点の添字の配列)。
+        max_km 以内に点がない場合 (点がない木を含む) は距離 inf / 添字 -1。
+        """
+        import numpy as np
+
+        query = _unit_vectors(lat, lon).reshape(-1, 3)
+        if self.size == 0:
+            return np.full(len(query), np.inf), np.full(len(query), -1, dtype=np.int32)
+        max_chord = km_to_chord(max_km) if max_km < math.inf else math.inf
+        chords, indexes = [], []
+        for start in range(0, len(query), chunk_size):
+            chord, index = self._query_chunk(query[start:start + chunk_size], max_chord)
+            chords.append(chord)
+            indexes.append(index)
+        chord = np.concatenate(chords)
+        km = chord_to_km(chord)
+        km[np.isinf(chord)] = np.inf
+        return km, np.concatenate(indexes)
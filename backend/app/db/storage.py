@@ -0,0 +1,318 @@
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import anyio
+import httpx
+import jwt
+from anyio import Path as AsyncPath
+from app.core import metrics
+from app.core.config import settings
+
+# オブジェクトストレージへのアクセス。
+# 呼び出し側はこのモジュールの関数 (upload_stream / download / remove / create_signed_upload_url など)
+# だけを使い、実体は STORAGE_BACKEND で選んだドライバーが処理する。
+#   "supabase": Supabase Storage の REST API (本番)
+#   "local"   : ローカルディレクトリ (開発・テスト用。公開URLは API の /storage から配信)
+#
+# Supabase ドライバーは httpx でチャンク単位にストリーミング送信する
+# (supabase-py の storage.upload() は bytes 全体を要求するため)。
+
+
+class SupabaseStorage:
+    def __init__(self):
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _get_http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=f"{settings.SUPABASE_URL}/storage/v1",
+                headers={
+                    "apikey": settings.SUPABASE_KEY,
+                    "Authorization": f"Bearer {settings.SUPABASE_KEY}",
+                },
+                timeout=settings.STORAGE_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.DB_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.DB_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.DB_POOL_KEEPALIVE_EXPIRY,
+                ),
+            )
+        return self._http
+
+    async def upload_stream(self, bucket, path, chunks, size, content_type) -> None:
+        res = await self._get_http().post(
+            f"/object/{bucket}/{path}",
+            content=chunks,
+            headers={
+                "Content-Type": content_type or "application/octet-stream",
+                "Content-Length": str(size),
+                "x-upsert": "false",
+            },
+        )
+        res.raise_for_status()
+
+    async def upload_bytes(self, bucket, path, data, content_type, upsert) -> None:
+        res = await self._get_http().post(
+            f"/object/{bucket}/{path}",
+            content=data,
+            headers={"Content-Type": content_type, "x-upsert": "true" if upsert else "false"},
+        )
+        res.raise_for_status()
+
+    async def download(self, bucket, path, byte_range) -> bytes:
+        headers = {"Range": f"bytes={byte_range[0]}-{byte_range[1] - 1}"} if byte_range else None
+        res = await self._get_http().get(f"/object/{bucket}/{path}", headers=headers)
+        res.raise_for_status()
+        return res.content
+
+    async def download_stream(self, bucket, path, chunk_size) -> AsyncIterator[bytes]:
+        async with self._get_http().stream("GET", f"/object/{bucket}/{path}") as res:
+            res.raise_for_status()
+            async for chunk in res.aiter_bytes(chunk_size):
+                yield chunk
+
+    async def size(self, bucket, path) -> Optional[int]:
+        res = await self._get_http().head(f"/object/{bucket}/{path}")
+        if res.status_code in (400, 404):
+            return None
+        res.raise_for_status()
+        return int(res.headers["content-length"])
+
+    async def remove(self, bucket, paths) -> None:
+        # 1リクエストで削除できる件数には上限がある (Supabase Storage は 1000件)
+        for i in range(0, len(paths), settings.STORAGE_REMOVE_BATCH_SIZE):
+            res = await self._get_http().request(
+                "DELETE", f"/object/{bucket}", json={"prefixes": paths[i:i + settings.STORAGE_REMOVE_BATCH_SIZE]}
+            )
+            res.raise_for_status()
+
+    async def list(self, bucket, prefix, limit, offset) -> List[Dict[str, Any]]:
+        res = await self._get_http().post(f"/object/list/{bucket}", json={
+            "prefix": prefix,
+            "limit": limit,
+            "offset": offset,
+            "sortBy": {"column": "name", "order": "asc"},
+        })
+        res.raise_for_status()
+        entries = []
+        for item in res.json():
+            if item.get("id") is None:  # フォルダ
+                entries.append({"name": item["name"], "folder": True})
+            else:
+                updated_at = item.get("updated_at") or item.get("created_at")
+                entries.append({
+                    "name": item["name"],
+                    "folder": False,
+                    "size": (item.get("metadata") or {}).get("size") or 0,
+                    "updated_at": datetime.fromisoformat(updated_at.replace("Z", "+00:00")) if updated_at else None,
+                })
+        return entries
+
+    async def create_signed_upload_url(self, bucket, path) -> str:
+        # 有効期限は Supabase 側の既定 (2時間)
+        res = await self._get_http().post(f"/object/upload/sign/{bucket}/{path}")
+        res.raise_for_status()
+        return f"{settings.SUPABASE_URL}/storage/v1{res.json()['url']}"
+
+    def public_url_prefix(self, bucket) -> str:
+        return f"{settings.SUPABASE_URL}/storage/v1/object/public/{bucket}/"
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+class LocalStorage:
+    """
+    STORAGE_LOCAL_ROOT/{bucket}/{path} にファイルとして保存する。
+    署名付きアップロードURLは API の PUT /api/v1/storage/upload/{token} を指す。
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _file(self, bucket: str, path: str) -> AsyncPath:
+        full = os.path.abspath(os.path.join(self.root, bucket, path))
+        if not full.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage path: {path}")
+        return AsyncPath(full)
+
+    async def upload_stream(self, bucket, path, chunks, size, content_type) -> None:
+        target = self._file(bucket, path)
+        if await target.exists():
+            raise FileExistsError(f"{bucket}/{path}")
+        await target.parent.mkdir(parents=True, exist_ok=True)
+        async with await target.open("wb") as f:
+            async for chunk in chunks:
+                await f.write(chunk)
+
+    async def upload_bytes(self, bucket, path, data, content_type, upsert) -> None:
+        target = self._file(bucket, path)
+        if not upsert and await target.exists():
+            raise FileExistsError(f"{bucket}/{path}")
+        await target.parent.mkdir(parents=True, exist_ok=True)
+        await target.write_bytes(data)
+
+    async def download(self, bucket, path, byte_range) -> bytes:
+        target = self._file(bucket, path)
+        if byte_range is None:
+            return await target.read_bytes()
+        async with await target.open("rb") as f:
+            await f.seek(byte_range[0])
+            return await f.read(byte_range[1] - byte_range[0])
+
+    async def download_stream(self, bucket, path, chunk_size) -> AsyncIterator[bytes]:
+        async with await self._file(bucket, path).open("rb") as f:
+            while chunk := await f.read(chunk_size):
+                yield chunk
+
+    async def size(self, bucket, path) -> Optional[int]:
+        target = self._file(bucket, path)
+        return (await target.stat()).st_size if await target.exists() else None
+
+    async def remove(self, bucket, paths) -> None:
+        for path in paths:
+            target = self._file(bucket, path)
+            if await target.exists():
+                await target.unlink()
+
+    async def list(self, bucket, prefix, limit, offset) -> List[Dict[str, Any]]:
+        directory = os.path.join(self.root, bucket, prefix)
+
+        def scan():
+            if not os.path.isdir(directory):
+                return []
+            with os.scandir(directory) as it:
+                items = sorted(it, key=lambda e: e.name)[offset:offset + limit]
+            entries = []
+            for entry in items:
+                if entry.is_dir():
+                    entries.append({"name": entry.name, "folder": True})
+                else:
+                    st = entry.stat()
+                    entries.append({
+                        "name": entry.name,
+                        "folder": False,
+                        "size": st.st_size,
+                        "updated_at": datetime.fromtimestamp(st.st_mtime, timezone.utc),
+                    })
+            return entries
+
+        return await anyio.to_thread.run_sync(scan)
+
+    async def create_signed_upload_url(self, bucket, path) -> str:
+        token = jwt.encode(
+            {"bucket": bucket, "path": path, "exp": int(time.time()) + settings.STORAGE_SIGNED_URL_TTL_SECONDS},
+            settings.SECRET_KEY,
+            algorithm="HS256",
+        )
+        return f"{settings.STORAGE_PUBLIC_BASE_URL}{settings.API_V1_STR}/storage/upload/{token}"
+
+    def public_url_prefix(self, bucket) -> str:
+        return f"{settings.STORAGE_PUBLIC_BASE_URL}/storage/{bucket}/"
+
+    async def close(self) -> None:
+        pass
+
+
+def verify_local_upload_token(token: str) -> Tuple[str, str]:
+    """LocalStorage の署名付きURLのトークンを検証し、(bucket, path) を返す"""
+    claims = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    return claims["bucket"], claims["path"]
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        if settings.STORAGE_BACKEND == "local":
+            _backend = LocalStorage(settings.STORAGE_LOCAL_ROOT)
+        elif settings.STORAGE_BACKEND == "supabase":
+            _backend = SupabaseStorage()
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+    return _backend
+
+
+async def upload_stream(
+    bucket: str,
+    path: str,
+    chunks: AsyncIterator[bytes],
+    size: int,
+    content_type: Optional[str],
+) -> None:
+    """チャンクのイテレータをそのままストレージへ送信する (全体をメモリに載せない)"""
+    with metrics.span("storage", "upload"):
+        await get_backend().upload_stream(bucket, path, chunks, size, content_type)
+
+
+async def upload_bytes(bucket: str, path: str, data: bytes, content_type: str, upsert: bool = True) -> None:
+    with metrics.span("storage", "upload"):
+        await get_backend().upload_bytes(bucket, path, data, content_type, upsert)
+
+
+async def download(bucket: str, path: str, byte_range: Optional[Tuple[int, int]] = None) -> bytes:
+    """byte_range=(start, end) を指定すると [start, end) の範囲だけを取得する"""
+    with metrics.span("storage", "download"):
+        return await get_backend().download(bucket, path, byte_range)
+
+
+async def download_stream(bucket: str, path: str) -> AsyncIterator[bytes]:
+    """オブジェクト全体を UPLOAD_CHUNK_BYTES ずつ取得する (全体をメモリに載せない)"""
+    with metrics.span("storage", "download"):
+        async for chunk in get_backend().download_stream(bucket, path, settings.UPLOAD_CHUNK_BYTES):
+            yield chunk
+
+
+async def object_size(bucket: str, path: str) -> Optional[int]:
+    """オブジェクトのサイズ (存在しなければ None)"""
+    with metrics.span("storage", "size"):
+        return await get_backend().size(bucket, path)
+
+
+async def remove(bucket: str, paths: List[str]) -> None:
+    """オブジェクトをまとめて削除する (存在しないパスは無視される)"""
+    with metrics.span("storage", "remove"):
+        await get_backend().remove(bucket, paths)
+
+
+async def create_signed_upload_url(bucket: str, path: str) -> str:
+    """クライアントが API を経由せずに直接 PUT できる、path 専用の署名付きURL"""
+    with metrics.span("storage", "sign"):
+        return await get_backend().create_signed_upload_url(bucket, path)
+
+
+async def list_objects(bucket: str, prefix: str, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    prefix ("" または "USER_ID/" のように / で終わるフォルダ) の直下を名前順に返す (再帰しない)。
+    フォルダは {"name", "folder": True}、
+    オブジェクトは {"name", "folder": False, "size", "updated_at" (datetime)}
+    """
+    with metrics.span("storage", "list"):
+        return await get_backend().list(bucket, prefix, limit, offset)
+
+
+def get_public_url(bucket: str, path: str) -> str:
+    return get_backend().public_url_prefix(bucket) + path
+
+
+def path_from_public_url(bucket: str, url: str) -> Optional[str]:
+    """get_public_url() の逆変換。別バケットのURLなら None"""
+    # ホスト部分は比較しない (カスタムドメインなどで変わりうるため)
+    marker = urlsplit(get_backend().public_url_prefix(bucket)).path
+    if not url or marker not in url:
+        return None
+    return url.split(marker, 1)[1].split("?", 1)[0]
+
+
+async def close_storage() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
@@ -1,5 +1,65 @@
+from typing import Optional
+
+import httpx
+from postgrest import AsyncPostgrestClient
 from supabase import create_client, Client
+from app.core import metrics
 from app.core.config import settings
 
 # クライアントを作成（シングルトンとして振る舞います）
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
\ No newline at end of file
+# ※ 認証 (sign_up / sign_in) やストレージなど同期APIで十分な処理で使用
+supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+
+# DBアクセス用の非同期 PostgREST クライアント (get_db() で遅延生成)
+_db: Optional[AsyncPostgrestClient] = None
+
+
+def _db_call_name(request: httpx.Request) -> str:
+    # /rest/v1/images -> "images", /rest/v1/rpc/search_images -> "rpc/search_images"
+    return request.url.path.split("/rest/v1/", 1)[-1]
+
+
+def _create_db() -> AsyncPostgrestClient:
+    client = AsyncPostgrestClient(
+        f"{settings.SUPABASE_URL}/rest/v1",
+        headers={
+            "apikey": settings.SUPABASE_KEY,
+            "Authorization": f"Bearer {settings.SUPABASE_KEY}",
+        },
+    )
+    # デフォルトのセッションはプール上限を指定できないため、
+    # 同じ base_url / ヘッダーで keep-alive プール付きのセッションに差し替える
+    default_session = client.session
+    client.session = httpx.AsyncClient(
+        base_url=default_session.base_url,
+        headers=default_session.headers,
+        timeout=settings.DB_TIMEOUT_SECONDS,
+        limits=httpx.Limits(
+            max_connections=settings.DB_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.DB_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=settings.DB_POOL_KEEPALIVE_EXPIRY,
+        ),
+        follow_redirects=True,
+        # .execute() ごとのレイテンシ・回数を記録する (テーブル名 / rpc/関数名 単位)
+        event_hooks=metrics.httpx_hooks("db", _db_call_name),
+    )
+    return client
+
+
+def get_db() -> AsyncPostgrestClient:
+    """
+    非同期の PostgREST クライアントを返す。
+    全リクエストで1つのコネクションプールを共有し、イベントループをブロックしない。
+    """
+    global _db
+    if _db is None:
+        _db = _create_db()
+    return _db
+
+
+async def close_db() -> None:
+    """アプリ終了時にコネクションプールを閉じる"""
+    global _db
+    if _db is not None:
+        await _db.aclose()
+        _db = None
@@ -1,12 +1,66 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
+from app.api import deps
 from app.api.v1.api import api_router
+from app.core.config import settings
+from app.core import metrics, response_cache
+from app.core.middleware import BodySizeLimitMiddleware
+from app.core.profiler import ProfileMiddleware
+from app.db.storage import close_storage
+from app.db.supabase import close_db
+from app.services import geoname_service, tag_service
 
-app = FastAPI(title="Pinaly API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 起動時: タグ入力補完のインデックスを読み込む
+    await tag_service.warm_up()
+    # 逆ジオコーディング用の都市データ (GEONAMES_PATH を設定した場合のみ)
+    await geoname_service.warm_up()
+    refresher = None
+    if settings.TAG_INDEX_REFRESH_SECONDS > 0:
+        refresher = asyncio.create_task(tag_service.refresh_forever())
+    yield
+    if refresher is not None:
+        refresher.cancel()
+    # 終了時: DB / ストレージのコネクションプールを閉じる
+    await close_db()
+    await close_storage()
+    await response_cache.close()
+
+
+app = FastAPI(title="Pinaly API", lifespan=lifespan)
 
 app.include_router(api_router, prefix="/api/v1")
 
+# ローカルストレージ (開発・テスト用) の公開URL: /storage/{bucket}/{path}
+if settings.STORAGE_BACKEND == "local":
+    os.makedirs(settings.STORAGE_LOCAL_ROOT, exist_ok=True)
+    app.mount("/storage", StaticFiles(directory=settings.STORAGE_LOCAL_ROOT), name="storage")
+
+# アップロード上限を超えるリクエストは本文を受信する前に拒否する
+# (multipart の境界・ヘッダー分として 64KB の余裕を持たせる)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=settings.UPLOAD_MAX_BYTES + 64 * 1024,
+    path_limits={f"{settings.API_V1_STR}/images/batch": settings.BATCH_UPLOAD_MAX_BYTES},
+)
+
+# ルートごとのレイテンシ・上流呼び出し回数の計測 (GET /metrics で公開)
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# ?profile=1 のサンプリングプロファイラ (開発用)
+if settings.PROFILE_ENABLED:
+    app.add_middleware(ProfileMiddleware, interval=settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+
 # フロントエンド(React)からのアクセスを許可する設定
+# (後から追加したミドルウェアほど外側で動くため、413 にも CORS ヘッダーが付く)
 origins = [
     "http://localhost:5173",
 ]
@@ -21,4 +75,10 @@ app.add_middleware(
 
 @app.get("/")
 def read_root():
-    return {"message": "Hello from Pinaly Backend (GeoCLIP Ready)!"}
\ No newline at end of file
+    return {"message": "Hello from Pinaly Backend (GeoCLIP Ready)!"}
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(deps.verify_metrics_token)])
+    def read_metrics():
+        # ワーカープロセスごとの値 (複数ワーカーの場合は Prometheus 側で合算する)
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
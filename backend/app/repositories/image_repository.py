@@ -0,0 +1,155 @@
+from typing import Any, Dict, List, Optional, Tuple
+from app.db.supabase import get_db
+
+# images テーブルへのアクセス (非同期)
+
+# 一覧で代表位置とタグを同じクエリに埋め込む場合の select
+EMBED_SELECT = "*, locations(latitude, longitude, geoname, rank), image_tags(tags(id, name))"
+
+
+async def insert_image(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # 同じ (user_id, content_hash) が登録済みなら何もせず None を返す
+    res = await get_db().table("images")\
+        .upsert(data, on_conflict="user_id,content_hash", ignore_duplicates=True)\
+        .execute()
+    return res.data[0] if res.data else None
+
+
+async def insert_images(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # 1回のリクエストで複数行を登録する。
+    # (user_id, content_hash) が登録済みの行は飛ばされるため、返却行は content_hash で突き合わせること
+    res = await get_db().table("images")\
+        .upsert(rows, on_conflict="user_id,content_hash", ignore_duplicates=True)\
+        .execute()
+    return res.data
+
+
+async def find_by_content_hashes(user_id: str, hashes: List[str]) -> List[Dict[str, Any]]:
+    """内容ハッシュが一致する登録済みの画像 (代表位置・タグを埋め込み)"""
+    res = await get_db().table("images")\
+        .select(EMBED_SELECT)\
+        .eq("user_id", user_id)\
+        .in_("content_hash", hashes)\
+        .eq("locations.rank", 1)\
+        .execute()
+    return res.data
+
+
+async def find_similar(image_id: int, user_id: str, max_distance: int, limit: int) -> List[Dict[str, Any]]:
+    """知覚ハッシュのハミング距離が近い画像 (similar_images 関数)"""
+    res = await get_db().rpc("similar_images", {
+        "p_image_id": image_id,
+        "p_user_id": user_id,
+        "p_max_distance": max_distance,
+        "p_limit": limit,
+    }).execute()
+    return res.data
+
+
+async def list_images(
+    user_id: str,
+    limit: int,
+    offset: int = 0,
+    after: Optional[Tuple[str, int]] = None,
+    embed: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    新しい順 (created_at, id の降順) に取得する。
+    after=(created_at, id) を指定するとその行より後ろをキーセットで取得し、
+    OFFSET と違って深いページでも (user_id, created_at, id) インデックスから直接読める。
+    """
+    query = get_db().table("images")\
+        .select(EMBED_SELECT if embed else "*")\
+        .eq("user_id", user_id)
+    if embed:
+        query = query.eq("locations.rank", 1)
+    if after is not None:
+        created_at, image_id = after
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{image_id})')
+    query = query.order("created_at", desc=True).order("id", desc=True)
+    if after is None and offset:
+        query = query.range(offset, offset + limit - 1)
+    else:
+        query = query.limit(limit)
+    res = await query.execute()
+    return res.data
+
+
+async def search_images(
+    user_id: str,
+    filters: Dict[str, Any],
+    limit: int,
+    offset: int = 0,
+    after: Optional[Tuple[str, int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    絞り込み・キーワード検索 (search_images 関数)。並び順とキーセットは list_images と同じ。
+    filters のキーは関数の引数名から p_ を除いたもの (taken_from, tags, query など)。
+    """
+    params = {f"p_{key}": value for key, value in filters.items()}
+    params.update({"p_user_id": user_id, "p_limit": limit, "p_offset": offset})
+    if after is not None:
+        params["p_after_created_at"], params["p_after_id"] = after
+    res = await get_db().rpc("search_images", params).execute()
+    return res.data or []
+
+
+async def get_image_detail(image_id: int, user_id: str) -> Optional[Dict[str, Any]]:
+    """画像本体 + 代表位置 + タグ (image_detail 関数)。該当なしは None"""
+    res = await get_db().rpc("image_detail", {"p_image_id": image_id, "p_user_id": user_id}).execute()
+    return res.data
+
+
+async def update_image_detail(image_id: int, user_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """メタ情報を更新し、更新後の詳細を返す (update_image_info 関数)。該当なしは None"""
+    res = await get_db().rpc("update_image_info", {
+        "p_image_id": image_id,
+        "p_user_id": user_id,
+        "p_fields": fields,
+    }).execute()
+    return res.data
+
+
+async def update_image(image_id: int, user_id: str, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    res = await get_db().table("images")\
+        .update(data)\
+        .eq("id", image_id)\
+        .eq("user_id", user_id)\
+        .execute()
+    return res.data
+
+
+async def claim_for_geolocation(limit: int, timeout_seconds: int, max_attempts: int) -> List[Dict[str, Any]]:
+    """
+    推定待ち (NO_GPS) と、処理開始から timeout_seconds を過ぎた AI_PROCESSING の画像を
+    最大 limit 件 AI_PROCESSING にして返す (migrations/015_geolocation_lease.sql)。
+    複数ワーカーが同時に呼んでも同じ画像は1つのワーカーにしか渡らない。
+    """
+    res = await get_db().rpc("claim_geolocation", {
+        "p_limit": limit,
+        "p_timeout_seconds": timeout_seconds,
+        "p_max_attempts": max_attempts,
+    }).execute()
+    return res.data or []
+
+
+async def delete_images(image_ids: List[int], user_id: str) -> List[Dict[str, Any]]:
+    # 1回の DELETE で削除し、削除した行 (ストレージ上のオブジェクトの後片付け用) を返す
+    # 他ユーザーの画像・存在しない id は削除されず、返却行にも含まれない
+    res = await get_db().table("images")\
+        .delete()\
+        .eq("user_id", user_id)\
+        .in_("id", image_ids)\
+        .execute()
+    return res.data or []
+
+
+async def find_referenced_storage_keys(url_prefix: str, keys: List[str]) -> List[str]:
+    # keys (拡張子を除いたバケット内のパス) のうち、images から参照されているもの
+    res = await get_db().rpc("referenced_storage_keys", {"p_url_prefix": url_prefix, "p_keys": keys}).execute()
+    return res.data or []
+
+
+async def count_foreign_image_urls(url_prefix: str) -> int:
+    res = await get_db().rpc("count_foreign_image_urls", {"p_url_prefix": url_prefix}).execute()
+    return res.data or 0
@@ -0,0 +1,83 @@
+from typing import Any, Dict, List, Optional
+from app.db.supabase import get_db
+
+# locations テーブルへのアクセス (非同期)
+
+
+async def insert_location(data: Dict[str, Any]) -> Dict[str, Any]:
+    res = await get_db().table("locations").insert(data).execute()
+    return res.data[0]
+
+
+async def insert_locations(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    res = await get_db().table("locations").insert(rows).execute()
+    return res.data
+
+
+async def delete_ai_locations(image_id: int) -> None:
+    # AI 推定の行 (source_type='AI') だけを削除する。EXIF・手動の位置は残す
+    await get_db().table("locations")\
+        .delete()\
+        .eq("image_id", image_id)\
+        .eq("source_type", "AI")\
+        .execute()
+
+
+async def find_pins_in_bbox(
+    user_id: str,
+    min_lat: float,
+    max_lat: float,
+    min_lon: float,
+    max_lon: float,
+    statuses: List[str],
+) -> List[Dict[str, Any]]:
+    # 範囲検索 + ユーザーフィルタ (pins_in_bbox 関数: geom の GiST インデックスを使用)
+    # min_lon > max_lon の場合は180度線をまたぐ範囲として扱われる
+    res = await get_db().rpc("pins_in_bbox", {
+        "p_user_id": user_id,
+        "p_min_lat": min_lat,
+        "p_max_lat": max_lat,
+        "p_min_lon": min_lon,
+        "p_max_lon": max_lon,
+        "p_statuses": statuses,
+    }).execute()
+    return res.data
+
+
+async def find_pin_clusters(
+    user_id: str,
+    min_lat: float,
+    max_lat: float,
+    min_lon: float,
+    max_lon: float,
+    cell_deg: float,
+    statuses: List[str],
+) -> List[Dict[str, Any]]:
+    # グリッド集約はDB側 (pin_clusters 関数) で行い、クラスタ数分の行だけを受け取る
+    res = await get_db().rpc("pin_clusters", {
+        "p_user_id": user_id,
+        "p_min_lat": min_lat,
+        "p_max_lat": max_lat,
+        "p_min_lon": min_lon,
+        "p_max_lon": max_lon,
+        "p_cell_deg": cell_deg,
+        "p_statuses": statuses,
+    }).execute()
+    return res.data
+
+
+async def find_locations_after(after_id: int, limit: int, missing_only: bool = True) -> List[Dict[str, Any]]:
+    """id 順に locations を取得する (逆ジオコーディングのバックフィル用)"""
+    query = get_db().table("locations")\
+        .select("id, latitude, longitude")\
+        .gt("id", after_id)
+    if missing_only:
+        query = query.is_("geoname", "null")
+    res = await query.order("id").limit(limit).execute()
+    return res.data
+
+
+async def set_geonames(ids: List[int], geonames: List[Optional[str]]) -> int:
+    # 1回の呼び出しで複数行を更新する (set_location_geonames 関数)
+    res = await get_db().rpc("set_location_geonames", {"p_ids": ids, "p_geonames": geonames}).execute()
+    return res.data
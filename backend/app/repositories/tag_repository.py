@@ -0,0 +1,30 @@
+from typing import Any, Dict, List
+from app.db.supabase import get_db
+
+# tags / image_tags テーブルへのアクセス (非同期)
+
+
+async def list_tags_after(after_id: int, limit: int) -> List[Dict[str, Any]]:
+    # 全件の読み込み用 (id 順のキーセットで limit 件ずつ)
+    res = await get_db().table("tags")\
+        .select("id, name")\
+        .gt("id", after_id)\
+        .order("id")\
+        .limit(limit)\
+        .execute()
+    return res.data
+
+
+async def list_user_tag_usage(user_id: str) -> List[Dict[str, Any]]:
+    """ユーザーが使用したタグと使用回数 (user_tag_usage 関数)"""
+    res = await get_db().rpc("user_tag_usage", {"p_user_id": user_id}).execute()
+    return res.data or []
+
+
+async def set_image_tags(image_id: int, names: List[str]) -> List[Dict[str, Any]]:
+    """
+    タグの作成 (ON CONFLICT) と紐付けの差分更新を1回で行う (set_image_tags 関数)。
+    紐付け後のタグを名前順で返す。
+    """
+    res = await get_db().rpc("set_image_tags", {"p_image_id": image_id, "p_names": names}).execute()
+    return res.data or []
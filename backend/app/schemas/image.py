@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Literal, Optional, List
 from .tag import TagResponse
 
 # 共通: 画像情報のベース
@@ -14,6 +14,8 @@ class ImageResponse(ImageBase):
     id: int
     image_url: str
     thumbnail_url: Optional[str] = None
+    # サイズ別の派生画像URL (marker / grid / preview)。生成前は None
+    derivatives: Optional[Dict[str, str]] = None
     location_status: str
     latitude: Optional[float] = None
     longitude: Optional[float] = None
@@ -21,10 +23,56 @@ class ImageResponse(ImageBase):
     taken_at: Optional[datetime] = None
     created_at: datetime
     tags: List[TagResponse] = []
+    # アップロード時: 同じ内容の画像が登録済みだった (新規登録せず既存の画像を返した)
+    duplicate: bool = False
 
     class Config:
         from_attributes = True
 
+# GET /images の絞り込み条件 (None は指定なし)
+class ImageFilter(BaseModel):
+    taken_from: Optional[datetime] = None
+    taken_to: Optional[datetime] = None
+    tags: Optional[List[str]] = None
+    tag_mode: Literal["any", "all"] = "any"
+    is_favorite: Optional[bool] = None
+    statuses: Optional[List[str]] = None
+    query: Optional[str] = None
+
+    def is_empty(self) -> bool:
+        return not self.model_dump(exclude_defaults=True)
+
+# GET /images レスポンス (キーセットページネーション)
+class ImageListResponse(BaseModel):
+    items: List[ImageResponse]
+    # 次ページ取得用のカーソル。最終ページでは None
+    next_cursor: Optional[str] = None
+
+# 一括アップロードのファイル単位の結果
+class BatchUploadResult(BaseModel):
+    filename: Optional[str] = None
+    status: str  # "created" / "duplicate" / "failed"
+    image: Optional[ImageResponse] = None
+    error: Optional[str] = None
+
+# POST /images/batch レスポンス
+class BatchUploadResponse(BaseModel):
+    created: int
+    duplicates: int = 0
+    failed: int
+    results: List[BatchUploadResult]
+
+# 一括削除 (DELETE /images) の結果: 実際に削除された id
+class BulkDeleteResponse(BaseModel):
+    deleted: List[int]
+
+# 見た目が近い画像 (知覚ハッシュのハミング距離)
+class SimilarImageResponse(BaseModel):
+    id: int
+    image_url: str
+    thumbnail_url: Optional[str] = None
+    distance: int
+
 # PUTリクエスト用
 class ImageUpdate(BaseModel):
     title: Optional[str] = None
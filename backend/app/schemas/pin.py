@@ -6,4 +6,13 @@ class PinResponse(BaseModel):
     latitude: float
     longitude: float
     thumbnail_url: str
+    title: Optional[str] = None
+
+# 低ズーム時のクラスタ (件数・重心・代表画像)
+class PinClusterResponse(BaseModel):
+    latitude: float
+    longitude: float
+    count: int
+    image_id: int
+    thumbnail_url: str
     title: Optional[str] = None
\ No newline at end of file
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic import BaseModel
 
 class TagResponse(BaseModel):
@@ -5,4 +6,8 @@ class TagResponse(BaseModel):
     name: str
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# 入力補完の候補 (mine=true の場合は使用回数付き)
+class TagSuggestion(TagResponse):
+    count: Optional[int] = None
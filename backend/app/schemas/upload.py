@@ -0,0 +1,37 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from .image import ImageResponse
+
+# 再開可能アップロードのセッション作成リクエスト
+class UploadCreate(BaseModel):
+    filename: str
+    size: int = Field(..., gt=0)
+    content_type: Optional[str] = None
+
+# セッションの状態 (offset = 受信済みバイト数)
+class UploadStatus(BaseModel):
+    id: str
+    filename: str
+    size: int
+    offset: int
+    expires_at: float
+
+# 直接アップロード (署名付きURL) の発行リクエスト
+# content_hash (SHA-256 の16進) を指定すると、登録済みの画像なら URL を発行せずに返す
+class DirectUploadCreate(BaseModel):
+    filename: str
+    size: int = Field(..., gt=0)
+    content_type: Optional[str] = None
+    content_hash: Optional[str] = Field(None, pattern=r"^[0-9a-f]{64}$")
+
+# upload_url へ PUT した後、path を添えて完了を通知する
+# duplicate がある場合はアップロード不要 (登録済みの画像)
+class DirectUploadTicket(BaseModel):
+    upload_url: Optional[str] = None
+    path: Optional[str] = None
+    duplicate: Optional[ImageResponse] = None
+
+# content_hash は互換のため受け付けるが使わない (内容ハッシュはワーカーが保存済みの内容から求める)
+class DirectUploadComplete(BaseModel):
+    path: str
+    content_hash: Optional[str] = Field(None, pattern=r"^[0-9a-f]{64}$")
@@ -0,0 +1,46 @@
+import hashlib
+import logging
+from typing import Optional
+
+from app.core import response_cache
+from app.db import storage
+from app.repositories import image_repository
+
+logger = logging.getLogger(__name__)
+
+# 直接アップロード (署名付きURL) した画像の内容ハッシュをワーカーで求める。
+# 登録時 (POST /images/direct/complete) は元画像の先頭だけを読んで EXIF を解析し、
+# content_hash は NULL のまま登録する (API サーバーが元画像全体を読まないように)。
+# このジョブで保存済みの内容からハッシュを求め、同じユーザーに同じ内容の画像が
+# 登録済みだった場合は、後から登録された方を削除する。
+
+
+async def _sha256(bucket: str, path: str) -> str:
+    digest = hashlib.sha256()
+    async for chunk in storage.download_stream(bucket, path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def hash_uploaded_image(image_id: int, user_id: str, bucket: str, path: str) -> Optional[str]:
+    """内容ハッシュを保存して返す。重複として削除した場合は None"""
+    content_hash = await _sha256(bucket, path)
+    try:
+        await image_repository.update_image(image_id, user_id, {"content_hash": content_hash})
+        return content_hash
+    except Exception as e:
+        # 23505: 同じユーザーに同じ内容の画像が登録済み
+        if getattr(e, "code", None) != "23505":
+            raise
+
+    deleted = await image_repository.delete_images([image_id], user_id)
+    # 派生画像 (サムネイル) が先に作られていればそれも消す (存在しないパスは無視される)
+    derivatives = [
+        storage.path_from_public_url(bucket, url)
+        for row in deleted
+        for url in (row.get("derivatives") or {}).values()
+    ]
+    await storage.remove(bucket, [path, *(p for p in derivatives if p)])
+    await response_cache.bump(user_id)
+    logger.info("Removed duplicate upload: image_id=%s content_hash=%s", image_id, content_hash)
+    return None
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from PIL import Image, UnidentifiedImageError
+
+from app.ai.batcher import MicroBatcher
+from app.ai.geoclip import GeoLocator, Prediction, load_image
+from app.core import response_cache
+from app.core.config import settings
+from app.db import storage
+from app.repositories import image_repository, location_repository
+from app.services import geoname_service
+
+logger = logging.getLogger(__name__)
+
+# images.location_status の遷移: NO_GPS -> AI_PROCESSING -> AI_PREDICTED / AI_FAILED
+STATUS_NO_GPS = "NO_GPS"
+STATUS_AI_PROCESSING = "AI_PROCESSING"
+STATUS_AI_PREDICTED = "AI_PREDICTED"
+STATUS_AI_FAILED = "AI_FAILED"
+
+# 再試行しても結果が変わらないエラー (画像URLが不正・画像として読めない)
+# それ以外 (ダウンロード・推論・DB の一時的な失敗) は AI_PROCESSING のまま残し、
+# claim_geolocation のタイムアウト後に再取得させる
+PERMANENT_ERRORS = (ValueError, UnidentifiedImageError, Image.DecompressionBombError)
+
+
+async def save_predictions(image_id: int, user_id: str, predictions: List[Prediction]) -> None:
+    """推定結果の上位 k 件を locations に rank 付きで登録し、ステータスを更新する"""
+    rows = [
+        {
+            "image_id": image_id,
+            "latitude": lat,
+            "longitude": lon,
+            "source_type": "AI",
+            "rank": rank,
+            "confidence": prob,
+            "geom": f"SRID=4326;POINT({lon} {lat})",
+        }
+        for rank, (lat, lon, prob) in enumerate(predictions, start=1)
+    ]
+    await geoname_service.fill_geonames(rows)
+    # 途中で失敗した以前の試行の行が残っていれば置き換える
+    await location_repository.delete_ai_locations(image_id)
+    await location_repository.insert_locations(rows)
+    await image_repository.update_image(image_id, user_id, {"location_status": STATUS_AI_PREDICTED})
+    await response_cache.bump(user_id)
+
+
+class GeolocationWorker:
+    """
+    NO_GPS の画像を取得し、GeoCLIP でまとめて位置推定するワーカー。
+    - 画像のダウンロード・デコードは画像ごとに並行して行う
+    - 推論は MicroBatcher で動的にバッチ化し、専用スレッド1本で順番に実行する
+      (torch 自体が intra-op スレッドで並列化するため)
+    """
+
+    def __init__(self, locator: GeoLocator):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="geoclip")
+        self.batcher: MicroBatcher = MicroBatcher(
+            lambda images: locator.predict(images, settings.GEOCLIP_TOP_K),
+            max_batch_size=settings.GEOCLIP_BATCH_SIZE,
+            max_wait=settings.GEOCLIP_BATCH_TIMEOUT_MS / 1000,
+            executor=self._executor,
+        )
+
+    async def process(self, row: Dict[str, Any]) -> None:
+        image_id = row["id"]
+        try:
+            path = storage.path_from_public_url(settings.STORAGE_BUCKET, row["image_url"])
+            if path is None:
+                raise ValueError(f"Unknown image_url: {row['image_url']}")
+            data = await storage.download(settings.STORAGE_BUCKET, path)
+            image = await asyncio.to_thread(load_image, data)
+            predictions = await self.batcher.submit(image)
+            await save_predictions(image_id, row["user_id"], predictions)
+        except Exception as e:
+            attempts = row.get("geolocation_attempts", 0)
+            if not isinstance(e, PERMANENT_ERRORS) and attempts < settings.GEOCLIP_MAX_ATTEMPTS:
+                logger.exception("Geolocation failed, will retry: image_id=%s attempt=%s", image_id, attempts)
+                return
+            logger.exception("Geolocation failed: image_id=%s", image_id)
+            await image_repository.update_image(image_id, row["user_id"], {
+                "location_status": STATUS_AI_FAILED,
+                "processing_started_at": None,
+            })
+
+    async def claim_pending(self, limit: int) -> List[Dict[str, Any]]:
+        # 処理中にワーカーが停止した画像も、タイムアウト後に再取得される
+        return await image_repository.claim_for_geolocation(
+            limit, settings.GEOCLIP_PROCESSING_TIMEOUT_SECONDS, settings.GEOCLIP_MAX_ATTEMPTS
+        )
+
+    async def run_once(self) -> int:
+        """待機中の画像を1回分取得して処理し、処理件数を返す"""
+        rows = await self.claim_pending(settings.GEOCLIP_BATCH_SIZE * 4)
+        await asyncio.gather(*(self.process(row) for row in rows))
+        return len(rows)
+
+    async def run_forever(self) -> None:
+        self.batcher.start()
+        try:
+            while True:
+                if not await self.run_once():
+                    await asyncio.sleep(settings.GEOCLIP_POLL_INTERVAL_SECONDS)
+        finally:
+            await self.batcher.stop()
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.spatial_index import SphereKDTree
+
+logger = logging.getLogger(__name__)
+
+# オフラインの逆ジオコーディング (緯度経度 -> 最寄りの都市名) で locations.geoname を埋める。
+# GeoNames の都市データ (cities1000.txt など、タブ区切り) を起動時に読み込み、
+# SphereKDTree で最近傍の都市を引く。外部サービスは呼ばない。
+# 同じディレクトリに admin1CodesASCII.txt があれば州・都道府県名も含める ("Shibuya, Tokyo, JP")。
+# データ: https://download.geonames.org/export/dump/ (CC BY 4.0)
+
+# GeoNames の列 (geoname_id, name, asciiname, alternatenames, latitude, longitude,
+# feature_class, feature_code, country_code, cc2, admin1_code, ..., population (14列目), ...)
+_NAME, _LAT, _LON, _COUNTRY, _ADMIN1, _POPULATION = 1, 4, 5, 8, 10, 14
+
+
+def _load_admin1(path: str) -> Dict[str, str]:
+    """admin1CodesASCII.txt: "JP.40<TAB>Tokyo<TAB>..." -> {"JP.40": "Tokyo"}"""
+    names = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                code, name = line.split("\t", 2)[:2]
+                names[code] = name
+    return names
+
+
+def load_cities(path: str, min_population: int = 0) -> Tuple[List[float], List[float], List[str]]:
+    admin1 = _load_admin1(os.path.join(os.path.dirname(path), "admin1CodesASCII.txt"))
+    lats, lons, names = [], [], []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if min_population and int(cols[_POPULATION] or 0) < min_population:
+                continue
+            country = cols[_COUNTRY]
+            region = admin1.get(f"{country}.{cols[_ADMIN1]}")
+            lats.append(float(cols[_LAT]))
+            lons.append(float(cols[_LON]))
+            names.append(", ".join(part for part in (cols[_NAME], region, country) if part))
+    return lats, lons, names
+
+
+class ReverseGeocoder:
+    """
+    最寄りの都市名を返す。名前は1つの UTF-8 バイト列と開始位置の配列で持つ
+    (都市数十万件分の str オブジェクトを作らないため)。
+    """
+
+    def __init__(self, lats: Sequence[float], lons: Sequence[float], names: Sequence[str], max_distance_km: float):
+        import numpy as np
+
+        self.tree = SphereKDTree(lats, lons)
+        encoded = [name.encode() for name in names]
+        self._names = b"".join(encoded)
+        self._offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=self._offsets[1:])
+        self.max_distance_km = max_distance_km
+
+    def __len__(self) -> int:
+        return self.tree.size
+
+    @property
+    def nbytes(self) -> int:
+        return self.tree.nbytes + len(self._names) + self._offsets.nbytes
+
+    def name(self, index: int) -> str:
+        return self._names[self._offsets[index]:self._offsets[index + 1]].decode()
+
+    def lookup_indexes(self, lats: Sequence[float], lons: Sequence[float]):
+        """最寄りの都市の添字 (max_distance_km より遠ければ -1) の配列"""
+        _, indexes = self.tree.query(lats, lons, max_km=self.max_distance_km)
+        return indexes
+
+    def lookup(self, lats: Sequence[float], lons: Sequence[float]) -> List[Optional[str]]:
+        return [self.name(i) if i >= 0 else None for i in self.lookup_indexes(lats, lons).tolist()]
+
+
+_geocoder: Optional[ReverseGeocoder] = None
+_lock = threading.Lock()
+
+
+def get_geocoder() -> Optional[ReverseGeocoder]:
+    """都市データを (初回のみ) 読み込む。GEONAMES_PATH が未設定なら None"""
+    global _geocoder
+    if not settings.GEONAMES_PATH:
+        return None
+    with _lock:
+        if _geocoder is None:
+            started = time.perf_counter()
+            lats, lons, names = load_cities(settings.GEONAMES_PATH, settings.GEONAMES_MIN_POPULATION)
+            _geocoder = ReverseGeocoder(lats, lons, names, settings.GEONAMES_MAX_DISTANCE_KM)
+            logger.info(
+                "Reverse geocoder loaded: %d places, %.1f MB, %.1fs",
+                len(_geocoder), _geocoder.nbytes / 2**20, time.perf_counter() - started,
+            )
+    return _geocoder
+
+
+async def warm_up() -> None:
+    # 読み込み・木の構築はイベントループを止めないようスレッドで行う
+    if settings.GEONAMES_PATH:
+        await asyncio.to_thread(get_geocoder)
+
+
+async def fill_geonames(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """locations の行 (latitude / longitude を持つ dict) の geoname をまとめて埋める"""
+    targets = [row for row in rows if not row.get("geoname") and row.get("latitude") is not None]
+    if not targets or not settings.GEONAMES_PATH:
+        return rows
+    geocoder = _geocoder or await asyncio.to_thread(get_geocoder)
+    names = geocoder.lookup([row["latitude"] for row in targets], [row["longitude"] for row in targets])
+    for row, name in zip(targets, names):
+        row["geoname"] = name
+    return rows
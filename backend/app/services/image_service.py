@@ -1,256 +1,538 @@
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import re
 import uuid
-from datetime import datetime
-from typing import List, Optional
-from PIL import Image
-from PIL.ExifTags import TAGS, GPSTAGS
+from typing import AsyncIterator, List, Optional, Tuple
 from fastapi import UploadFile, HTTPException
-from app.db.supabase import supabase
-from app.schemas.image import ImageUpdate
-# 対応画像形式
-ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png"}
-
-# --- 既存のヘルパー関数 (_get_decimal_from_dms, extract_exif_data) は省略せず残してください ---
-def _get_decimal_from_dms(dms, ref):
-    # (前回と同じコード)
-    degrees = dms[0]
-    minutes = dms[1]
-    seconds = dms[2]
-    decimal = degrees + (minutes / 60.0) + (seconds / 3600.0)
-    if ref in ['S', 'W']:
-        decimal = -decimal
-    return decimal
-
-def extract_exif_data(image: Image.Image):
-    # (前回と同じコード)
-    exif_data = image._getexif()
-    if not exif_data:
-        return None, None, None
-    gps_info = {}
-    taken_at = None
-    for tag, value in exif_data.items():
-        tag_name = TAGS.get(tag, tag)
-        if tag_name == "DateTimeOriginal":
-            try:
-                taken_at = datetime.strptime(value, "%Y:%m:%d %H:%M:%S")
-            except:
-                pass
-        if tag_name == "GPSInfo":
-            for t in value:
-                sub_tag = GPSTAGS.get(t, t)
-                gps_info[sub_tag] = value[t]
-    lat = None
-    lon = None
-    if gps_info:
-        if "GPSLatitude" in gps_info and "GPSLatitudeRef" in gps_info:
-            lat = _get_decimal_from_dms(gps_info["GPSLatitude"], gps_info["GPSLatitudeRef"])
-        if "GPSLongitude" in gps_info and "GPSLongitudeRef" in gps_info:
-            lon = _get_decimal_from_dms(gps_info["GPSLongitude"], gps_info["GPSLongitudeRef"])
-    return lat, lon, taken_at
+from starlette.concurrency import run_in_threadpool
+from app.core import metrics, response_cache
+from app.core.config import settings
+from app.db import storage
+from app.repositories import image_repository, location_repository, tag_repository
+from app.schemas.image import ImageFilter, ImageUpdate
+from app.services import geoname_service, imaging, metadata, tag_service, upload_service
+from app.services.metadata import PhotoMetadata
+from app.worker import queue as task_queue
+from app.worker.jobs import CONTENT_HASH, STORAGE_CLEANUP, THUMBNAILS
 
 # --- ① 画像アップロード (POST /api/v1/images) 用 ---
+def _inspect_upload(fileobj):
+    """
+    内容ハッシュ・知覚ハッシュ (UPLOAD_PHASH_ENABLED の場合)・EXIF (撮影日時・GPS) をまとめて求める。
+    いずれもファイルを読む処理なのでスレッドプールで呼ぶ。
+    """
+    with metrics.span("image", "hash"):
+        content_hash = upload_service.hash_file(fileobj)
+    with metrics.span("image", "phash"):
+        phash = imaging.perceptual_hash(fileobj) if settings.UPLOAD_PHASH_ENABLED else None
+    with metrics.span("image", "exif"):
+        return content_hash, phash, metadata.read_metadata(fileobj)
+
+async def _find_duplicates(user_id: str, hashes: List[str]):
+    """内容ハッシュ -> 登録済みの画像 (duplicate フラグ付き)"""
+    rows = await image_repository.find_by_content_hashes(user_id, hashes)
+    return {row["content_hash"]: {**_flatten_embedded(row), "duplicate": True} for row in rows}
+
+async def _store_original(file: UploadFile, user_id: str, ext: str, size: int):
+    """元画像をストレージへチャンク単位でストリーミングアップロードし、(パス, 公開URL) を返す"""
+    file_path = f"{user_id}/{uuid.uuid4()}.{ext}"
+    await storage.upload_stream(
+        settings.STORAGE_BUCKET,
+        file_path,
+        upload_service.iter_chunks(file),
+        size=size,
+        content_type=file.content_type,
+    )
+    return file_path, storage.get_public_url(settings.STORAGE_BUCKET, file_path)
+
+def _build_image_row(user_id: str, public_url: str, meta: PhotoMetadata, content_hash: str, phash: Optional[int]):
+    # 設計要件: GPS有無に応じて分岐
+    # EXIFがあれば location_status="EXIF_PRESENT", なければ "NO_GPS"
+    return {
+        "user_id": user_id,
+        "image_url": public_url,
+        "thumbnail_url": public_url,
+        "taken_at": meta.taken_at.isoformat() if meta.taken_at else None,
+        "location_status": "EXIF_PRESENT" if meta.has_gps else "NO_GPS",
+        "is_favorite": False,
+        "content_hash": content_hash,
+        "phash": phash,
+    }
+
+def _object_job(image_id: int, user_id: str, file_path: str):
+    return {"image_id": image_id, "user_id": user_id, "bucket": settings.STORAGE_BUCKET, "path": file_path}
+
+def _build_location_row(image_id: int, meta: PhotoMetadata):
+    return {
+        "image_id": image_id,
+        "latitude": meta.latitude,
+        "longitude": meta.longitude,
+        "altitude": meta.altitude,
+        "source_type": "EXIF",
+        "geom": f"SRID=4326;POINT({meta.longitude} {meta.latitude})"
+    }
+
+async def _discard_originals(file_paths: List[str]) -> None:
+    """
+    登録に失敗した元画像をストレージから削除する。
+    削除にも失敗した場合はクリーンアップジョブに回し、オブジェクトを取り残さない。
+    """
+    try:
+        await storage.remove(settings.STORAGE_BUCKET, file_paths)
+    except Exception:
+        with contextlib.suppress(Exception):
+            await task_queue.enqueue(STORAGE_CLEANUP, {"bucket": settings.STORAGE_BUCKET, "paths": file_paths})
+
 async def create_image(file: UploadFile, user_id: str):
-    filename = file.filename
-    ext = filename.split(".")[-1].lower() if "." in filename else ""
-    if ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(status_code=400, detail="Invalid file type")
+    ext = upload_service.get_extension(file.filename)
+
+    # ファイル全体をメモリに読み込まず、スプール済みファイルのサイズだけ確認する
+    size = upload_service.get_upload_size(file.file)
+    upload_service.check_upload_size(size)
+
+    try:
+        content_hash, phash, meta = await run_in_threadpool(_inspect_upload, file.file)
+
+        # 同じ内容の画像が登録済みなら、ストレージへ送らずに既存の画像を返す
+        duplicates = await _find_duplicates(user_id, [content_hash])
+        if content_hash in duplicates:
+            return duplicates[content_hash]
+
+        file_path, _ = await _store_original(file, user_id, ext, size)
+        return await _register_image(user_id, file_path, content_hash, phash, meta)
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Image upload failed: {str(e)}")
 
+async def _register_image(user_id: str, file_path: str, content_hash: str, phash: Optional[int], meta: PhotoMetadata):
+    """
+    ストレージへ保存済みの元画像を DB に登録する (images / locations / サムネイル生成ジョブ)。
+    同じ内容の画像が先に登録されていた場合はオブジェクトを削除し、既存の画像を返す。
+    登録に失敗した場合も登録した行とオブジェクトを削除してから例外を送出する。
+    """
+    public_url = storage.get_public_url(settings.STORAGE_BUCKET, file_path)
     try:
-        content = await file.read()
-        from io import BytesIO
-        image_stream = BytesIO(content)
-        
-        with Image.open(image_stream) as img:
-            lat, lon, taken_at = extract_exif_data(img)
-            # 設計要件: GPS有無に応じて分岐
-            # EXIFがあれば location_status="EXIF_PRESENT", なければ "NO_GPS"
-        
-        file_path = f"{user_id}/{uuid.uuid4()}.{ext}"
-        bucket_name = "images"
-
-        # Storageへアップロード
-        supabase.storage.from_(bucket_name).upload(
-            path=file_path,
-            file=content,
-            file_options={"content-type": file.content_type}
+        new_image = await image_repository.insert_image(
+            _build_image_row(user_id, public_url, meta, content_hash, phash)
         )
-        public_url_res = supabase.storage.from_(bucket_name).get_public_url(file_path)
-        
-        # DB登録
-        image_data = {
-            "user_id": user_id,
-            "image_url": public_url_res,
-            "thumbnail_url": public_url_res,
-            "taken_at": taken_at.isoformat() if taken_at else None,
-            "location_status": "EXIF_PRESENT" if (lat and lon) else "NO_GPS",
-            "is_favorite": False
-        }
-        
-        img_res = supabase.table("images").insert(image_data).execute()
-        new_image = img_res.data[0]
-        image_id = new_image["id"]
-
-        # GPSがある場合のみ locations に登録
-        if lat is not None and lon is not None:
-            location_data = {
-                "image_id": image_id,
-                "latitude": lat,
-                "longitude": lon,
-                "source_type": "EXIF",
-                "geom": f"POINT({lon} {lat})"
-            }
-            supabase.table("locations").insert(location_data).execute()
-
-        # レスポンス用に結合データを整形
-        return {
-            **new_image,
-            "latitude": lat,
-            "longitude": lon
-        }
+    except Exception:
+        await _discard_originals([file_path])
+        raise
+    if new_image is None:
+        # 同じ画像の同時アップロードが先に登録された: 送信したオブジェクトは不要
+        await storage.remove(settings.STORAGE_BUCKET, [file_path])
+        return (await _find_duplicates(user_id, [content_hash]))[content_hash]
+    image_id = new_image["id"]
+
+    try:
+        # GPSがある場合のみ locations に登録 (地名はオフラインの逆ジオコーディングで付ける)
+        geoname = None
+        if meta.has_gps:
+            [location_row] = await geoname_service.fill_geonames([_build_location_row(image_id, meta)])
+            geoname = location_row.get("geoname")
+            await location_repository.insert_location(location_row)
+
+        # サムネイルはジョブキュー経由でワーカーが生成する (それまでは元画像を表示)
+        await task_queue.enqueue(THUMBNAILS, _object_job(image_id, user_id, file_path))
+        if content_hash is None:
+            # 内容ハッシュ未計算 (直接アップロード): ワーカーで求めて重複を検出する
+            await task_queue.enqueue(CONTENT_HASH, _object_job(image_id, user_id, file_path))
+    except Exception:
+        # 登録を取り消す (locations は images の削除に連動して消える)
+        with contextlib.suppress(Exception):
+            await image_repository.delete_images([image_id], user_id)
+        await _discard_originals([file_path])
+        raise
+    await response_cache.bump(user_id)
+
+    # レスポンス用に結合データを整形
+    return {
+        **new_image,
+        "latitude": meta.latitude,
+        "longitude": meta.longitude,
+        "geoname": geoname,
+    }
 
+# --- ①'' 直接アップロード (POST /api/v1/images/direct) 用 ---
+# クライアントは署名付きURLへ元画像を直接 PUT し、API は完了通知を受けてから登録する。
+# 元画像の本文は API サーバーを経由しない (EXIF 解析には先頭だけを範囲取得する)。
+DIRECT_UPLOAD_HEAD_BYTES = 256 * 1024
+
+async def create_direct_upload(user_id: str, filename: str, size: int, content_hash: Optional[str]):
+    """
+    直接アップロード用の署名付きURLを発行する。
+    content_hash が登録済みの画像と一致する場合は URL を発行せず、既存の画像を返す。
+    """
+    ext = upload_service.get_extension(filename)
+    upload_service.check_upload_size(size)
+
+    if content_hash:
+        duplicates = await _find_duplicates(user_id, [content_hash])
+        if content_hash in duplicates:
+            return {"duplicate": duplicates[content_hash]}
+
+    file_path = f"{user_id}/{uuid.uuid4()}.{ext}"
+    upload_url = await storage.create_signed_upload_url(settings.STORAGE_BUCKET, file_path)
+    return {"upload_url": upload_url, "path": file_path}
+
+async def complete_direct_upload(user_id: str, file_path: str):
+    """
+    署名付きURLへのアップロード完了後に呼ばれ、オブジェクトを検証して登録する。
+    元画像の本文はここでも読まない: EXIF 用に先頭だけを範囲取得し、
+    内容ハッシュ (重複の検出) はワーカーのジョブ (CONTENT_HASH) で求める。
+    """
+    if not file_path.startswith(f"{user_id}/") or ".." in file_path:
+        raise HTTPException(status_code=403, detail="Invalid upload path")
+    upload_service.get_extension(file_path)
+
+    size = await storage.object_size(settings.STORAGE_BUCKET, file_path)
+    if size is None:
+        raise HTTPException(status_code=404, detail="Uploaded object not found")
+    if size > settings.UPLOAD_MAX_BYTES:
+        await storage.remove(settings.STORAGE_BUCKET, [file_path])
+        upload_service.check_upload_size(size)
+
+    try:
+        # EXIF (APP1 / eXIf / HEIF の Exif アイテム) はほぼ先頭にあるため、先頭だけを取得して解析する
+        head = await storage.download(settings.STORAGE_BUCKET, file_path, (0, min(size, DIRECT_UPLOAD_HEAD_BYTES)))
+        meta = await run_in_threadpool(metadata.read_metadata, io.BytesIO(head))
+        # クライアントが申告したハッシュは検証できないため使わない (NULL で登録し、ジョブで埋める)
+        return await _register_image(user_id, file_path, None, None, meta)
     except HTTPException as he:
         raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Image upload failed: {str(e)}")
 
+# --- ①' 一括アップロード (POST /api/v1/images/batch) 用 ---
+async def create_images_batch(files: List[UploadFile], user_id: str):
+    """
+    複数ファイルをまとめて登録する。
+    1. 内容ハッシュ計算・EXIF 解析をスレッドプールで並列実行
+    2. 登録済み・バッチ内で重複する画像を除外 (status="duplicate" で既存の画像を返す)
+    3. ストレージへのアップロードをセマフォで同時数を制限しつつ並列実行
+    4. images / locations をそれぞれ1回のバルクINSERTで登録
+    ファイル単位で成否を返し、一部が失敗しても残りは登録する。
+    """
+    if len(files) > settings.BATCH_UPLOAD_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files (max {settings.BATCH_UPLOAD_MAX_FILES})",
+        )
+
+    results = [{"filename": f.filename, "status": "failed"} for f in files]
+
+    def fail(i: int, error: str):
+        results[i]["error"] = error
+
+    # 0. 形式・サイズの検証
+    pending = []  # (index, ext, size)
+    for i, file in enumerate(files):
+        try:
+            ext = upload_service.get_extension(file.filename)
+            size = upload_service.get_upload_size(file.file)
+            upload_service.check_upload_size(size)
+            pending.append((i, ext, size))
+        except HTTPException as he:
+            fail(i, he.detail)
+
+    # 1. ハッシュ計算・EXIF 解析 (並列)
+    inspected = await asyncio.gather(
+        *(run_in_threadpool(_inspect_upload, files[i].file) for i, _, _ in pending),
+        return_exceptions=True,
+    )
+
+    targets = []  # (index, ext, size, content_hash, phash, PhotoMetadata)
+    for (i, ext, size), res in zip(pending, inspected):
+        if isinstance(res, Exception):
+            fail(i, f"Invalid image: {res}")
+        else:
+            targets.append((i, ext, size, *res))
+
+    # 2. 重複の除外 (登録済みの画像・同じバッチ内の2枚目以降はストレージへ送らない)
+    existing = await _find_duplicates(user_id, list({t[3] for t in targets})) if targets else {}
+    first_index = {}  # content_hash -> バッチ内で最初のファイルの index
+    same_as = []      # (index, content_hash): バッチ内の重複
+    unique = []
+    for target in targets:
+        i, content_hash = target[0], target[3]
+        if content_hash in existing:
+            results[i].update({"status": "duplicate", "image": existing[content_hash]})
+        elif content_hash in first_index:
+            same_as.append((i, content_hash))
+        else:
+            first_index[content_hash] = i
+            unique.append(target)
+
+    # 3. ストレージへアップロード (同時数を制限)
+    semaphore = asyncio.Semaphore(settings.BATCH_UPLOAD_CONCURRENCY)
+
+    async def upload(i: int, ext: str, size: int):
+        async with semaphore:
+            return await _store_original(files[i], user_id, ext, size)
+
+    stored = await asyncio.gather(
+        *(upload(i, ext, size) for i, ext, size, _, _, _ in unique),
+        return_exceptions=True,
+    )
+
+    uploaded = []  # (index, file_path, public_url, content_hash, phash, PhotoMetadata)
+    for (i, _, _, content_hash, phash, meta), res in zip(unique, stored):
+        if isinstance(res, Exception):
+            fail(i, f"Storage upload failed: {res}")
+        else:
+            uploaded.append((i, res[0], res[1], content_hash, phash, meta))
+
+    if uploaded:
+        await _register_batch(uploaded, user_id, results)
+        await response_cache.bump(user_id)
+
+    # バッチ内の重複は最初のファイルの結果に従う
+    for i, content_hash in same_as:
+        first = results[first_index[content_hash]]
+        if first.get("image"):
+            results[i].update({"status": "duplicate", "image": {**first["image"], "duplicate": True}})
+        else:
+            fail(i, "Duplicate of a file that failed")
+
+    return _batch_summary(results)
+
+async def _register_batch(uploaded, user_id: str, results) -> None:
+    """
+    アップロード済みのファイルを images / locations へバルクINSERTし、results を更新する。
+    登録に失敗した場合は登録した行とアップロード済みのオブジェクトを削除する。
+    """
+    inserted = []
+    try:
+        inserted = await image_repository.insert_images([
+            _build_image_row(user_id, url, meta, content_hash, phash)
+            for _, _, url, content_hash, phash, meta in uploaded
+        ])
+        by_hash = {image["content_hash"]: image for image in inserted}
+        created = [(by_hash[item[3]], item) for item in uploaded if item[3] in by_hash]
+        location_rows = [
+            _build_location_row(image["id"], meta)
+            for image, (_, _, _, _, _, meta) in created
+            if meta.has_gps
+        ]
+        if location_rows:
+            await geoname_service.fill_geonames(location_rows)
+            await location_repository.insert_locations(location_rows)
+    except Exception as e:
+        for item in uploaded:
+            results[item[0]]["error"] = f"Database insert failed: {e}"
+        if inserted:
+            with contextlib.suppress(Exception):
+                await image_repository.delete_images([image["id"] for image in inserted], user_id)
+        await _discard_originals([file_path for _, file_path, _, _, _, _ in uploaded])
+        return
+
+    geonames = {row["image_id"]: row.get("geoname") for row in location_rows}
+    for image, (i, _, _, _, _, meta) in created:
+        results[i].update({
+            "status": "created",
+            "image": {
+                **image,
+                "latitude": meta.latitude,
+                "longitude": meta.longitude,
+                "geoname": geonames.get(image["id"]),
+            },
+        })
+
+    # サムネイル生成ジョブもまとめて登録
+    if created:
+        await task_queue.enqueue_many(THUMBNAILS, [
+            _object_job(image["id"], user_id, file_path)
+            for image, (_, file_path, _, _, _, _) in created
+        ])
+
+    # 同じ画像の同時アップロードが先に登録されたもの: 送信したオブジェクトを消して登録済みの画像を返す
+    raced = [item for item in uploaded if item[3] not in by_hash]
+    if raced:
+        with contextlib.suppress(Exception):
+            await storage.remove(settings.STORAGE_BUCKET, [file_path for _, file_path, _, _, _, _ in raced])
+        existing = await _find_duplicates(user_id, [item[3] for item in raced])
+        for i, _, _, content_hash, _, _ in raced:
+            if content_hash in existing:
+                results[i].update({"status": "duplicate", "image": existing[content_hash]})
+            else:
+                results[i]["error"] = "Database insert failed: duplicate image not found"
+
+def _batch_summary(results):
+    created = sum(1 for r in results if r["status"] == "created")
+    duplicates = sum(1 for r in results if r["status"] == "duplicate")
+    return {
+        "created": created,
+        "duplicates": duplicates,
+        "failed": len(results) - created - duplicates,
+        "results": results,
+    }
+
 # --- ② ギャラリー取得 (GET /api/v1/images) 用 ---
-async def get_images_list(user_id: str, limit: int = 20, offset: int = 0):
+_TIMESTAMP_RE = re.compile(r"^[0-9]{4}-[0-9]{2}-[0-9]{2}[T ][0-9:.]+([+-][0-9:]+|Z)?$")
+
+def encode_cursor(row) -> str:
+    # 最後の行の (created_at, id) を不透明な文字列にする
+    raw = json.dumps([row["created_at"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, image_id = json.loads(base64.urlsafe_b64decode(padded))
+        # タイムスタンプ以外の文字列がフィルタに混入しないようにする
+        if not _TIMESTAMP_RE.match(created_at):
+            raise ValueError(created_at)
+        return created_at, int(image_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _flatten_embedded(row):
+    """埋め込み取得した locations / image_tags を ImageResponse の形に展開する"""
+    locations = row.pop("locations", None) or []
+    if isinstance(locations, dict):
+        locations = [locations]
+    if locations:
+        row["latitude"] = locations[0]["latitude"]
+        row["longitude"] = locations[0]["longitude"]
+        row["geoname"] = locations[0]["geoname"]
+    image_tags = row.pop("image_tags", None)
+    if image_tags is not None:
+        row["tags"] = [item["tags"] for item in image_tags if item.get("tags")]
+    return row
+
+async def get_images_list(
+    user_id: str,
+    limit: int = 20,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    embed: bool = False,
+    filters: Optional[ImageFilter] = None,
+):
     # ユーザーの画像をページネーション付きで取得
-    res = supabase.table("images")\
-        .select("*")\
-        .eq("user_id", user_id)\
-        .order("created_at", desc=True)\
-        .range(offset, offset + limit - 1)\
-        .execute()
-    return res.data
+    # cursor 指定時はキーセット方式 (前ページ最後の行の続きから)
+    after = decode_cursor(cursor) if cursor else None
+    # 1件多く取得して次ページの有無を判定する
+    if filters is not None and not filters.is_empty():
+        # 絞り込みあり: 位置・タグ込みの行が返る
+        rows = await image_repository.search_images(
+            user_id, filters.model_dump(mode="json"), limit + 1, offset, after=after
+        )
+    else:
+        rows = await image_repository.list_images(user_id, limit + 1, offset, after=after, embed=embed)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if embed and (filters is None or filters.is_empty()):
+        rows = [_flatten_embedded(row) for row in rows]
+    return {
+        "items": rows,
+        "next_cursor": encode_cursor(rows[-1]) if has_more else None,
+    }
+
+async def export_images_ndjson(user_id: str) -> AsyncIterator[bytes]:
+    """
+    ライブラリ全体を1行1画像の NDJSON で順次返す (位置・タグ込み)。
+    キーセットでページを読み進めるため、件数が多くてもメモリ使用量は1ページ分に収まる。
+    """
+    after = None
+    while True:
+        rows = await image_repository.list_images(
+            user_id, settings.EXPORT_PAGE_SIZE, after=after, embed=True
+        )
+        if not rows:
+            break
+        yield "".join(json.dumps(_flatten_embedded(row), ensure_ascii=False) + "\n" for row in rows).encode()
+        if len(rows) < settings.EXPORT_PAGE_SIZE:
+            break
+        after = (rows[-1]["created_at"], rows[-1]["id"])
 
 # --- ③ 詳細取得 (GET /api/v1/images/{id}) 用 ---
 async def get_image_detail(image_id: int, user_id: str):
-    # locations情報も結合して取得したいが、Supabase py clientの結合は少し癖があるため
-    # まずimageを取得し、必要ならlocationを引く形が確実
-    img_res = supabase.table("images").select("*").eq("id", image_id).eq("user_id", user_id).single().execute()
-    
-    if not img_res.data:
+    # 画像本体・代表位置 (locations)・タグを image_detail 関数で1回の往復で取得
+    image = await image_repository.get_image_detail(image_id, user_id)
+    if not image:
         raise HTTPException(status_code=404, detail="Image not found")
-    
-    image = img_res.data
-    
-    # 関連するlocationを取得
-    loc_res = supabase.table("locations").select("*").eq("image_id", image_id).maybe_single().execute()
-    
-    # データを結合
-    if loc_res.data:
-        image["latitude"] = loc_res.data["latitude"]
-        image["longitude"] = loc_res.data["longitude"]
-        image["geoname"] = loc_res.data["geoname"]
-        image["address"] = loc_res.data.get("address") # DB設計にあれば
-    
     return image
 
 # --- ④ 画像削除 (DELETE /api/v1/images/{id}) 用 ---
+def _storage_paths(row: dict) -> List[str]:
+    """画像1件がストレージ上に持つオブジェクト (元画像 + 派生画像) のパス"""
+    urls = [row.get("image_url"), *(row.get("derivatives") or {}).values()]
+    paths = (storage.path_from_public_url(settings.STORAGE_BUCKET, url) for url in urls)
+    return list(dict.fromkeys(p for p in paths if p))
+
+async def delete_images(image_ids: List[int], user_id: str) -> List[int]:
+    """
+    画像をまとめて削除し、削除できた id を返す (他ユーザーの画像・存在しない id は無視)。
+    DB は1回の DELETE で削除し (locations / image_tags は CASCADE)、
+    ストレージ上の元画像・派生画像の削除は1件のジョブとしてワーカーに任せる (失敗時は再試行される)。
+    """
+    if len(image_ids) > settings.IMAGE_DELETE_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many ids (max {settings.IMAGE_DELETE_MAX_IDS})",
+        )
+    ids = list(dict.fromkeys(image_ids))
+    if not ids:
+        return []
+
+    deleted = await image_repository.delete_images(ids, user_id)
+    if deleted:
+        await response_cache.bump(user_id)
+    paths = [path for row in deleted for path in _storage_paths(row)]
+    if paths:
+        await task_queue.enqueue(STORAGE_CLEANUP, {"bucket": settings.STORAGE_BUCKET, "paths": paths})
+    return [row["id"] for row in deleted]
+
 async def delete_image(image_id: int, user_id: str):
-    # まず画像の存在確認と所有権確認
-    img_res = supabase.table("images").select("image_url").eq("id", image_id).eq("user_id", user_id).single().execute()
-    if not img_res.data:
+    # 存在確認・所有権確認は DELETE の結果で行う (削除された行がなければ 404)
+    if not await delete_images([image_id], user_id):
         raise HTTPException(status_code=404, detail="Image not found")
-    
-    # DBから削除 (Cascade設定しているので locations なども自動で消えるはずだが、Storageは消えない)
-    supabase.table("images").delete().eq("id", image_id).eq("user_id", user_id).execute()
-    
-    # Storageから削除 (URLからパスを抽出するロジックが必要)
-    # 例: https://.../storage/v1/object/public/photos/USER_ID/UUID.jpg
-    try:
-        url = img_res.data["image_url"]
-        # バケツ名以降のパスを取得
-        file_path = url.split("/public/photos/")[1] 
-        supabase.storage.from_("photos").remove(file_path)
-    except:
-        pass # Storage削除失敗はログに残す程度で、APIとしては成功を返す運用が多い
-    
     return True
 
-def _update_image_tags(image_id: int, tag_names: List[str]):
+async def _update_image_tags(image_id: int, user_id: str, tag_names: List[str]):
     """
-    画像に紐付くタグを更新する。
-    1. 既存のタグ紐付けを削除
-    2. 入力されたタグ名が tags テーブルになければ作成
-    3. image_tags テーブルに紐付けを作成
+    画像に紐付くタグを更新し、紐付け後のタグ ({"id", "name"} のリスト) を返す。
+    タグ数によらず DB への問い合わせは1回 (set_image_tags 関数):
+    1. 入力されたタグ名が tags テーブルになければ作成 (同名の同時作成は ON CONFLICT で吸収)
+    2. image_tags の紐付けは追加・削除が必要なものだけ反映
+    (注意: tagsテーブルのポリシーによっては insert 権限が必要)
     """
     if tag_names is None:
         return
 
-    # 1. 既存の紐付けを全削除 (洗い替え)
-    supabase.table("image_tags").delete().eq("image_id", image_id).execute()
+    # 前後の空白を除去し、空文字と重複を除く (順序は維持)
+    names = list(dict.fromkeys(name.strip() for name in tag_names if name.strip()))
+    tags = await tag_repository.set_image_tags(image_id, names)
+    # 入力補完のインデックスに反映
+    tag_service.register_tags(user_id, tags)
+    return tags
 
-    if not tag_names:
-        return
 
-    # 2. タグIDの解決 (Find or Create)
-    tag_ids = []
-    
-    # 既存タグを一括取得
-    existing_tags = supabase.table("tags").select("id, name").in_("name", tag_names).execute()
-    existing_map = {t["name"]: t["id"] for t in existing_tags.data}
-
-    for name in tag_names:
-        name = name.strip()
-        if not name:
-            continue
-            
-        if name in existing_map:
-            tag_ids.append(existing_map[name])
-        else:
-            # 新規作成
-            # (注意: tagsテーブルのポリシーによっては insert 権限が必要)
-            res = supabase.table("tags").insert({"name": name}).execute()
-            if res.data:
-                tag_ids.append(res.data[0]["id"])
-    
-    # 3. 新しい紐付けを登録
-    if tag_ids:
-        insert_data = [{"image_id": image_id, "tag_id": tid} for tid in tag_ids]
-        supabase.table("image_tags").insert(insert_data).execute()
-
-
-# --- 修正: 詳細取得 (タグ情報も取得するように変更) ---
-async def get_image_detail(image_id: int, user_id: str):
-    # 画像本体
-    img_res = supabase.table("images").select("*").eq("id", image_id).eq("user_id", user_id).single().execute()
-    if not img_res.data:
-        raise HTTPException(status_code=404, detail="Image not found")
-    
-    image = img_res.data
-    
-    # Locations結合
-    loc_res = supabase.table("locations").select("*").eq("image_id", image_id).maybe_single().execute()
-    if loc_res.data:
-        image["latitude"] = loc_res.data["latitude"]
-        image["longitude"] = loc_res.data["longitude"]
-        image["geoname"] = loc_res.data["geoname"]
-
-    # ★追加: Tags結合
-    # Supabaseの結合クエリで tags を取得する
-    tags_res = supabase.table("image_tags").select("tag_id, tags(id, name)").eq("image_id", image_id).execute()
-    
-    # データ整形: [{"tag_id": 1, "tags": {"id": 1, "name": "..."}}] -> [{"id": 1, "name": "..."}]
-    image["tags"] = [item["tags"] for item in tags_res.data if item.get("tags")]
-    
-    return image
+# --- ③' 似た画像 (GET /api/v1/images/{id}/similar) 用 ---
+async def get_similar_images(image_id: int, user_id: str, max_distance: int, limit: int):
+    return await image_repository.find_similar(image_id, user_id, max_distance, limit)
 
 
 # --- 追加: 画像情報更新 (PUT対応) ---
 async def update_image_info(image_id: int, user_id: str, update_in: ImageUpdate):
     # まず更新データ作成
     data = update_in.model_dump(exclude={"tags"}, exclude_unset=True) # tagsは別処理
-    
-    if data:
-        data["updated_at"] = datetime.now().isoformat()
-        res = supabase.table("images").update(data).eq("id", image_id).eq("user_id", user_id).execute()
-        if not res.data:
-             raise HTTPException(status_code=404, detail="Image not found")
+
+    # 更新と所有権の確認を1回で行い、更新後の詳細 (位置・タグ込み) をそのまま受け取る
+    # (タグだけの更新でも、他ユーザーの画像を触らないよう先に確認する)
+    image = await image_repository.update_image_detail(image_id, user_id, data)
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
 
     # タグの更新 (tagsフィールドが含まれている場合のみ)
     if update_in.tags is not None:
-        _update_image_tags(image_id, update_in.tags)
+        image["tags"] = await _update_image_tags(image_id, user_id, update_in.tags)
+    await response_cache.bump(user_id)
     
-    # 更新後の最新状態を返す
-    return await get_image_detail(image_id, user_id)
\ No newline at end of file
+    # 更新後の最新状態を返す (再取得はしない)
+    return image
\ No newline at end of file
@@ -0,0 +1,61 @@
+from io import BytesIO
+from typing import BinaryIO, Dict, Union
+
+from PIL import Image, ImageOps
+from pillow_heif import register_heif_opener
+
+# Pillow を使う CPU 処理。ProcessPoolExecutor の子プロセスから呼ばれるため、
+# 設定やDBクライアントには依存させない (インポートが軽く、引数だけで完結する)。
+
+# iPhone の HEIC / HEIF を Image.open で開けるようにする
+# (子プロセスでもこのモジュールのインポート時に登録される)
+register_heif_opener()
+
+CONTENT_TYPES = {"WEBP": "image/webp", "AVIF": "image/avif", "JPEG": "image/jpeg"}
+
+
+def render_derivatives(data: bytes, sizes: Dict[str, int], fmt: str = "WEBP", quality: int = 80) -> Dict[str, bytes]:
+    """
+    元画像から長辺 sizes[name] ピクセルの派生画像を作る。
+    - JPEG は draft() で縮小デコードし、フル解像度の展開を避ける
+    - EXIF の Orientation を反映してから縮小する
+    - 大きいサイズから順に作り、次のサイズはその結果から縮小する
+    """
+    largest = max(sizes.values())
+    results: Dict[str, bytes] = {}
+
+    with Image.open(BytesIO(data)) as img:
+        img.draft("RGB", (largest, largest))
+        current = ImageOps.exif_transpose(img)
+        if current.mode not in ("RGB", "RGBA"):
+            current = current.convert("RGBA" if "A" in current.getbands() else "RGB")
+
+        for name, edge in sorted(sizes.items(), key=lambda kv: kv[1], reverse=True):
+            current = current.copy()
+            current.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            buf = BytesIO()
+            current.save(buf, format=fmt, quality=quality)
+            results[name] = buf.getvalue()
+
+    return results
+
+
+def perceptual_hash(fp: Union[BinaryIO, bytes]) -> int:
+    """
+    知覚ハッシュ (dHash, 64bit)。9x8 のグレースケールに縮小し、横に隣り合う画素の明暗をビットにする。
+    再圧縮・リサイズ程度の違いならハミング距離が小さくなる。
+    Postgres の bigint に収めるため符号付き整数で返す。
+    """
+    if isinstance(fp, bytes):
+        fp = BytesIO(fp)
+    with Image.open(fp) as img:
+        img.draft("L", (64, 64))
+        small = ImageOps.exif_transpose(img).convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits - (1 << 64) if bits >= (1 << 63) else bits
@@ -0,0 +1,362 @@
+import struct
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Dict, Optional, Tuple
+
+# 写真のメタデータ (撮影日時・GPS) を EXIF から読み取る。
+# 画像全体をデコードせず、JPEG は APP1、PNG は eXIf チャンク、HEIC は Exif アイテムへ
+# 直接シークして TIFF 構造を読み、必要なタグだけを取り出す。
+# 設定やDBクライアントには依存させない (imaging.py と同様、引数だけで完結する)。
+
+# TIFF / EXIF のタグ番号
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+TAG_OFFSET_TIME_ORIGINAL = 0x9011
+TAG_OFFSET_TIME_DIGITIZED = 0x9012
+GPS_LATITUDE_REF = 0x0001
+GPS_LATITUDE = 0x0002
+GPS_LONGITUDE_REF = 0x0003
+GPS_LONGITUDE = 0x0004
+GPS_ALTITUDE_REF = 0x0005
+GPS_ALTITUDE = 0x0006
+
+# TIFF の型番号 -> (1要素のバイト数, struct の書式)
+_TYPES = {
+    1: (1, "B"),    # BYTE
+    2: (1, "s"),    # ASCII
+    3: (2, "H"),    # SHORT
+    4: (4, "L"),    # LONG
+    5: (8, "LL"),   # RATIONAL
+    6: (1, "b"),    # SBYTE
+    7: (1, "s"),    # UNDEFINED
+    8: (2, "h"),    # SSHORT
+    9: (4, "l"),    # SLONG
+    10: (8, "ll"),  # SRATIONAL
+    13: (4, "L"),   # IFD (サブ IFD へのオフセット)
+}
+
+# セグメント・ボックスの走査で読む最大サイズ (壊れたファイルで巨大な読み込みをしない)
+_MAX_EXIF_BYTES = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class PhotoMetadata:
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    altitude: Optional[float] = None       # メートル (海面下は負)
+    taken_at: Optional[datetime] = None    # OffsetTimeOriginal があればタイムゾーン付き
+
+    @property
+    def has_gps(self) -> bool:
+        # 緯度・経度 0 も有効な位置として扱う
+        return self.latitude is not None and self.longitude is not None
+
+
+def read_metadata(fileobj: BinaryIO) -> PhotoMetadata:
+    """ファイルの先頭から EXIF を探して読み取る。見つからない・壊れている場合は空のレコード"""
+    fileobj.seek(0)
+    try:
+        tiff = _find_tiff(fileobj)
+        return parse_tiff(tiff) if tiff else PhotoMetadata()
+    except (struct.error, ValueError, IndexError, OverflowError, TypeError, KeyError):
+        # 想定外の型・長さのタグなど、壊れた EXIF はすべて「メタデータなし」として扱う
+        return PhotoMetadata()
+    finally:
+        fileobj.seek(0)
+
+
+def _find_tiff(fileobj: BinaryIO) -> Optional[bytes]:
+    head = fileobj.read(12)
+    fileobj.seek(0)
+    if head[:2] == b"\xff\xd8":
+        return _tiff_from_jpeg(fileobj)
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return _tiff_from_png(fileobj)
+    if head[4:8] == b"ftyp":
+        return _tiff_from_isobmff(fileobj)
+    return _tiff_from_pillow(fileobj)
+
+
+def _tiff_from_jpeg(f: BinaryIO) -> Optional[bytes]:
+    """マーカーを順にたどり、"Exif\\0\\0" で始まる APP1 の中身を返す (画像データ SOS の手前まで)"""
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        kind = marker[1]
+        if kind == 0xFF:  # 詰め物
+            f.seek(-1, 1)
+            continue
+        if kind in (0xD9, 0xDA):  # EOI / SOS: これ以降にメタデータはない
+            return None
+        if 0xD0 <= kind <= 0xD7 or kind == 0x01:  # 長さを持たないマーカー
+            continue
+        (length,) = struct.unpack(">H", f.read(2))
+        if kind == 0xE1:
+            payload = f.read(length - 2)
+            if payload[:6] == b"Exif\x00\x00":
+                return payload[6:]
+        else:
+            f.seek(length - 2, 1)
+
+
+def _tiff_from_png(f: BinaryIO) -> Optional[bytes]:
+    """eXIf チャンクの中身 (TIFF) を返す。IDAT などはシークで読み飛ばす"""
+    f.seek(8)
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        length, kind = struct.unpack(">L4s", header)
+        if kind == b"eXIf":
+            return f.read(min(length, _MAX_EXIF_BYTES))
+        if kind == b"IEND":
+            return None
+        f.seek(length + 4, 1)  # データ + CRC
+
+
+def _iter_boxes(data: bytes, start: int, end: int):
+    """ISO BMFF のボックス (size, type, 中身の開始位置, 終了位置) を順に返す"""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">L4s", data, pos)
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack_from(">Q", data, pos + 8)
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _read_uint(data: bytes, pos: int, size: int) -> Tuple[int, int]:
+    if size == 0:
+        return 0, pos
+    fmt = {2: ">H", 4: ">L", 8: ">Q"}.get(size)
+    if fmt is None:
+        raise ValueError(f"Unsupported field size: {size}")
+    return struct.unpack_from(fmt, data, pos)[0], pos + size
+
+
+def _tiff_from_isobmff(f: BinaryIO) -> Optional[bytes]:
+    """
+    HEIC / HEIF: meta ボックスの iinf から Exif アイテムを探し、iloc の位置から読む。
+    アイテムの先頭4バイトは TIFF ヘッダーまでのオフセット。
+    """
+    f.seek(0)
+    meta = None
+    while meta is None:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        size, kind = struct.unpack(">L4s", header)
+        header_size = 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", f.read(8))
+            header_size = 16
+        if kind == b"meta":
+            if size - header_size > _MAX_EXIF_BYTES:
+                return None
+            meta = f.read(size - header_size)
+        elif size == 0:
+            return None
+        else:
+            f.seek(size - header_size, 1)
+
+    # meta は FullBox (version + flags の4バイト)
+    exif_item = None
+    locations: Dict[int, Tuple[int, int]] = {}
+    for kind, start, end in _iter_boxes(meta, 4, len(meta)):
+        if kind == b"iinf":
+            version = meta[start]
+            pos = start + 4 + (2 if version == 0 else 4)
+            for entry, e_start, _ in _iter_boxes(meta, pos, end):
+                if entry != b"infe" or meta[e_start] < 2:
+                    continue
+                id_size = 2 if meta[e_start] == 2 else 4
+                item_id, pos = _read_uint(meta, e_start + 4, id_size)
+                item_type = meta[pos + 2:pos + 6]
+                if item_type == b"Exif":
+                    exif_item = item_id
+        elif kind == b"iloc":
+            version = meta[start]
+            pos = start + 4
+            offset_size, length_size = meta[pos] >> 4, meta[pos] & 0x0F
+            base_offset_size, index_size = meta[pos + 1] >> 4, meta[pos + 1] & 0x0F
+            pos += 2
+            count, pos = _read_uint(meta, pos, 2 if version < 2 else 4)
+            for _ in range(count):
+                item_id, pos = _read_uint(meta, pos, 2 if version < 2 else 4)
+                if version in (1, 2):
+                    pos += 2  # construction_method
+                pos += 2  # data_reference_index
+                base_offset, pos = _read_uint(meta, pos, base_offset_size)
+                extents, pos = _read_uint(meta, pos, 2)
+                for i in range(extents):
+                    if version in (1, 2) and index_size:
+                        pos += index_size
+                    offset, pos = _read_uint(meta, pos, offset_size)
+                    length, pos = _read_uint(meta, pos, length_size)
+                    if i == 0:
+                        locations[item_id] = (base_offset + offset, length)
+
+    if exif_item is None or exif_item not in locations:
+        return None
+    offset, length = locations[exif_item]
+    f.seek(offset)
+    item = f.read(min(length, _MAX_EXIF_BYTES))
+    (skip,) = struct.unpack_from(">L", item, 0)
+    tiff = item[4 + skip:]
+    return tiff[6:] if tiff[:6] == b"Exif\x00\x00" else tiff
+
+
+def _tiff_from_pillow(f: BinaryIO) -> Optional[bytes]:
+    """その他の形式 (WebP / TIFF など) は Pillow で開き、EXIF を TIFF として取り出す"""
+    from PIL import Image
+
+    try:
+        with Image.open(f) as img:
+            raw = img.getexif().tobytes()
+    except Exception:
+        return None
+    return raw[6:] if raw[:6] == b"Exif\x00\x00" else raw or None
+
+
+class _Tiff:
+    def __init__(self, data: bytes):
+        if data[:2] == b"II":
+            self.endian = "<"
+        elif data[:2] == b"MM":
+            self.endian = ">"
+        else:
+            raise ValueError("Not a TIFF header")
+        self.data = data
+
+    def first_ifd(self) -> int:
+        (offset,) = struct.unpack_from(self.endian + "L", self.data, 4)
+        return offset
+
+    def read_ifd(self, offset: int, wanted) -> Dict[int, object]:
+        """IFD から wanted に含まれるタグだけを読む"""
+        values: Dict[int, object] = {}
+        (count,) = struct.unpack_from(self.endian + "H", self.data, offset)
+        for i in range(count):
+            entry = offset + 2 + i * 12
+            tag, type_, n = struct.unpack_from(self.endian + "HHL", self.data, entry)
+            if tag not in wanted or type_ not in _TYPES:
+                continue
+            size, fmt = _TYPES[type_]
+            if size * n <= 4:
+                pos = entry + 8
+            else:
+                (pos,) = struct.unpack_from(self.endian + "L", self.data, entry + 8)
+            raw = self.data[pos:pos + size * n]
+            if len(raw) < size * n:
+                continue
+            if type_ == 2:
+                values[tag] = raw.split(b"\x00", 1)[0].decode("ascii", "replace").strip()
+            elif type_ == 7:
+                values[tag] = raw
+            else:
+                items = struct.unpack(self.endian + fmt * n, raw)
+                if type_ in (5, 10):
+                    items = [(items[j], items[j + 1]) for j in range(0, len(items), 2)]
+                values[tag] = items
+        return values
+
+
+def _rational(value) -> Optional[float]:
+    """RATIONAL (分子, 分母) を float にする。仕様外だが LONG / SHORT で書かれた整数も受け付ける"""
+    if isinstance(value, int):
+        return float(value)
+    if isinstance(value, tuple) and len(value) == 2 and all(isinstance(v, int) for v in value):
+        numerator, denominator = value
+        return numerator / denominator if denominator else None
+    return None
+
+
+def _text(value) -> Optional[str]:
+    """ASCII のタグ値。UNDEFINED (bytes) で書かれていれば ASCII として読む"""
+    if isinstance(value, bytes):
+        value = value.split(b"\x00", 1)[0].decode("ascii", "replace").strip()
+    return value if isinstance(value, str) else None
+
+
+def _offset(value) -> Optional[int]:
+    """サブ IFD へのオフセット (LONG / IFD 型の1要素目)"""
+    if isinstance(value, (tuple, list)) and value and isinstance(value[0], int):
+        return value[0]
+    return None
+
+
+def _coordinate(dms, ref, limit: float) -> Optional[float]:
+    ref = _text(ref)
+    if not isinstance(dms, (tuple, list)) or len(dms) < 3 or not ref:
+        return None
+    parts = [_rational(v) for v in dms[:3]]
+    if any(p is None for p in parts):
+        return None
+    degrees, minutes, seconds = parts
+    value = degrees + minutes / 60.0 + seconds / 3600.0
+    if ref[:1] in ("S", "W"):
+        value = -value
+    return value if -limit <= value <= limit else None
+
+
+def _taken_at(text, offset) -> Optional[datetime]:
+    text, offset = _text(text), _text(offset)
+    if not text:
+        return None
+    try:
+        taken_at = datetime.strptime(text[:19], "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None  # "0000:00:00 00:00:00" や空白埋めなど
+    if offset and len(offset) >= 6 and offset[0] in "+-":
+        try:
+            delta = timedelta(hours=int(offset[1:3]), minutes=int(offset[4:6]))
+            tz = timezone(-delta if offset[0] == "-" else delta)
+        except ValueError:
+            return taken_at  # 数字でない・24時間以上のずれ
+        taken_at = taken_at.replace(tzinfo=tz)
+    return taken_at
+
+
+def parse_tiff(data: bytes) -> PhotoMetadata:
+    tiff = _Tiff(data)
+    ifd0 = tiff.read_ifd(tiff.first_ifd(), {TAG_EXIF_IFD, TAG_GPS_IFD})
+
+    exif = {}
+    exif_offset = _offset(ifd0.get(TAG_EXIF_IFD))
+    if exif_offset is not None:
+        exif = tiff.read_ifd(exif_offset, {
+            TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED, TAG_OFFSET_TIME_ORIGINAL, TAG_OFFSET_TIME_DIGITIZED,
+        })
+    # IFD0 の DateTime はファイルの更新日時 (編集・書き出しで変わる) なので撮影日時には使わない
+    taken_at = _taken_at(exif.get(TAG_DATETIME_ORIGINAL), exif.get(TAG_OFFSET_TIME_ORIGINAL)) \
+        or _taken_at(exif.get(TAG_DATETIME_DIGITIZED), exif.get(TAG_OFFSET_TIME_DIGITIZED))
+
+    lat = lon = alt = None
+    gps_offset = _offset(ifd0.get(TAG_GPS_IFD))
+    if gps_offset is not None:
+        gps = tiff.read_ifd(gps_offset, {
+            GPS_LATITUDE_REF, GPS_LATITUDE, GPS_LONGITUDE_REF, GPS_LONGITUDE, GPS_ALTITUDE_REF, GPS_ALTITUDE,
+        })
+        lat = _coordinate(gps.get(GPS_LATITUDE), gps.get(GPS_LATITUDE_REF), 90.0)
+        lon = _coordinate(gps.get(GPS_LONGITUDE), gps.get(GPS_LONGITUDE_REF), 180.0)
+        if lat is None or lon is None:
+            lat = lon = None
+        altitude = gps.get(GPS_ALTITUDE)
+        if isinstance(altitude, (tuple, list)) and altitude:
+            alt = _rational(altitude[0])
+            ref = gps.get(GPS_ALTITUDE_REF)
+            # 本来は BYTE (0 = 海抜, 1 = 海面下)。UNDEFINED で書かれていれば bytes になる
+            if alt is not None and ref and ref[0] == 1:
+                alt = -alt
+
+    return PhotoMetadata(latitude=lat, longitude=lon, altitude=alt, taken_at=taken_at)
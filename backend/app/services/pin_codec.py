@@ -0,0 +1,219 @@
+import json
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+# 地図ピンのコンパクトな表現 (GET /pin/images の Accept で選択する)。
+# 既定の JSON (1ピン1オブジェクト) はキー名とサムネイルURLの共通部分を件数分繰り返すうえ、
+# 行ごとに Pydantic モデルを組み立てるため、数千件を超えると応答サイズと処理時間の大半を占める。
+# ここでは行モデルを作らず、RPC の結果 (dict のリスト) から直接エンコードする。
+#
+# COLUMNAR (application/vnd.pinaly.pins+json): 列ごとの配列
+#   {"kind": "pins" | "clusters", "count": n,
+#    "id": [...], "latitude": [...], "longitude": [...], ("cluster_count": [...]),
+#    "thumbnail_prefixes": ["https://.../USER_ID/thumbs/", ...],
+#    "thumbnail_prefix": [0, 0, 1, ...], "thumbnail_name": ["UUID_marker.webp", ...],
+#    "title": [...]}
+#   (クラスタの場合 id は代表画像の image_id)
+#
+# BINARY (application/vnd.pinaly.pins): リトルエンディアン
+#   header   16 bytes: magic "PINS", version u8, kind u8 (0 = pins, 1 = clusters), flags u16,
+#                      count u32, scale u32 (緯度経度 = 整数 / scale)
+#   id       uint32[count]  id 昇順。先頭は値そのもの、以降は直前との差分
+#   latitude int32[count]   round(緯度 * scale) の直前との差分 (id 順)
+#   longitude int32[count]  同上
+#   (clusters のみ) cluster_count uint32[count]
+#   thumbnail_prefix uint16[count] (flags & 1) または uint32[count]: URL 接頭辞表の添字
+#   (ここまで4バイト境界に揃うため、JS では Int32Array 等で直接参照できる)
+#   以降の文字列の列は「uint16 長さ[件数] + UTF-8 を連結したもの」(TextDecoder 1回で読める)
+#   接頭辞表: u32 件数 + 文字列の列
+#   thumbnail_name: 文字列の列
+#   title: 文字列の列 (長さ 0xFFFF = null)
+# 差分にしておくと、連続して撮影された写真 (id が近い) の座標が近いことから値が小さくなり、
+# gzip などの圧縮が効きやすい。
+
+COLUMNAR = "application/vnd.pinaly.pins+json"
+BINARY = "application/vnd.pinaly.pins"
+
+MAGIC = b"PINS"
+VERSION = 1
+SCALE = 1_000_000  # 1e-6 度 (約 0.1m)
+_HEADER = struct.Struct("<4sBBHII")
+_NULL = 0xFFFF
+_FLAG_U16_PREFIX = 1
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """Accept ヘッダーからコンパクト形式を選ぶ (どちらも含まれなければ None = 既定の JSON)"""
+    if not accept:
+        return None
+    types = {part.split(";", 1)[0].strip() for part in accept.split(",")}
+    if BINARY in types:
+        return BINARY
+    if COLUMNAR in types:
+        return COLUMNAR
+    return None
+
+
+def _id_key(clusters: bool) -> str:
+    return "image_id" if clusters else "id"
+
+
+def _split_url(url: Optional[str]) -> Tuple[str, str]:
+    prefix, slash, name = (url or "").rpartition("/")
+    return prefix + slash, name
+
+
+def _prefix_table(pins: List[Dict[str, Any]]) -> Tuple[List[str], List[int], List[str]]:
+    table: Dict[str, int] = {}
+    indexes, names = [], []
+    for pin in pins:
+        prefix, name = _split_url(pin.get("thumbnail_url"))
+        indexes.append(table.setdefault(prefix, len(table)))
+        names.append(name)
+    return list(table), indexes, names
+
+
+def encode_columnar(pins: List[Dict[str, Any]], clusters: bool = False) -> bytes:
+    id_key = _id_key(clusters)
+    prefixes, indexes, names = _prefix_table(pins)
+    body: Dict[str, Any] = {
+        "kind": "clusters" if clusters else "pins",
+        "count": len(pins),
+        "id": [pin[id_key] for pin in pins],
+        "latitude": [round(pin["latitude"], 6) for pin in pins],
+        "longitude": [round(pin["longitude"], 6) for pin in pins],
+    }
+    if clusters:
+        body["cluster_count"] = [pin["count"] for pin in pins]
+    body.update({
+        "thumbnail_prefixes": prefixes,
+        "thumbnail_prefix": indexes,
+        "thumbnail_name": names,
+        "title": [pin.get("title") for pin in pins],
+    })
+    return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _deltas(values: List[int]) -> List[int]:
+    return [b - a for a, b in zip([0, *values], values)]
+
+
+def _le(typecode: str, values: List[int]) -> bytes:
+    arr = array(typecode, values)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _truncate(value: str) -> bytes:
+    """長さは u16 (_NULL は null 用) なので、それ未満に収まるよう文字の境界で切り詰める"""
+    data = value.encode()
+    if len(data) < _NULL:
+        return data
+    # 切った位置で途切れたマルチバイト文字は捨てる (デコードできないバイト列を送らない)
+    return data[:_NULL - 1].decode("utf-8", "ignore").encode()
+
+
+def _strings(values, nullable: bool = False) -> bytes:
+    encoded = [None if value is None and nullable else _truncate(value or "") for value in values]
+    lengths = [_NULL if data is None else len(data) for data in encoded]
+    return _le("H", lengths) + b"".join(data for data in encoded if data)
+
+
+def encode_binary(pins: List[Dict[str, Any]], clusters: bool = False) -> bytes:
+    id_key = _id_key(clusters)
+    pins = sorted(pins, key=lambda pin: pin[id_key])
+    prefixes, indexes, names = _prefix_table(pins)
+    flags = _FLAG_U16_PREFIX if len(prefixes) <= 0xFFFF else 0
+
+    parts = [
+        _HEADER.pack(MAGIC, VERSION, 1 if clusters else 0, flags, len(pins), SCALE),
+        _le("I", _deltas([pin[id_key] for pin in pins])),
+        _le("i", _deltas([round(pin["latitude"] * SCALE) for pin in pins])),
+        _le("i", _deltas([round(pin["longitude"] * SCALE) for pin in pins])),
+    ]
+    if clusters:
+        parts.append(_le("I", [pin["count"] for pin in pins]))
+    parts.append(_le("H" if flags & _FLAG_U16_PREFIX else "I", indexes))
+    if flags & _FLAG_U16_PREFIX and len(pins) % 2:
+        parts.append(b"\0\0")  # 4バイト境界に揃える
+    parts.append(struct.pack("<I", len(prefixes)) + _strings(prefixes))
+    parts.append(_strings(names))
+    parts.append(_strings([pin.get("title") for pin in pins], nullable=True))
+    return b"".join(parts)
+
+
+def encode(pins: List[Dict[str, Any]], media_type: str, clusters: bool = False) -> bytes:
+    if media_type == BINARY:
+        return encode_binary(pins, clusters)
+    return encode_columnar(pins, clusters)
+
+
+def decode_binary(data: bytes) -> List[Dict[str, Any]]:
+    """encode_binary の逆変換 (検証・ベンチマーク用。クライアント実装の参考)"""
+    magic, version, kind, flags, count, scale = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a pin payload")
+    offset = _HEADER.size
+
+    def take(typecode: str) -> List[int]:
+        nonlocal offset
+        arr = array(typecode)
+        arr.frombytes(data[offset:offset + arr.itemsize * count])
+        if sys.byteorder == "big":
+            arr.byteswap()
+        offset += arr.itemsize * count
+        return arr.tolist()
+
+    def cumulative(values: List[int]) -> List[int]:
+        total, out = 0, []
+        for value in values:
+            total += value
+            out.append(total)
+        return out
+
+    def strings(n: int, nullable: bool = False) -> List[Optional[str]]:
+        nonlocal offset
+        lengths = array("H")
+        lengths.frombytes(data[offset:offset + 2 * n])
+        if sys.byteorder == "big":
+            lengths.byteswap()
+        offset += 2 * n
+        out = []
+        for length in lengths:
+            if nullable and length == _NULL:
+                out.append(None)
+                continue
+            out.append(data[offset:offset + length].decode())
+            offset += length
+        return out
+
+    clusters = kind == 1
+    ids = cumulative(take("I"))
+    lats = cumulative(take("i"))
+    lons = cumulative(take("i"))
+    counts = take("I") if clusters else None
+    indexes = take("H" if flags & _FLAG_U16_PREFIX else "I")
+    if flags & _FLAG_U16_PREFIX and count % 2:
+        offset += 2
+    (n_prefixes,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    prefixes = strings(n_prefixes)
+    names = strings(count)
+    titles = strings(count, nullable=True)
+
+    pins = []
+    for i in range(count):
+        pin = {
+            _id_key(clusters): ids[i],
+            "latitude": lats[i] / scale,
+            "longitude": lons[i] / scale,
+            "thumbnail_url": prefixes[indexes[i]] + names[i],
+            "title": titles[i],
+        }
+        if clusters:
+            pin["count"] = counts[i]
+        pins.append(pin)
+    return pins
@@ -0,0 +1,206 @@
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+
+from app.core.config import settings
+from app.services import image_service, upload_service
+
+# 再開可能なアップロード (tus 方式)
+# 1. セッション作成: ファイル名・サイズを登録し upload_id を受け取る
+# 2. チャンク送信: 現在のオフセットを指定して続きを送る (途切れたら offset を問い合わせて再送)
+# 3. 完了: 揃ったファイルを通常のアップロードと同じ処理 (create_image) で登録する
+#
+# 受信中のデータはローカルディスクの一時ディレクトリに溜める。
+# セッションごとに meta.json / data / lock を置き、同じホストの複数ワーカー間では
+# flock で排他する (複数ホストで動かす場合はスティッキーセッションか共有ディスクが必要)。
+# ファイル操作はブロッキングのため、公開関数はすべて async にしてスレッドプールで行う
+# (イベントループ上で直接呼ぶと、ディスクが遅いときに他のリクエストまで止まる)。
+
+
+def _root() -> str:
+    return settings.UPLOAD_SESSION_DIR or os.path.join(tempfile.gettempdir(), "pinaly-uploads")
+
+
+def _session_dir(upload_id: str) -> str:
+    # upload_id は uuid4 の16進表現のみ受け付ける (パスの組み立てに使うため)
+    try:
+        upload_id = uuid.UUID(upload_id).hex
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return os.path.join(_root(), upload_id)
+
+
+def _read_meta(path: str) -> Dict:
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+
+def _status(upload_id: str, meta: Dict, path: str) -> Dict:
+    return {
+        "id": upload_id,
+        "filename": meta["filename"],
+        "size": meta["size"],
+        "offset": os.path.getsize(os.path.join(path, "data")),
+        "expires_at": meta["expires_at"],
+    }
+
+
+def _load(upload_id: str, user_id: str):
+    path = _session_dir(upload_id)
+    try:
+        meta = _read_meta(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if meta["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if meta["expires_at"] < time.time():
+        shutil.rmtree(path, ignore_errors=True)
+        raise HTTPException(status_code=410, detail="Upload expired")
+    return path, meta
+
+
+def _acquire(path: str):
+    lock = open(os.path.join(path, "lock"), "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock.close()
+        raise HTTPException(status_code=409, detail="Upload is busy")
+    return lock
+
+
+def _release(lock) -> None:
+    try:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+    finally:
+        lock.close()
+
+
+@asynccontextmanager
+async def _locked(path: str):
+    """同じセッションへの同時書き込み・完了処理を防ぐ (待たずに 409)"""
+    lock = await run_in_threadpool(_acquire, path)
+    try:
+        yield
+    finally:
+        await run_in_threadpool(_release, lock)
+
+
+def purge_expired() -> int:
+    """期限切れのセッションを削除し、削除した件数を返す"""
+    removed = 0
+    now = time.time()
+    if not os.path.isdir(_root()):
+        return 0
+    for name in os.listdir(_root()):
+        path = os.path.join(_root(), name)
+        try:
+            if _read_meta(path)["expires_at"] < now:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        except (OSError, ValueError, KeyError):
+            continue
+    return removed
+
+
+def _create_session(user_id: str, filename: str, size: int, content_type: Optional[str]) -> Dict:
+    purge_expired()
+
+    upload_id = uuid.uuid4().hex
+    path = os.path.join(_root(), upload_id)
+    os.makedirs(path)
+    meta = {
+        "user_id": user_id,
+        "filename": filename,
+        "size": size,
+        "content_type": content_type,
+        "expires_at": time.time() + settings.UPLOAD_SESSION_TTL_SECONDS,
+    }
+    open(os.path.join(path, "data"), "wb").close()
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return _status(upload_id, meta, path)
+
+
+async def create_session(user_id: str, filename: str, size: int, content_type: Optional[str]) -> Dict:
+    upload_service.get_extension(filename)
+    upload_service.check_upload_size(size)
+    return await run_in_threadpool(_create_session, user_id, filename, size, content_type)
+
+
+def _get_status(upload_id: str, user_id: str) -> Dict:
+    path, meta = _load(upload_id, user_id)
+    return _status(upload_id, meta, path)
+
+
+async def get_status(upload_id: str, user_id: str) -> Dict:
+    return await run_in_threadpool(_get_status, upload_id, user_id)
+
+
+async def append_chunk(upload_id: str, user_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Dict:
+    """
+    offset (現在の受信済みサイズと一致すること) から続きを書き込む。
+    接続が途中で切れても、それまでに書き込んだ分は受信済みとして残る。
+    """
+    path, meta = await run_in_threadpool(_load, upload_id, user_id)
+    data_path = os.path.join(path, "data")
+    async with _locked(path):
+        current = await run_in_threadpool(os.path.getsize, data_path)
+        if offset != current:
+            raise HTTPException(status_code=409, detail=f"Offset mismatch (current offset is {current})")
+
+        f = await run_in_threadpool(open, data_path, "ab")
+        try:
+            async for chunk in chunks:
+                if current + len(chunk) > meta["size"]:
+                    raise HTTPException(status_code=413, detail="Chunk exceeds declared upload size")
+                await run_in_threadpool(f.write, chunk)
+                current += len(chunk)
+        finally:
+            await run_in_threadpool(f.close)
+    return await run_in_threadpool(_status, upload_id, meta, path)
+
+
+async def complete(upload_id: str, user_id: str):
+    """全体が揃っていれば通常のアップロードと同じ処理で登録し、セッションを削除する"""
+    path, meta = await run_in_threadpool(_load, upload_id, user_id)
+    data_path = os.path.join(path, "data")
+    async with _locked(path):
+        received = await run_in_threadpool(os.path.getsize, data_path)
+        if received != meta["size"]:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload incomplete ({received} of {meta['size']} bytes)",
+            )
+        f = await run_in_threadpool(open, data_path, "rb")
+        try:
+            file = UploadFile(
+                file=f,
+                size=received,
+                filename=meta["filename"],
+                headers=Headers({"content-type": meta["content_type"] or "application/octet-stream"}),
+            )
+            image = await image_service.create_image(file, user_id)
+        finally:
+            await run_in_threadpool(f.close)
+    await run_in_threadpool(shutil.rmtree, path, ignore_errors=True)
+    return image
+
+
+def _abort(upload_id: str, user_id: str) -> None:
+    path, _ = _load(upload_id, user_id)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+async def abort(upload_id: str, user_id: str) -> None:
+    await run_in_threadpool(_abort, upload_id, user_id)
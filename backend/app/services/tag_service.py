@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from typing import Any, Dict, List
+
+from app.core import response_cache
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.prefix_index import PrefixIndex, RankedPrefixIndex
+from app.repositories import tag_repository
+
+logger = logging.getLogger(__name__)
+
+# タグ入力補完用のインメモリインデックス
+# 全タグは起動時に読み込み、以降はこのプロセスで作成されたタグを逐次追加する
+# (他のプロセスで作成されたタグは TAG_INDEX_REFRESH_SECONDS ごとの再読み込みで取り込む)
+_index = PrefixIndex()
+
+# ユーザーごとの「使用したタグ」インデックス (使用回数順)
+_user_indexes = TTLCache(
+    maxsize=settings.TAG_USER_CACHE_SIZE,
+    ttl=settings.TAG_USER_CACHE_TTL_SECONDS,
+)
+# このプロセスでタグを更新したユーザーの世代番号。response_cache の世代番号は
+# READ_CACHE_ENABLED が無効だと変わらないため、キャッシュの設定によらずこちらでも破棄する
+_user_generations: Dict[str, int] = {}
+
+
+async def warm_up() -> None:
+    """tags テーブルを全件読み込んでインデックスを作り直す"""
+    items = []
+    after_id = 0
+    while True:
+        rows = await tag_repository.list_tags_after(after_id, settings.TAG_INDEX_PAGE_SIZE)
+        items.extend((row["id"], row["name"]) for row in rows)
+        if len(rows) < settings.TAG_INDEX_PAGE_SIZE:
+            break
+        after_id = rows[-1]["id"]
+    # 件数が多いとソートに時間がかかるため、イベントループを止めないようスレッドで構築する
+    await asyncio.to_thread(_index.replace, items)
+    logger.info("Tag index loaded: %d tags", len(items))
+
+
+async def refresh_forever() -> None:
+    while True:
+        await asyncio.sleep(settings.TAG_INDEX_REFRESH_SECONDS)
+        try:
+            await warm_up()
+        except Exception:
+            logger.exception("Tag index refresh failed")
+
+
+def register_tags(user_id: str, tags: List[Dict[str, Any]]) -> None:
+    """タグの更新後に呼ぶ。新しいタグを索引に加え、ユーザー別の使用回数を破棄する"""
+    _index.add((tag["id"], tag["name"]) for tag in tags)
+    if user_id not in _user_generations and len(_user_generations) >= settings.TAG_USER_CACHE_SIZE:
+        # ユーザー数の上限に達したら世代番号とインデックスをまとめて捨てる (0 に戻った世代番号で古いものを引かないように)
+        _user_generations.clear()
+        _user_indexes.clear()
+    _user_generations[user_id] = _user_generations.get(user_id, 0) + 1
+
+
+def suggest(prefix: str, limit: int) -> List[Dict[str, Any]]:
+    """全タグから前方一致 (名前順)"""
+    return _index.search(prefix, limit)
+
+
+async def suggest_for_user(user_id: str, prefix: str, limit: int) -> List[Dict[str, Any]]:
+    """ユーザーが使用したタグから前方一致 (使用回数の多い順)"""
+    # 画像のタグが更新されると世代番号が変わり、インデックスを作り直す
+    # (他のプロセスでの更新は response_cache の世代番号で検知する)
+    key = (user_id, _user_generations.get(user_id, 0), await response_cache.generation(user_id))
+    index = _user_indexes.get(key)
+    if index is None:
+        rows = await tag_repository.list_user_tag_usage(user_id)
+        index = RankedPrefixIndex((row["id"], row["name"], row["count"]) for row in rows)
+        _user_indexes.set(key, index)
+    return index.search(prefix, limit)
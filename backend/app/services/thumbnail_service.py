@@ -0,0 +1,66 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from app.core import response_cache
+from app.core.config import settings
+from app.db import storage
+from app.repositories import image_repository
+from app.services.imaging import CONTENT_TYPES, render_derivatives
+
+# Pillow の縮小・エンコードは CPU バウンドなので、イベントループではなくプロセスプールで実行する
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS or None)
+    return _executor
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _derivative_path(original_path: str, name: str) -> str:
+    # 例: USER_ID/UUID.jpg -> USER_ID/thumbs/UUID_grid.webp
+    user_dir, _, filename = original_path.rpartition("/")
+    stem = filename.rsplit(".", 1)[0]
+    ext = settings.THUMBNAIL_FORMAT.lower()
+    return f"{user_dir}/thumbs/{stem}_{name}.{ext}"
+
+
+async def generate_thumbnails(image_id: int, user_id: str, bucket: str, original_path: str) -> Dict[str, str]:
+    """
+    元画像から派生画像 (marker / grid / preview) を作成してストレージに保存し、
+    images.derivatives と thumbnail_url を更新する。
+    """
+    data = await storage.download(bucket, original_path)
+
+    loop = asyncio.get_running_loop()
+    rendered = await loop.run_in_executor(
+        _get_executor(),
+        render_derivatives,
+        data,
+        settings.THUMBNAIL_SIZES,
+        settings.THUMBNAIL_FORMAT,
+        settings.THUMBNAIL_QUALITY,
+    )
+
+    content_type = CONTENT_TYPES[settings.THUMBNAIL_FORMAT]
+    derivatives: Dict[str, str] = {}
+    for name, payload in rendered.items():
+        path = _derivative_path(original_path, name)
+        await storage.upload_bytes(bucket, path, payload, content_type)
+        derivatives[name] = storage.get_public_url(bucket, path)
+
+    await image_repository.update_image(image_id, user_id, {
+        "derivatives": derivatives,
+        "thumbnail_url": derivatives.get("grid") or next(iter(derivatives.values())),
+    })
+    await response_cache.bump(user_id)
+    return derivatives
@@ -0,0 +1,63 @@
+import hashlib
+import os
+from typing import AsyncIterator, BinaryIO
+from fastapi import HTTPException, UploadFile
+from app.core.config import settings
+
+# 対応画像形式 (HEIC / HEIF は pillow-heif で読み込む: app.services.imaging)
+ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png", "heic", "heif"}
+
+
+def get_extension(filename: str) -> str:
+    ext = filename.split(".")[-1].lower() if filename and "." in filename else ""
+    if ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Invalid file type")
+    return ext
+
+
+def get_upload_size(fileobj: BinaryIO) -> int:
+    """
+    スプール済みファイルのサイズを返す。
+    UploadFile の実体は SpooledTemporaryFile (一定サイズを超えるとディスクへ退避) なので、
+    中身を読まずに末尾へシークしてサイズを求める。
+    """
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+
+def hash_file(fileobj: BinaryIO) -> str:
+    """
+    ファイル内容の SHA-256 (16進)。重複アップロードの検出に使う。
+    UPLOAD_CHUNK_BYTES ずつ読むため全体をメモリに載せない (スレッドプールで呼ぶ)。
+    """
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    while True:
+        chunk = fileobj.read(settings.UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def check_upload_size(size: int) -> None:
+    if size > settings.UPLOAD_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large (max {settings.UPLOAD_MAX_BYTES} bytes)",
+        )
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Empty file")
+
+
+async def iter_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    """アップロードファイルを先頭から UPLOAD_CHUNK_BYTES ずつ読み出す"""
+    await file.seek(0)
+    while True:
+        chunk = await file.read(settings.UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        yield chunk
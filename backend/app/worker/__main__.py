@@ -0,0 +1,142 @@
+"""
+ジョブキューのワーカー。
+
+    python -m app.worker [--types thumbnails] [--stats]
+
+ジョブ種別ごとに WORKER_CONCURRENCY の同時実行数までジョブを取得して実行する。
+失敗したジョブは指数バックオフで再実行し、WORKER_MAX_ATTEMPTS 回で failed にする。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List
+
+from app.core.config import settings
+from app.db.storage import close_storage
+from app.db.supabase import close_db
+from app.services import thumbnail_service
+from app.worker import queue
+from app.worker.jobs import JOB_HANDLERS
+
+logger = logging.getLogger("app.worker")
+
+
+class WorkerMetrics:
+    """ワーカー内で計測したジョブ種別ごとの件数と処理時間 (直近1000件)"""
+
+    def __init__(self):
+        self.succeeded: Dict[str, int] = defaultdict(int)
+        self.failed: Dict[str, int] = defaultdict(int)
+        self.durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=1000))
+
+    def record(self, job_type: str, duration: float, ok: bool) -> None:
+        (self.succeeded if ok else self.failed)[job_type] += 1
+        self.durations[job_type].append(duration)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for job_type, values in self.durations.items():
+            ordered = sorted(values)
+            result[job_type] = {
+                "succeeded": self.succeeded[job_type],
+                "failed": self.failed[job_type],
+                "p50_seconds": ordered[len(ordered) // 2],
+                "p95_seconds": ordered[max(int(len(ordered) * 0.95) - 1, 0)],
+            }
+        return result
+
+
+async def _run_job(job: Dict, metrics: WorkerMetrics) -> None:
+    started = time.perf_counter()
+    try:
+        await JOB_HANDLERS[job["type"]](job["payload"])
+    except Exception as e:
+        logger.exception("Job failed: id=%s type=%s attempt=%s", job["id"], job["type"], job["attempts"])
+        await queue.fail(job, f"{type(e).__name__}: {e}")
+        metrics.record(job["type"], time.perf_counter() - started, ok=False)
+    else:
+        await queue.complete(job)
+        metrics.record(job["type"], time.perf_counter() - started, ok=True)
+
+
+async def _consume(job_type: str, metrics: WorkerMetrics) -> None:
+    """1つのジョブ種別を同時実行数の上限内で処理し続ける"""
+    limit = settings.WORKER_CONCURRENCY.get(job_type, 1)
+    running: set = set()
+    claim_failures = 0
+    while True:
+        free = limit - len(running)
+        try:
+            jobs = await queue.claim(job_type, free) if free > 0 else []
+        except Exception:
+            # DB に接続できないなど: 実行中のジョブは続けたまま、間隔を広げて取得し直す
+            claim_failures += 1
+            delay = min(
+                settings.WORKER_POLL_INTERVAL_SECONDS * 2 ** (claim_failures - 1),
+                settings.WORKER_BACKOFF_MAX_SECONDS,
+            )
+            logger.exception("Claim failed: type=%s retry_in=%.1fs", job_type, delay)
+            await asyncio.sleep(delay)
+            continue
+        claim_failures = 0
+        for job in jobs:
+            task = asyncio.create_task(_run_job(job, metrics))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        if not jobs:
+            # 空き枠がない、またはキューが空: 完了を待つかポーリング間隔だけ待つ
+            if running and free <= 0:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                await asyncio.sleep(settings.WORKER_POLL_INTERVAL_SECONDS)
+
+
+async def _report(metrics: WorkerMetrics) -> None:
+    while True:
+        await asyncio.sleep(settings.WORKER_METRICS_INTERVAL_SECONDS)
+        try:
+            depth = await queue.stats()
+        except Exception:
+            depth = []
+        logger.info("metrics worker=%s queue=%s", json.dumps(metrics.summary()), json.dumps(depth))
+
+
+async def run(job_types: List[str]) -> None:
+    metrics = WorkerMetrics()
+    try:
+        await asyncio.gather(_report(metrics), *(_consume(t, metrics) for t in job_types))
+    finally:
+        thumbnail_service.shutdown()
+        await close_storage()
+        await close_db()
+
+
+async def print_stats() -> None:
+    try:
+        for row in await queue.stats():
+            print(json.dumps(row))
+    finally:
+        await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--types", nargs="*", default=sorted(JOB_HANDLERS), help="処理するジョブ種別")
+    parser.add_argument("--stats", action="store_true", help="キューの深さとレイテンシを表示して終了する")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.stats:
+        asyncio.run(print_stats())
+        return
+    unknown = set(args.types) - set(JOB_HANDLERS)
+    if unknown:
+        parser.error(f"unknown job types: {', '.join(sorted(unknown))}")
+    asyncio.run(run(args.types))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from app.db import storage
+from app.services import content_hash_service, thumbnail_service
+
+# ジョブ種別 -> ハンドラ
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+THUMBNAILS = "thumbnails"
+STORAGE_CLEANUP = "storage_cleanup"
+CONTENT_HASH = "content_hash"
+
+
+def job(job_type: str):
+    def register(fn: JobHandler) -> JobHandler:
+        JOB_HANDLERS[job_type] = fn
+        return fn
+    return register
+
+
+@job(THUMBNAILS)
+async def generate_thumbnails(payload: Dict[str, Any]) -> None:
+    await thumbnail_service.generate_thumbnails(
+        payload["image_id"], payload["user_id"], payload["bucket"], payload["path"]
+    )
+
+
+@job(STORAGE_CLEANUP)
+async def remove_objects(payload: Dict[str, Any]) -> None:
+    # 削除済み画像の元画像・派生画像。失敗時はジョブごと再試行される (存在しないパスは無視されるので冪等)
+    await storage.remove(payload["bucket"], payload["paths"])
+
+
+@job(CONTENT_HASH)
+async def hash_uploaded_image(payload: Dict[str, Any]) -> None:
+    # 直接アップロードした元画像の内容ハッシュ (重複の検出) は API ではなくワーカーで求める
+    await content_hash_service.hash_uploaded_image(
+        payload["image_id"], payload["user_id"], payload["bucket"], payload["path"]
+    )
@@ -0,0 +1,70 @@
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.db.supabase import get_db
+
+# jobs テーブル (migrations/003_jobs.sql) を使った永続ジョブキュー
+
+
+def _job_row(job_type: str, payload: Dict[str, Any], max_attempts: Optional[int]) -> Dict[str, Any]:
+    return {
+        "type": job_type,
+        "payload": payload,
+        "max_attempts": max_attempts or settings.WORKER_MAX_ATTEMPTS,
+    }
+
+
+async def enqueue(job_type: str, payload: Dict[str, Any], max_attempts: Optional[int] = None) -> Dict[str, Any]:
+    res = await get_db().table("jobs").insert(_job_row(job_type, payload, max_attempts)).execute()
+    return res.data[0]
+
+
+async def enqueue_many(job_type: str, payloads: List[Dict[str, Any]], max_attempts: Optional[int] = None) -> None:
+    """複数のジョブを1回のINSERTで登録する"""
+    if not payloads:
+        return
+    rows = [_job_row(job_type, payload, max_attempts) for payload in payloads]
+    await get_db().table("jobs").insert(rows).execute()
+
+
+async def claim(job_type: str, limit: int) -> List[Dict[str, Any]]:
+    res = await get_db().rpc("claim_jobs", {
+        "p_type": job_type,
+        "p_limit": limit,
+        "p_visibility_timeout_seconds": settings.WORKER_VISIBILITY_TIMEOUT_SECONDS,
+    }).execute()
+    return res.data or []
+
+
+async def complete(job: Dict[str, Any]) -> None:
+    await get_db().table("jobs").update({
+        "status": "done",
+        "locked_until": None,
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+    }).eq("id", job["id"]).execute()
+
+
+def _backoff_seconds(attempts: int) -> float:
+    # 指数バックオフ (上限あり) + ジッター
+    delay = min(settings.WORKER_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), settings.WORKER_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def fail(job: Dict[str, Any], error: str) -> None:
+    """失敗を記録する。試行回数が残っていればバックオフ後に再実行する"""
+    now = datetime.now(timezone.utc)
+    if job["attempts"] >= job["max_attempts"]:
+        data = {"status": "failed", "finished_at": now.isoformat()}
+    else:
+        retry_at = now + timedelta(seconds=_backoff_seconds(job["attempts"]))
+        data = {"status": "queued", "run_at": retry_at.isoformat()}
+    data.update({"locked_until": None, "last_error": error[:2000]})
+    await get_db().table("jobs").update(data).eq("id", job["id"]).execute()
+
+
+async def stats() -> List[Dict[str, Any]]:
+    """ジョブ種別ごとのキューの深さとレイテンシ (job_queue_stats ビュー)"""
+    res = await get_db().table("job_queue_stats").select("*").order("type").execute()
+    return res.data
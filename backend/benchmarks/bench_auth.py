@@ -0,0 +1,92 @@
+"""
+認証 (deps.get_current_user) のスループット比較。
+
+    python -m benchmarks.bench_auth [--seconds 3] [--latency 0.02]
+
+- remote       : 毎回 supabase.auth.get_user (スタブへの往復)
+- local        : 署名・有効期限をローカル検証 (キャッシュなし)
+- local+cache  : ローカル検証 + 検証済みトークンキャッシュ
+"""
+import argparse
+import time
+
+from benchmarks.stub_supabase import StubSupabase, configure_env
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+
+def _user_handler(request):
+    return 200, {
+        "id": USER_ID,
+        "aud": "authenticated",
+        "role": "authenticated",
+        "email": "bench@example.com",
+        "app_metadata": {},
+        "user_metadata": {"name": "bench"},
+        "created_at": "2024-01-01T00:00:00Z",
+    }
+
+
+def _run(client, token: str, seconds: float, clear_cache) -> float:
+    headers = {"Authorization": f"Bearer {token}"}
+    count = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        if clear_cache:
+            clear_cache()
+        res = client.get("/api/v1/auth/me", headers=headers)
+        assert res.status_code == 200, res.text
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--latency", type=float, default=0.02, help="スタブの応答遅延 (秒)")
+    args = parser.parse_args()
+
+    stub = StubSupabase(latency=args.latency)
+    stub.route("GET", "/auth/v1/user", _user_handler)
+    configure_env(stub.start())
+
+    import jwt
+    from fastapi.testclient import TestClient
+    from app.core import security
+    from app.core.config import settings
+    from app.main import app
+
+    token = jwt.encode(
+        {
+            "sub": USER_ID,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": "bench@example.com",
+            "exp": int(time.time()) + 3600,
+            "user_metadata": {"name": "bench"},
+        },
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM,
+    )
+
+    client = TestClient(app)
+    results = {}
+    for name, mode, clear in [
+        ("remote", "remote", security.token_cache.clear),
+        ("local", "local", security.token_cache.clear),
+        ("local+cache", "local", None),
+    ]:
+        settings.AUTH_VERIFY_MODE = mode
+        security.token_cache.clear()
+        before = stub.request_count
+        rps = _run(client, token, args.seconds, clear)
+        results[name] = rps
+        print(f"{name:<12} {rps:10.1f} req/s  upstream calls: {stub.request_count - before}")
+
+    print(f"speedup (local+cache / remote): {results['local+cache'] / results['remote']:.1f}x")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
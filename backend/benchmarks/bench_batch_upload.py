@@ -0,0 +1,99 @@
+"""
+一括アップロード (POST /images/batch) と、1枚ずつの POST /images ループの比較。
+
+    python -m benchmarks.bench_batch_upload [--files 500] [--latency 0.01]
+
+GPS付きの小さな JPEG を files 枚生成し、スタブ (応答遅延 latency 秒) に対して
+所要時間と upstream へのリクエスト数を表示する。
+"""
+import argparse
+import asyncio
+import io
+import time
+
+from benchmarks.stub_supabase import StubSupabase, postgrest_rows, configure_env
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+
+def make_gps_jpeg(seed: int) -> bytes:
+    from PIL import Image
+
+    exif = Image.Exif()
+    exif[0x9003] = "2024:05:01 10:00:00"  # DateTimeOriginal
+    exif[0x8825] = {1: "N", 2: (35.0, 40.0, float(seed % 60)), 3: "E", 4: (139.0, 45.0, 0.0)}
+    buf = io.BytesIO()
+    Image.new("RGB", (320, 240), (seed % 255, 100, 150)).save(buf, format="JPEG", exif=exif)
+    return buf.getvalue()
+
+
+def build_stub(latency: float) -> StubSupabase:
+    stub = StubSupabase(latency=latency)
+    counter = iter(range(1, 10_000_000))
+
+    def insert_images(req):
+        rows = req.json()
+        rows = rows if isinstance(rows, list) else [rows]
+        for row in rows:
+            row.update({"id": next(counter), "created_at": "2024-01-01T00:00:00+00:00", "title": None, "comment": None})
+        return 201, rows
+
+    stub.route("POST", "/storage/v1/object/", lambda req: (200, {"Key": req.path}), keep_body=False)
+    # 重複チェック (content_hash の検索): 常に未登録
+    stub.route("GET", "/rest/v1/images", lambda req: postgrest_rows([], req))
+    stub.route("POST", "/rest/v1/images", insert_images)
+    stub.route("POST", "/rest/v1/locations", lambda req: (201, req.json()))
+    stub.route("POST", "/rest/v1/jobs", lambda req: (201, req.json()))
+    return stub
+
+
+async def run(files, stub: StubSupabase) -> None:
+    import httpx
+    from app.api import deps
+    from app.core.security import AuthUser
+    from app.main import app
+
+    app.dependency_overrides[deps.get_current_user] = lambda: AuthUser(id=USER_ID)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        before = stub.request_count
+        started = time.perf_counter()
+        for name, data in files:
+            res = await client.post("/api/v1/images", files={"file": (name, data, "image/jpeg")})
+            assert res.status_code == 201, res.text
+        loop_time = time.perf_counter() - started
+        loop_calls = stub.request_count - before
+
+        before = stub.request_count
+        started = time.perf_counter()
+        res = await client.post(
+            "/api/v1/images/batch",
+            files=[("files", (name, data, "image/jpeg")) for name, data in files],
+        )
+        batch_time = time.perf_counter() - started
+        batch_calls = stub.request_count - before
+        body = res.json()
+        assert res.status_code == 200 and body["failed"] == 0, res.text
+
+    n = len(files)
+    print(f"single-file loop: {loop_time:7.2f}s  {n / loop_time:7.1f} files/s  upstream calls: {loop_calls}")
+    print(f"batch endpoint:   {batch_time:7.2f}s  {n / batch_time:7.1f} files/s  upstream calls: {batch_calls}")
+    print(f"speedup: {loop_time / batch_time:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.01, help="スタブの応答遅延 (秒)")
+    args = parser.parse_args()
+
+    stub = build_stub(args.latency)
+    configure_env(stub.start())
+    files = [(f"IMG_{i:04d}.jpg", make_gps_jpeg(i)) for i in range(args.files)]
+    asyncio.run(run(files, stub))
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+ギャラリー・詳細取得の同時実行ベンチマーク (PostgREST スタブ使用)。
+
+    python -m benchmarks.bench_db_concurrency [--requests 50] [--latency 0.05]
+
+同じリクエスト群を「1件ずつ順番に」と「同時に」実行して所要時間を比べる。
+DBアクセスがイベントループをブロックしていれば両者はほぼ同じになり、
+非同期化されていれば同時実行の所要時間は upstream の遅延数回分に収まる。
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.stub_supabase import StubSupabase, configure_env, postgrest_rows
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+IMAGE_ROW = {
+    "id": 1,
+    "user_id": USER_ID,
+    "image_url": "http://stub/storage/v1/object/public/images/a.jpg",
+    "thumbnail_url": "http://stub/storage/v1/object/public/images/a.jpg",
+    "title": None,
+    "comment": None,
+    "is_favorite": False,
+    "location_status": "EXIF_PRESENT",
+    "taken_at": None,
+    "created_at": "2024-01-01T00:00:00+00:00",
+}
+LOCATION_ROW = {"image_id": 1, "latitude": 35.68, "longitude": 139.76, "geoname": None}
+
+
+def build_stub(latency: float) -> StubSupabase:
+    stub = StubSupabase(latency=latency)
+    stub.route("GET", "/rest/v1/images", lambda req: postgrest_rows([IMAGE_ROW], req))
+    stub.route("GET", "/rest/v1/locations", lambda req: postgrest_rows([LOCATION_ROW], req))
+    stub.route("GET", "/rest/v1/image_tags", lambda req: postgrest_rows([], req))
+    stub.route("POST", "/rest/v1/rpc/image_detail", lambda req: (200, {**IMAGE_ROW, **LOCATION_ROW, "tags": []}))
+    return stub
+
+
+async def _fire(client, paths, concurrent: bool) -> float:
+    started = time.perf_counter()
+    if concurrent:
+        responses = await asyncio.gather(*(client.get(p) for p in paths))
+    else:
+        responses = [await client.get(p) for p in paths]
+    elapsed = time.perf_counter() - started
+    for res in responses:
+        assert res.status_code == 200, res.text
+    return elapsed
+
+
+async def run(n: int, stub: StubSupabase) -> None:
+    import httpx
+    from app.api import deps
+    from app.core.security import AuthUser
+    from app.db.supabase import close_db
+    from app.main import app
+
+    app.dependency_overrides[deps.get_current_user] = lambda: AuthUser(id=USER_ID)
+    paths = ["/api/v1/images?limit=20" if i % 2 else "/api/v1/images/1" for i in range(n)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await _fire(client, paths[:2], concurrent=False)  # ウォームアップ
+        for concurrent in (False, True):
+            before = stub.request_count
+            elapsed = await _fire(client, paths, concurrent)
+            calls = stub.request_count - before
+            label = "concurrent" if concurrent else "sequential"
+            print(f"{label:<11} {n} requests  {elapsed:7.3f}s  {n / elapsed:8.1f} req/s  upstream calls: {calls}")
+    await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="スタブの応答遅延 (秒)")
+    args = parser.parse_args()
+
+    stub = build_stub(args.latency)
+    configure_env(stub.start())
+    asyncio.run(run(args.requests, stub))
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
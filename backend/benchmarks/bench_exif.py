@@ -0,0 +1,143 @@
+"""
+EXIF 抽出: app.services.metadata.read_metadata と旧実装 (Pillow の _getexif + TAGS 走査) の比較。
+
+    python -m benchmarks.bench_exif [--repeat 200] [--width 4000] [--height 3000]
+
+合成したコーパス (JPEG / PNG / HEIC、緯度0・海面下・タイムゾーン付き・EXIFなし) で files/sec を計測する。
+HEIC は pillow-heif が HEIF の書き込みに対応している環境でのみ含める。
+結果の正しさ (壊れた・仕様外の型のタグを含む) は tests/test_metadata.py で確認する。
+"""
+import argparse
+import io
+import time
+from datetime import datetime
+
+from PIL import Image
+from PIL.ExifTags import GPSTAGS, TAGS
+
+from app.services.metadata import read_metadata
+
+
+# --- 旧実装 (image_service.extract_exif_data) ---
+def _legacy_decimal_from_dms(dms, ref):
+    degrees = dms[0]
+    minutes = dms[1]
+    seconds = dms[2]
+    decimal = degrees + (minutes / 60.0) + (seconds / 3600.0)
+    if ref in ['S', 'W']:
+        decimal = -decimal
+    return decimal
+
+
+def legacy_extract(fileobj):
+    fileobj.seek(0)
+    with Image.open(fileobj) as image:
+        exif_data = image._getexif()
+        if not exif_data:
+            return None, None, None
+        gps_info = {}
+        taken_at = None
+        for tag, value in exif_data.items():
+            tag_name = TAGS.get(tag, tag)
+            if tag_name == "DateTimeOriginal":
+                try:
+                    taken_at = datetime.strptime(value, "%Y:%m:%d %H:%M:%S")
+                except:  # noqa: E722 - 旧実装のまま
+                    pass
+            if tag_name == "GPSInfo":
+                for t in value:
+                    sub_tag = GPSTAGS.get(t, t)
+                    gps_info[sub_tag] = value[t]
+        lat = None
+        lon = None
+        if gps_info:
+            if "GPSLatitude" in gps_info and "GPSLatitudeRef" in gps_info:
+                lat = _legacy_decimal_from_dms(gps_info["GPSLatitude"], gps_info["GPSLatitudeRef"])
+            if "GPSLongitude" in gps_info and "GPSLongitudeRef" in gps_info:
+                lon = _legacy_decimal_from_dms(gps_info["GPSLongitude"], gps_info["GPSLongitudeRef"])
+        return lat, lon, taken_at
+
+
+# --- コーパス ---
+def make_exif(lat=None, lon=None, alt=None, taken=None, offset=None):
+    exif = Image.Exif()
+    exif_ifd = {}
+    if taken:
+        exif_ifd[0x9003] = taken
+    if offset:
+        exif_ifd[0x9011] = offset
+    if exif_ifd:
+        exif[0x8769] = exif_ifd
+    if lat is not None:
+        gps = {
+            1: "N" if lat >= 0 else "S", 2: _dms(abs(lat)),
+            3: "E" if lon >= 0 else "W", 4: _dms(abs(lon)),
+        }
+        if alt is not None:
+            gps[5] = b"\x01" if alt < 0 else b"\x00"
+            gps[6] = abs(alt)
+        exif[0x8825] = gps
+    return exif
+
+
+def _dms(value):
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round((value - degrees - minutes / 60) * 3600, 4)
+    return (float(degrees), float(minutes), seconds)
+
+
+def encode(fmt, exif, size):
+    buf = io.BytesIO()
+    Image.new("RGB", size, (40, 90, 160)).save(buf, format=fmt, exif=exif)
+    return buf.getvalue()
+
+
+def build_corpus(size):
+    cases = [
+        ("JPEG", dict(lat=35.6812, lon=139.7671, alt=40.0, taken="2024:05:01 10:20:30", offset="+09:00")),
+        ("JPEG", dict(lat=0.0, lon=-78.4678, taken="2023:01:02 03:04:05")),
+        ("JPEG", dict(lat=51.4779, lon=0.0)),
+        ("JPEG", dict(lat=31.5, lon=35.5, alt=-430.0)),
+        ("JPEG", dict(taken="0000:00:00 00:00:00")),
+        ("JPEG", None),
+        ("PNG", dict(lat=-33.8568, lon=151.2153, taken="2022:12:31 23:59:59", offset="+11:00")),
+    ]
+    try:
+        from pillow_heif import register_heif_opener
+
+        register_heif_opener()
+        encode("HEIF", Image.Exif(), (16, 16))
+        cases.append(("HEIF", dict(lat=40.7484, lon=-73.9857, taken="2021:07:04 21:00:00", offset="-05:00")))
+    except Exception as e:
+        print(f"(HEIC skipped: {e})")
+
+    return [encode(fmt, make_exif(**params) if params else None, size) for fmt, params in cases]
+
+
+def files_per_sec(fn, corpus, repeat: int) -> float:
+    files = [io.BytesIO(data) for data in corpus]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for f in files:
+            try:
+                fn(f)
+            except Exception:
+                pass  # 旧実装は PNG / HEIC で例外になる
+    return repeat * len(files) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    args = parser.parse_args()
+
+    corpus = build_corpus((args.width, args.height))
+    print(f"legacy extract_exif_data: {files_per_sec(legacy_extract, corpus, args.repeat):10.0f} files/sec")
+    print(f"metadata.read_metadata:   {files_per_sec(read_metadata, corpus, args.repeat):10.0f} files/sec")
+
+
+if __name__ == "__main__":
+    main()
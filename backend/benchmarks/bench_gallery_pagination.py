@@ -0,0 +1,58 @@
+"""
+ギャラリー一覧: OFFSET ページネーションとキーセット (created_at, id) の比較。
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.bench_gallery_pagination --dsn postgresql://... [--images 60000]
+
+OFFSET は読み飛ばす行数に比例して遅くなるが、キーセットはページの深さによらず一定。
+"""
+import argparse
+
+from benchmarks import pg
+
+OFFSET_SQL = """
+select * from public.images
+where user_id = %(user_id)s
+order by created_at desc, id desc
+limit %(limit)s offset %(offset)s
+"""
+KEYSET_SQL = """
+select * from public.images
+where user_id = %(user_id)s
+  and (created_at < %(created_at)s or (created_at = %(created_at)s and id < %(id)s))
+order by created_at desc, id desc
+limit %(limit)s
+"""
+CURSOR_SQL = """
+select created_at, id from public.images
+where user_id = %(user_id)s
+order by created_at desc, id desc
+limit 1 offset %(offset)s
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--images", type=int, default=60000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    conn = pg.connect(args.dsn)
+    pg.reset_schema(conn)
+    user_id = pg.seed_images(conn, 1, args.images)[0]
+
+    print(f"{'offset':>8} {'OFFSET ms':>10} {'keyset ms':>10}")
+    for offset in (0, 1000, 10000, 50000):
+        if offset >= args.images:
+            break
+        params = {"user_id": user_id, "limit": args.limit, "offset": offset}
+        offset_ms, _ = pg.timed(conn, OFFSET_SQL, params)
+        # 直前ページの最後の行をカーソルとして使う
+        created_at, image_id = conn.execute(CURSOR_SQL, {**params, "offset": max(offset - 1, 0)}).fetchone()
+        keyset_ms, _ = pg.timed(conn, KEYSET_SQL, {**params, "created_at": created_at, "id": image_id})
+        print(f"{offset:8d} {offset_ms:10.2f} {keyset_ms:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+GeoCLIP 推論のマイクロバッチサイズ別スループット / レイテンシ。
+
+    python -m benchmarks.bench_geoclip_batching [--images 256] [--rate 0] [--quantize] [--threads 0]
+
+オフラインで実行できるよう、GeoCLIP と同じ入出力 (画像 -> 上位k件の座標) を持つ
+小さな代替モデルを使う。--rate を指定すると毎秒 rate 件のポアソン到着で投入し、
+0 の場合は全件を一度に投入する。
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BATCH_SIZES = [1, 2, 4, 8, 16, 32]
+TOP_K = 5
+
+
+class StandInLocator:
+    """GeoCLIP の代替: 小さな CNN の画像特徴量と、ランダムな GPS ギャラリー特徴量の内積で推定する"""
+
+    def __init__(self, gallery_size: int = 10000, quantize: bool = False):
+        import torch
+        import torch.nn as nn
+        import torch.nn.functional as F
+
+        encoder = nn.Sequential(
+            nn.Conv2d(3, 32, 7, stride=4), nn.ReLU(),
+            nn.Conv2d(32, 64, 3, stride=2), nn.ReLU(),
+            nn.AdaptiveAvgPool2d(1), nn.Flatten(),
+            nn.Linear(64, 512), nn.ReLU(),
+            nn.Linear(512, 512),
+        ).eval()
+        if quantize:
+            encoder = torch.ao.quantization.quantize_dynamic(encoder, {nn.Linear}, dtype=torch.qint8)
+        self.encoder = encoder
+        self.gallery = torch.rand(gallery_size, 2) * torch.tensor([180.0, 360.0]) - torch.tensor([90.0, 180.0])
+        self.location_features = F.normalize(torch.randn(gallery_size, 512), dim=1)
+
+    def predict(self, images, top_k):
+        import numpy as np
+        import torch
+        import torch.nn.functional as F
+
+        with torch.inference_mode():
+            pixels = torch.stack([
+                torch.from_numpy(np.asarray(img.resize((224, 224)), dtype=np.float32) / 255.0).permute(2, 0, 1)
+                for img in images
+            ])
+            features = F.normalize(self.encoder(pixels), dim=1)
+            probs = (100.0 * features @ self.location_features.T).softmax(dim=-1)
+            top = torch.topk(probs, top_k, dim=1)
+        gallery = self.gallery.tolist()
+        return [
+            [(gallery[i][0], gallery[i][1], p) for i, p in zip(indices, values)]
+            for indices, values in zip(top.indices.tolist(), top.values.tolist())
+        ]
+
+
+async def run_once(locator, images, batch_size: int, rate: float):
+    from app.ai.batcher import MicroBatcher
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    batcher = MicroBatcher(lambda items: locator.predict(items, TOP_K), batch_size, 0.05, executor)
+    batcher.start()
+    latencies = []
+
+    async def one(img):
+        started = time.perf_counter()
+        await batcher.submit(img)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    tasks = []
+    for img in images:
+        tasks.append(asyncio.create_task(one(img)))
+        if rate > 0:
+            await asyncio.sleep(random.expovariate(rate))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    await batcher.stop()
+    executor.shutdown()
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return len(images) / elapsed, statistics.median(latencies), p95
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--rate", type=float, default=0.0, help="到着レート (件/秒)。0 なら一括投入")
+    parser.add_argument("--quantize", action="store_true")
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    from PIL import Image
+    from app.ai.geoclip import configure_torch_threads
+
+    configure_torch_threads(args.threads)
+    locator = StandInLocator(quantize=args.quantize)
+    images = [Image.effect_noise((640, 480), 64).convert("RGB") for _ in range(args.images)]
+    locator.predict(images[:2], TOP_K)  # ウォームアップ
+
+    print(f"images={args.images} rate={args.rate or 'burst'} quantize={args.quantize}")
+    for batch_size in BATCH_SIZES:
+        throughput, p50, p95 = asyncio.run(run_once(locator, images, batch_size, args.rate))
+        print(f"batch={batch_size:<3} {throughput:8.1f} images/sec  p50={p50 * 1000:8.1f}ms  p95={p95 * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
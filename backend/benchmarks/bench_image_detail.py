@@ -0,0 +1,97 @@
+"""
+画像詳細の取得・更新の往復回数とレイテンシ (p50 / p99)。
+
+    python -m benchmarks.bench_image_detail [--requests 200] [--latency 0.01]
+
+before: images -> locations -> image_tags の3往復 (更新時は UPDATE + 再取得で4往復)
+after : image_detail / update_image_info 関数の1往復
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.stub_supabase import StubSupabase, configure_env, postgrest_rows
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+IMAGE_ROW = {
+    "id": 1, "user_id": USER_ID, "image_url": "http://stub/a.jpg", "thumbnail_url": "http://stub/a.jpg",
+    "title": "t", "comment": None, "is_favorite": False, "location_status": "EXIF_PRESENT",
+    "taken_at": None, "created_at": "2024-01-01T00:00:00+00:00",
+}
+LOCATION_ROW = {"image_id": 1, "latitude": 35.68, "longitude": 139.76, "geoname": None, "rank": 1}
+TAG_ROWS = [{"tag_id": 1, "tags": {"id": 1, "name": "trip"}}]
+
+
+def build_stub(latency: float) -> StubSupabase:
+    stub = StubSupabase(latency=latency)
+    detail = {**IMAGE_ROW, "latitude": 35.68, "longitude": 139.76, "geoname": None, "tags": [{"id": 1, "name": "trip"}]}
+    stub.route("GET", "/rest/v1/images", lambda req: postgrest_rows([IMAGE_ROW], req))
+    stub.route("PATCH", "/rest/v1/images", lambda req: (200, [IMAGE_ROW]))
+    stub.route("GET", "/rest/v1/locations", lambda req: postgrest_rows([LOCATION_ROW], req))
+    stub.route("GET", "/rest/v1/image_tags", lambda req: postgrest_rows(TAG_ROWS, req))
+    stub.route("POST", "/rest/v1/rpc/image_detail", lambda req: (200, detail))
+    stub.route("POST", "/rest/v1/rpc/update_image_info", lambda req: (200, detail))
+    return stub
+
+
+async def legacy_detail(image_id: int, user_id: str):
+    """変更前の実装と同じ3往復"""
+    from app.db.supabase import get_db
+
+    db = get_db()
+    image = (await db.table("images").select("*").eq("id", image_id).eq("user_id", user_id).maybe_single().execute()).data
+    location = (await db.table("locations").select("*").eq("image_id", image_id).maybe_single().execute()).data
+    image.update({k: location[k] for k in ("latitude", "longitude", "geoname")})
+    tags = await db.table("image_tags").select("tag_id, tags(id, name)").eq("image_id", image_id).execute()
+    image["tags"] = [item["tags"] for item in tags.data]
+    return image
+
+
+async def legacy_update(image_id: int, user_id: str):
+    from app.db.supabase import get_db
+
+    await get_db().table("images").update({"title": "t"}).eq("id", image_id).eq("user_id", user_id).execute()
+    return await legacy_detail(image_id, user_id)
+
+
+async def measure(name, fn, n, stub):
+    latencies = []
+    before = stub.request_count
+    for _ in range(n):
+        started = time.perf_counter()
+        await fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    trips = (stub.request_count - before) / n
+    p50 = latencies[n // 2]
+    p99 = latencies[max(int(n * 0.99) - 1, 0)]
+    print(f"{name:<16} round trips={trips:4.1f}  p50={p50:7.2f}ms  p99={p99:7.2f}ms")
+
+
+async def run(n: int, stub: StubSupabase):
+    from app.db.supabase import close_db
+    from app.schemas.image import ImageUpdate
+    from app.services import image_service
+
+    update = ImageUpdate(title="t")
+    await measure("detail (before)", lambda: legacy_detail(1, USER_ID), n, stub)
+    await measure("detail (after)", lambda: image_service.get_image_detail(1, USER_ID), n, stub)
+    await measure("update (before)", lambda: legacy_update(1, USER_ID), n, stub)
+    await measure("update (after)", lambda: image_service.update_image_info(1, USER_ID, update), n, stub)
+    await close_db()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.01, help="スタブの応答遅延 (秒)")
+    args = parser.parse_args()
+
+    stub = build_stub(args.latency)
+    configure_env(stub.start())
+    asyncio.run(run(args.requests, stub))
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+ギャラリーの絞り込み・検索 (search_images) のフィルタ組み合わせ別レイテンシ。
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.bench_image_search --dsn postgresql://... [--users 1000] [--images-per-user 1000]
+
+ランダムに選んだユーザーごとに1ページ目を取得し、組み合わせごとの p50 / p95 (ms) を出力する。
+"""
+import argparse
+import random
+import time
+
+from benchmarks import pg
+
+TAG_NAMES = [f"tag{i:02d}" for i in range(50)]
+PLACES = ["東京都 渋谷区", "大阪府 大阪市", "京都府 京都市", "Paris, France", "New York, USA", "Sydney, Australia"]
+
+# 合成データに title / comment / お気に入り / 地名 / タグを付与する
+# (パラメータ付きのクエリは1文ずつ実行する必要がある)
+DECORATE_SQL = [
+    """
+    update public.images
+       set title = 'photo ' || id,
+           comment = case when id % 7 = 0 then '夕焼けの海' when id % 11 = 0 then 'mountain hike' end,
+           is_favorite = (id % 10 = 0)
+    """,
+    """
+    update public.locations
+       set geoname = (%(places)s::text[])[1 + (image_id %% cardinality(%(places)s::text[]))]
+    """,
+    "insert into public.tags (name) select unnest(%(tags)s::text[])",
+    """
+    insert into public.image_tags (image_id, tag_id)
+    select distinct i.id, t.id
+      from public.images i
+      cross join lateral generate_series(1, 1 + (i.id %% 3)) g
+      join public.tags t on t.id = 1 + ((i.id * 31 + g * 17) %% cardinality(%(tags)s::text[]))
+    """,
+    "analyze public.images",
+    "analyze public.locations",
+    "analyze public.image_tags",
+    "analyze public.tags",
+]
+
+SEARCH_SQL = """
+select public.search_images(
+    p_user_id => %(user_id)s,
+    p_taken_from => %(taken_from)s,
+    p_taken_to => %(taken_to)s,
+    p_tags => %(tags)s,
+    p_tag_mode => %(tag_mode)s,
+    p_is_favorite => %(is_favorite)s,
+    p_statuses => %(statuses)s,
+    p_query => %(query)s,
+    p_limit => 21
+)
+"""
+
+EMPTY = {
+    "taken_from": None, "taken_to": None, "tags": None, "tag_mode": "any",
+    "is_favorite": None, "statuses": None, "query": None,
+}
+
+COMBINATIONS = {
+    "year 2024":          {"taken_from": "2024-01-01", "taken_to": "2025-01-01"},
+    "favorites":          {"is_favorite": True},
+    "status NO_GPS":      {"statuses": ["NO_GPS"]},
+    "tag any (2)":        {"tags": ["tag01", "tag02"]},
+    "tag all (2)":        {"tags": ["tag01", "tag02"], "tag_mode": "all"},
+    "text (title)":       {"query": "mountain"},
+    "text (geoname)":     {"query": "渋谷"},
+    "year + favorite":    {"taken_from": "2024-01-01", "taken_to": "2025-01-01", "is_favorite": True},
+    "year + tag + text":  {"taken_from": "2020-01-01", "taken_to": "2025-01-01", "tags": ["tag03"], "query": "海"},
+}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--images-per-user", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=200, help="組み合わせごとのクエリ回数")
+    args = parser.parse_args()
+
+    conn = pg.connect(args.dsn)
+    pg.reset_schema(conn)
+    user_ids = pg.seed_images(conn, args.users, args.images_per_user)
+    for sql in DECORATE_SQL:
+        conn.execute(sql, {"places": PLACES, "tags": TAG_NAMES} if "%(" in sql else None)
+
+    rng = random.Random(1)
+    print(f"{'filter':<20} {'p50 ms':>8} {'p95 ms':>8} {'rows':>6}")
+    for name, overrides in COMBINATIONS.items():
+        params = {**EMPTY, **overrides}
+        times = []
+        rows = []
+        for _ in range(args.samples):
+            started = time.perf_counter()
+            (rows,) = conn.execute(SEARCH_SQL, {**params, "user_id": rng.choice(user_ids)}).fetchone()
+            times.append((time.perf_counter() - started) * 1000)
+        print(f"{name:<20} {percentile(times, 0.5):8.2f} {percentile(times, 0.95):8.2f} {len(rows):6d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+地図ピンのクラスタリング (pin_clusters) と、個別ピンの全件取得の比較。
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.bench_pin_clustering --dsn postgresql://... [--points 100000]
+
+1ユーザーに points 件の位置付き画像を投入し、世界全体〜都市レベルの各ズームで
+クエリ時間・返却行数・JSONのバイト数を表示する。
+"""
+import argparse
+import json
+
+from benchmarks import pg
+
+ZOOMS = [2, 4, 6, 8, 10, 12]
+STATUSES = ["EXIF_PRESENT", "CONFIRMED", "USER_MANUAL"]
+
+RAW_SQL = """
+select i.id, l.latitude, l.longitude, i.thumbnail_url, i.title
+from public.locations l join public.images i on i.id = l.image_id
+where i.user_id = %(user_id)s and i.location_status = any(%(statuses)s) and l.rank = 1
+  and l.latitude between %(min_lat)s and %(max_lat)s
+  and l.longitude between %(min_lon)s and %(max_lon)s
+"""
+CLUSTER_SQL = """
+select * from public.pin_clusters(
+    %(user_id)s, %(min_lat)s, %(max_lat)s, %(min_lon)s, %(max_lon)s, %(cell_deg)s, %(statuses)s)
+"""
+
+
+def viewport(zoom: int, center=(35.68, 139.76)):
+    # 横 1280px 相当の表示範囲
+    width = 360.0 / 2 ** zoom * 1280 / 256
+    height = min(width / 2, 170.0)
+    lat, lon = center
+    return {
+        "min_lat": max(lat - height / 2, -85.0), "max_lat": min(lat + height / 2, 85.0),
+        "min_lon": max(lon - width / 2, -180.0), "max_lon": min(lon + width / 2, 180.0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--points", type=int, default=100_000)
+    args = parser.parse_args()
+
+    from app.api.v1.endpoints.pin import cluster_cell_deg
+
+    conn = pg.connect(args.dsn)
+    pg.reset_schema(conn)
+    [user_id] = pg.seed_images(conn, n_users=1, images_per_user=int(args.points / 0.8))
+
+    print(f"{'zoom':<5} {'mode':<8} {'ms':>9} {'rows':>8} {'json bytes':>12}")
+    for zoom in ZOOMS:
+        params = {"user_id": user_id, "statuses": STATUSES, "cell_deg": cluster_cell_deg(zoom), **viewport(zoom)}
+        for mode, sql in (("raw", RAW_SQL), ("cluster", CLUSTER_SQL)):
+            ms, rows = pg.timed(conn, sql, params)
+            size = len(json.dumps([list(r) for r in rows], default=str))
+            print(f"{zoom:<5} {mode:<8} {ms:9.1f} {len(rows):8d} {size:12d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+地図ピンの応答形式ごとのシリアライズ時間と転送量。
+
+    python -m benchmarks.bench_pin_payload [--sizes 10000 100000] [--repeat 5]
+
+現在の JSON (response_model での行ごとの検証 + json.dumps、FastAPI と同じ経路) と
+pin_codec の列形式 JSON / バイナリを、合成したピン (RPC の結果と同じ dict) で比較する。
+転送量は生のバイト数と gzip 後のバイト数 (GZip ミドルウェア / CDN 経由を想定) を表示する。
+バイナリは decode_binary で往復させ、座標の誤差が 1e-6 度以内であることも確認する。
+"""
+import argparse
+import gzip
+import json
+import random
+import time
+import uuid
+from typing import List, Union
+
+from app.services import pin_codec
+
+
+def make_pins(n: int, rng: random.Random, users: int = 1) -> List[dict]:
+    # 撮影地点は数十か所の街の周辺に集まる (実データに近い分布)
+    cities = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(50)]
+    prefixes = [f"https://example.supabase.co/storage/v1/object/public/images/{uuid.uuid4()}/thumbs/" for _ in range(users)]
+    pins, image_id = [], 100_000
+    for i in range(n):
+        lat, lon = rng.choice(cities)
+        image_id += rng.randint(1, 3)  # 削除済みの画像の分だけ id が飛ぶ
+        pins.append({
+            "id": image_id,
+            "latitude": lat + rng.gauss(0, 0.05),
+            "longitude": lon + rng.gauss(0, 0.05),
+            "thumbnail_url": f"{rng.choice(prefixes)}{uuid.uuid4()}_marker.webp",
+            "title": f"IMG_{i:05d}.jpg" if rng.random() < 0.7 else None,
+        })
+    return pins
+
+
+def current_json(pins: List[dict]) -> bytes:
+    """GET /pin/images の既定の経路 (response_model の検証 -> JSON 化)"""
+    from pydantic import TypeAdapter
+
+    from app.schemas.pin import PinClusterResponse, PinResponse
+
+    adapter = TypeAdapter(List[Union[PinResponse, PinClusterResponse]])
+    models = adapter.validate_python(pins)
+    content = adapter.dump_python(models, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def measure(fn, pins, repeat: int):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn(pins)
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def check_round_trip(pins: List[dict], body: bytes) -> None:
+    decoded = {pin["id"]: pin for pin in pin_codec.decode_binary(body)}
+    assert len(decoded) == len(pins)
+    for pin in pins:
+        got = decoded[pin["id"]]
+        assert abs(got["latitude"] - pin["latitude"]) <= 1e-6 and abs(got["longitude"] - pin["longitude"]) <= 1e-6
+        assert got["thumbnail_url"] == pin["thumbnail_url"] and got["title"] == pin["title"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    formats = [
+        ("json", current_json),
+        ("columnar", pin_codec.encode_columnar),
+        ("binary", pin_codec.encode_binary),
+    ]
+    print(f"{'pins':>8} {'format':<10} {'ms':>9} {'bytes':>11} {'gzip bytes':>11} {'bytes/pin':>10}")
+    for n in args.sizes:
+        pins = make_pins(n, rng)
+        for name, fn in formats:
+            ms, body = measure(fn, pins, args.repeat)
+            if name == "binary":
+                check_round_trip(pins, body)
+            zipped = len(gzip.compress(body, compresslevel=6))
+            print(f"{n:8d} {name:<10} {ms:9.1f} {len(body):11d} {zipped:11d} {len(body) / n:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
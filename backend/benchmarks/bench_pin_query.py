@@ -0,0 +1,59 @@
+"""
+地図ピンの範囲検索: 旧クエリ (緯度・経度の範囲比較) と pins_in_bbox (geom + GiST) の比較。
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.bench_pin_query --dsn postgresql://... [--users 100] [--images-per-user 2000]
+
+180度線をまたぐ表示範囲では、旧クエリは min_lon > max_lon となり1件も返せない。
+"""
+import argparse
+
+from benchmarks import pg
+
+STATUSES = ["EXIF_PRESENT", "CONFIRMED", "USER_MANUAL"]
+
+LEGACY_SQL = """
+select i.id, l.latitude, l.longitude, i.thumbnail_url, i.title
+from public.locations l join public.images i on i.id = l.image_id
+where l.latitude >= %(min_lat)s and l.latitude <= %(max_lat)s
+  and l.longitude >= %(min_lon)s and l.longitude <= %(max_lon)s
+  and i.user_id = %(user_id)s and i.location_status = any(%(statuses)s)
+"""
+RPC_SQL = """
+select * from public.pins_in_bbox(%(user_id)s, %(min_lat)s, %(max_lat)s, %(min_lon)s, %(max_lon)s, %(statuses)s)
+"""
+
+VIEWPORTS = {
+    "city":         (35.5, 35.9, 139.5, 140.0),
+    "region":       (30.0, 45.0, 130.0, 145.0),
+    "continent":    (-10.0, 60.0, 60.0, 150.0),
+    "world":        (-85.0, 85.0, -180.0, 180.0),
+    "antimeridian": (-50.0, 10.0, 160.0, -150.0),  # 西端 > 東端: 180度線をまたぐ
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--images-per-user", type=int, default=2000)
+    args = parser.parse_args()
+
+    conn = pg.connect(args.dsn)
+    pg.reset_schema(conn)
+    user_ids = pg.seed_images(conn, args.users, args.images_per_user)
+    user_id = user_ids[0]
+
+    print(f"{'viewport':<13} {'legacy ms':>10} {'rows':>7} {'rpc ms':>9} {'rows':>7}")
+    for name, (min_lat, max_lat, min_lon, max_lon) in VIEWPORTS.items():
+        params = {
+            "user_id": user_id, "statuses": STATUSES,
+            "min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon,
+        }
+        legacy_ms, legacy_rows = pg.timed(conn, LEGACY_SQL, params)
+        rpc_ms, rpc_rows = pg.timed(conn, RPC_SQL, params)
+        print(f"{name:<13} {legacy_ms:10.1f} {len(legacy_rows):7d} {rpc_ms:9.1f} {len(rpc_rows):7d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+再開可能アップロード (POST /uploads -> PUT チャンク -> complete) の通し確認と転送時間。
+
+    python -m benchmarks.bench_resumable_upload [--size-mb 20] [--chunk-mb 4] [--drop-rate 0.3]
+
+ストレージ・DB はスタブ (受信したオブジェクトのハッシュを記録) を使う。
+各チャンクは drop-rate の確率で途中までしか届かない (回線断を再現) ため、
+クライアントは HEAD で受信済みサイズを確認して続きから再送する。
+最後にストレージに届いた内容が元ファイルと一致することを確認する。
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.stub_supabase import StubSupabase, configure_env, postgrest_rows
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+
+def make_jpeg(size_mb: int) -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (640, 480), (10, 120, 200)).save(buf, format="JPEG")
+    # 末尾にパディングを付けて目標サイズにする (JPEG としては EOI 以降は無視される)
+    return buf.getvalue() + os.urandom(size_mb * 1024 * 1024)
+
+
+def build_stub(received: dict) -> StubSupabase:
+    stub = StubSupabase()
+    counter = iter(range(1, 1_000_000))
+
+    def store(req):
+        received[req.path] = hashlib.sha256(req.body).hexdigest()
+        return 200, {"Key": req.path}
+
+    def insert_image(req):
+        row = req.json()
+        row.update({"id": next(counter), "created_at": "2024-01-01T00:00:00+00:00", "title": None, "comment": None})
+        return 201, [row]
+
+    stub.route("POST", "/storage/v1/object/", store)
+    stub.route("GET", "/rest/v1/images", lambda req: postgrest_rows([], req))
+    stub.route("POST", "/rest/v1/images", insert_image)
+    stub.route("POST", "/rest/v1/locations", lambda req: (201, [req.json()]))
+    stub.route("POST", "/rest/v1/jobs", lambda req: (201, [req.json()]))
+    return stub
+
+
+async def run(data: bytes, chunk_size: int, drop_rate: float) -> dict:
+    import httpx
+    from app.api import deps
+    from app.core.security import AuthUser
+    from app.main import app
+
+    app.dependency_overrides[deps.get_current_user] = lambda: AuthUser(id=USER_ID)
+    rng = random.Random(0)
+    stats = {"requests": 0, "drops": 0}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench/api/v1", timeout=None) as client:
+        started = time.perf_counter()
+        res = await client.post("/uploads", json={"filename": "large.jpg", "size": len(data), "content_type": "image/jpeg"})
+        assert res.status_code == 201, res.text
+        upload_id = res.json()["id"]
+
+        # 揃う前の complete と、オフセットのずれた PUT は 409
+        assert (await client.post(f"/uploads/{upload_id}/complete")).status_code == 409
+        assert (await client.put(f"/uploads/{upload_id}", content=b"x", headers={"Upload-Offset": "1"})).status_code == 409
+
+        offset = 0
+        while offset < len(data):
+            chunk = data[offset:offset + chunk_size]
+            if rng.random() < drop_rate:
+                # 回線断: チャンクの途中までしか届かない
+                chunk = chunk[:rng.randint(0, len(chunk) - 1)]
+                stats["drops"] += 1
+            res = await client.put(f"/uploads/{upload_id}", content=chunk, headers={"Upload-Offset": str(offset)})
+            assert res.status_code == 200, res.text
+            stats["requests"] += 1
+            # 再開時と同じく、サーバーの受信済みサイズから続ける
+            head = await client.head(f"/uploads/{upload_id}")
+            offset = int(head.headers["Upload-Offset"])
+
+        res = await client.post(f"/uploads/{upload_id}/complete")
+        assert res.status_code == 201, res.text
+        stats["elapsed"] = time.perf_counter() - started
+        stats["image"] = res.json()
+        assert (await client.head(f"/uploads/{upload_id}")).status_code == 404
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--chunk-mb", type=float, default=4)
+    parser.add_argument("--drop-rate", type=float, default=0.3)
+    args = parser.parse_args()
+
+    received = {}
+    stub = build_stub(received)
+    session_dir = tempfile.mkdtemp(prefix="pinaly-bench-uploads-")
+    configure_env(
+        stub.start(),
+        UPLOAD_MAX_BYTES=str((args.size_mb + 1) * 1024 * 1024),
+        UPLOAD_SESSION_DIR=session_dir,
+    )
+    data = make_jpeg(args.size_mb)
+
+    stats = asyncio.run(run(data, int(args.chunk_mb * 1024 * 1024), args.drop_rate))
+
+    stored = [digest for path, digest in received.items() if "/thumbs/" not in path]
+    assert stored == [hashlib.sha256(data).hexdigest()], "stored object does not match the original"
+    assert not os.listdir(session_dir), "upload session was not cleaned up"
+    print(f"uploaded {len(data) / 1024 / 1024:.1f} MB in {stats['elapsed']:.2f}s "
+          f"({stats['requests']} PUTs, {stats['drops']} interrupted)")
+    print(f"image id={stats['image']['id']} status={stats['image']['location_status']} - stored object matches")
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+オフライン逆ジオコーディング (geoname_service.ReverseGeocoder) の構築時間・メモリ・検索速度。
+
+    python -m benchmarks.bench_reverse_geocoding [--geonames data/cities1000.txt] [--places 150000]
+        [--queries 100000] [--max-km 50] [--check 2000]
+
+--geonames を指定しない場合は、GeoNames の cities1000 と同程度の件数の合成データを使う
+(陸地を模して数百か所の地域の周辺に集める)。
+検索はバッチサイズ別に1コアで計測し、--check 件は全件との総当たりで結果が一致することを確認する。
+メモリはインデックスの配列サイズと、構築前後の RSS の差を表示する。
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.ai.model_server import rss_bytes
+from app.core.spatial_index import _unit_vectors, chord_to_km
+from app.services.geoname_service import ReverseGeocoder, load_cities
+
+BATCH_SIZES = [1, 100, 10_000, 100_000]
+
+
+def synthetic_places(n: int, rng: np.random.Generator):
+    centers_lat = np.degrees(np.arcsin(rng.uniform(-0.8, 0.95, 300)))
+    centers_lon = rng.uniform(-180, 180, 300)
+    which = rng.integers(0, 300, n)
+    lats = np.clip(centers_lat[which] + rng.normal(0, 2.0, n), -89.9, 89.9)
+    lons = (centers_lon[which] + rng.normal(0, 3.0, n) + 180) % 360 - 180
+    return lats.tolist(), lons.tolist(), [f"Place {i}, XX" for i in range(n)]
+
+
+def brute_force(lats, lons, qlat, qlon) -> np.ndarray:
+    points = _unit_vectors(lats, lons).astype(np.float64)
+    query = _unit_vectors(qlat, qlon).astype(np.float64)
+    result = []
+    for start in range(0, len(query), 256):
+        chunk = query[start:start + 256]
+        dist2 = ((chunk[:, None, :] - points[None]) ** 2).sum(axis=-1)
+        result.append(dist2.argmin(axis=1))
+    return np.concatenate(result)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--geonames", help="GeoNames の都市データ (cities1000.txt など)")
+    parser.add_argument("--places", type=int, default=150_000, help="合成データの地点数")
+    parser.add_argument("--queries", type=int, default=100_000)
+    parser.add_argument("--max-km", type=float, default=50.0, help="GEONAMES_MAX_DISTANCE_KM に相当")
+    parser.add_argument("--check", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    started = time.perf_counter()
+    if args.geonames:
+        lats, lons, names = load_cities(args.geonames)
+    else:
+        lats, lons, names = synthetic_places(args.places, rng)
+    load_seconds = time.perf_counter() - started
+
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    geocoder = ReverseGeocoder(lats, lons, names, max_distance_km=args.max_km)
+    build_seconds = time.perf_counter() - started
+    rss_after = rss_bytes()
+    print(f"places={len(geocoder)} load={load_seconds:.2f}s build={build_seconds:.2f}s")
+    print(
+        f"index={geocoder.nbytes / 2**20:.1f} MB (tree {geocoder.tree.nbytes / 2**20:.1f} MB) "
+        f"rss +{(rss_after - rss_before) / 2**20:.1f} MB (total {rss_after / 2**20:.0f} MB)"
+    )
+
+    # 写真の撮影地を模して、半分は地点の近く・半分は一様 (海上を含む)
+    n = args.queries
+    near = rng.integers(0, len(lats), n // 2)
+    qlat = np.concatenate([np.asarray(lats)[near] + rng.normal(0, 0.05, n // 2),
+                           np.degrees(np.arcsin(rng.uniform(-1, 1, n - n // 2)))])
+    qlon = np.concatenate([np.asarray(lons)[near] + rng.normal(0, 0.05, n // 2),
+                           rng.uniform(-180, 180, n - n // 2)])
+    qlat = np.clip(qlat, -90, 90)
+
+    print(f"{'batch':>8} {'lookups/sec':>12} {'us/lookup':>10}")
+    for batch in (size for size in BATCH_SIZES if size <= n):
+        total = min(n, max(batch * 20, 2000)) // batch * batch
+        started = time.perf_counter()
+        for start in range(0, total, batch):
+            geocoder.lookup_indexes(qlat[start:start + batch], qlon[start:start + batch])
+        elapsed = time.perf_counter() - started
+        print(f"{batch:8d} {total / elapsed:12.0f} {elapsed / total * 1e6:10.2f}")
+
+    if args.check:
+        # 地点の近く・一様の両方から抜き出す
+        sample = np.linspace(0, n - 1, min(args.check, n)).astype(int)
+        qlat, qlon = qlat[sample], qlon[sample]
+        expected = brute_force(lats, lons, qlat, qlon)
+        got = geocoder.lookup_indexes(qlat, qlon)
+        # 等距離の地点が複数ある場合は添字が違ってもよいので、距離で比較する
+        points = _unit_vectors(lats, lons).astype(np.float64)
+        query = _unit_vectors(qlat, qlon).astype(np.float64)
+        d_expected = chord_to_km(np.linalg.norm(points[expected] - query, axis=1))
+        d_got = chord_to_km(np.linalg.norm(points[got] - query, axis=1))
+        within = d_expected <= args.max_km
+        mismatches = int((within & ((got < 0) | (d_got > d_expected + 1e-3))).sum())
+        mismatches += int((~within & (got >= 0) & (d_got > args.max_km + 1e-3)).sum())
+        print(
+            f"check: {len(sample)} lookups vs brute force, {int(within.sum())} within {args.max_km:g} km, "
+            f"mismatches={mismatches}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+API / GeoCLIP ワーカーの起動時間とプロセスごとの常駐メモリ (RSS)。
+
+    python -m benchmarks.bench_startup [--runs 5] [--workers 4] [--stand-in] [--skip-geoclip]
+
+api     : 別プロセスで app.main を import するまでの時間と RSS (uvicorn のワーカー1つ分)。
+          torch / numpy など重いモジュールが読み込まれていないことも表示する。
+local   : ワーカー workers 個がそれぞれモデルを読み込む場合 (GEOCLIP_SERVER_ADDRESS 未設定)
+shared  : 推論サーバー1つ + モデルを持たないワーカー workers 個 (GEOCLIP_SERVER_ADDRESS 設定時)
+          起動時間はワーカーが1件目の推論結果を受け取るまで (サーバーの読み込み時間は別に表示)
+
+--stand-in を付けると GeoCLIP の代わりに bench_geoclip_batching の小さな代替モデルを使う
+(重みのダウンロードが不要。torch 自体の読み込み分は計測に含まれる)。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ["torch", "numpy", "geoclip", "PIL"]
+
+
+def _report(**values) -> None:
+    from app.ai.model_server import rss_bytes
+
+    values["rss_bytes"] = rss_bytes()
+    values["loaded"] = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(json.dumps(values), flush=True)
+
+
+def _load_locator(stand_in: bool):
+    if stand_in:
+        from benchmarks.bench_geoclip_batching import StandInLocator
+
+        return StandInLocator()
+    from app.ai.geoclip import GeoCLIPLocator
+
+    return GeoCLIPLocator()
+
+
+def _sample_image():
+    from PIL import Image
+
+    return Image.new("RGB", (448, 448), (120, 160, 200))
+
+
+# --- 子プロセス側 ---
+
+def role_api() -> None:
+    from benchmarks.stub_supabase import configure_env
+
+    configure_env("http://127.0.0.1:9")
+    started = time.perf_counter()
+    import app.main  # noqa: F401
+
+    _report(seconds=time.perf_counter() - started)
+
+
+def role_local_worker(stand_in: bool) -> None:
+    from benchmarks.stub_supabase import configure_env
+
+    configure_env("http://127.0.0.1:9")
+    started = time.perf_counter()
+    import app.commands.geoclip_worker  # noqa: F401
+
+    locator = _load_locator(stand_in)
+    locator.predict([_sample_image()], 5)
+    _report(seconds=time.perf_counter() - started)
+
+
+def role_remote_worker(address: str) -> None:
+    from benchmarks.stub_supabase import configure_env
+
+    configure_env("http://127.0.0.1:9")
+    started = time.perf_counter()
+    import app.commands.geoclip_worker  # noqa: F401
+    from app.ai.model_server import RemoteLocator
+
+    locator = RemoteLocator(address)
+    locator.predict([_sample_image()], 5)
+    _report(seconds=time.perf_counter() - started)
+
+
+def role_server(address: str, stand_in: bool) -> None:
+    import asyncio
+
+    from app.ai.model_server import ModelServer
+
+    started = time.perf_counter()
+    locator = _load_locator(stand_in)
+    server = ModelServer(locator, max_batch_size=16, max_wait=0.05, load_seconds=time.perf_counter() - started)
+    asyncio.run(server.serve(address))
+
+
+# --- 計測側 ---
+
+def _spawn(*args: str) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "benchmarks.bench_startup", *args], stdout=subprocess.PIPE, text=True)
+
+
+def _collect(procs) -> list:
+    results = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        if proc.returncode != 0:
+            raise SystemExit(f"child process failed: {proc.args}")
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    return results
+
+
+def _print_row(mode: str, processes: int, seconds: float, rss_total: int, note: str = "") -> None:
+    print(f"{mode:<8} {processes:>9d} {seconds:>12.2f} {rss_total / 2**20:>14.1f}  {note}")
+
+
+def bench_api(runs: int) -> None:
+    _collect([_spawn("--role", "api")])  # 1回目はディスクキャッシュを温めるだけ
+    results = []
+    for _ in range(runs):
+        results.extend(_collect([_spawn("--role", "api")]))
+    seconds = statistics.median(r["seconds"] for r in results)
+    rss = statistics.median(r["rss_bytes"] for r in results)
+    _print_row("api", 1, seconds, rss, "loaded: " + (", ".join(results[0]["loaded"]) or "-"))
+
+
+def bench_local(workers: int, stand_in: bool) -> None:
+    flags = ["--stand-in"] if stand_in else []
+    results = _collect([_spawn("--role", "local-worker", *flags) for _ in range(workers)])
+    _print_row(
+        "local", workers, statistics.median(r["seconds"] for r in results),
+        sum(r["rss_bytes"] for r in results), "loaded: " + ", ".join(results[0]["loaded"]),
+    )
+
+
+def bench_shared(workers: int, stand_in: bool) -> None:
+    from app.ai.model_server import RemoteLocator
+
+    address = os.path.join(tempfile.mkdtemp(), "geoclip.sock")
+    server = _spawn("--role", "server", "--address", address, *(["--stand-in"] if stand_in else []))
+    try:
+        client = RemoteLocator(address)
+        client.wait_ready(timeout=600)
+        results = _collect([_spawn("--role", "remote-worker", "--address", address) for _ in range(workers)])
+        stats = client.stats()
+        client.close()
+    finally:
+        server.terminate()
+        server.wait()
+    _print_row(
+        "shared", workers + 1, statistics.median(r["seconds"] for r in results),
+        stats["rss_bytes"] + sum(r["rss_bytes"] for r in results),
+        f"server load {stats['load_seconds']:.2f}s / {stats['rss_bytes'] / 2**20:.0f}MB, "
+        f"worker {statistics.median(r['rss_bytes'] for r in results) / 2**20:.0f}MB each, "
+        f"loaded: " + (", ".join(results[0]["loaded"]) or "-"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--stand-in", action="store_true")
+    parser.add_argument("--skip-geoclip", action="store_true")
+    parser.add_argument("--role", choices=["api", "local-worker", "remote-worker", "server"], help=argparse.SUPPRESS)
+    parser.add_argument("--address", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == "api":
+        return role_api()
+    if args.role == "local-worker":
+        return role_local_worker(args.stand_in)
+    if args.role == "remote-worker":
+        return role_remote_worker(args.address)
+    if args.role == "server":
+        return role_server(args.address, args.stand_in)
+
+    print(f"{'mode':<8} {'processes':>9} {'startup (s)':>12} {'total RSS MB':>14}")
+    bench_api(args.runs)
+    if not args.skip_geoclip:
+        bench_local(args.workers, args.stand_in)
+        bench_shared(args.workers, args.stand_in)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+タグ入力補完: PrefixIndex の構築時間と前方一致検索のレイテンシ。
+
+    python -m benchmarks.bench_tag_autocomplete [--tags 1000000] [--limit 20]
+
+依存パッケージ不要 (app.core.prefix_index のみ使用)。
+"""
+import argparse
+import random
+import string
+import time
+
+from app.core.prefix_index import PrefixIndex
+
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのまみむめもやゆよらりるれろわ"
+
+
+def random_name(rng: random.Random) -> str:
+    alphabet = KANA if rng.random() < 0.3 else string.ascii_lowercase
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 12)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tags", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    names = list({random_name(rng) for _ in range(args.tags)})
+
+    started = time.perf_counter()
+    index = PrefixIndex(enumerate(names, start=1))
+    print(f"build: {len(index)} tags in {time.perf_counter() - started:.2f}s")
+
+    started = time.perf_counter()
+    index.add((len(names) + i, f"new{i}") for i in range(100))
+    print(f"add 100 tags: {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    for prefix_len in (1, 2, 3, 5):
+        prefixes = [rng.choice(names)[:prefix_len] for _ in range(args.queries)]
+        times = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            index.search(prefix, args.limit)
+            times.append(time.perf_counter() - started)
+        times.sort()
+        p50 = times[len(times) // 2] * 1e6
+        p99 = times[int(len(times) * 0.99)] * 1e6
+        print(f"prefix len={prefix_len}: p50 {p50:.1f} us  p99 {p99:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
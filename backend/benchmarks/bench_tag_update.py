@@ -0,0 +1,111 @@
+"""
+画像のタグ更新: 旧実装 (全削除 + IN 検索 + 新規タグを1件ずつ INSERT) と set_image_tags の比較。
+
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.bench_tag_update --dsn postgresql://... [--tags 50] [--rtt-ms 20]
+
+--rtt-ms は API サーバーと DB の往復遅延 (1クエリごとに加算)。
+最後に同じ新規タグ名を複数スレッドから同時に更新した場合の失敗数・作成数を表示する
+(旧実装は一意制約違反で失敗する。set_image_tags の同時実行は tests/test_set_image_tags.py で検証する)。
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from benchmarks import pg
+
+
+def legacy_update(conn, image_id, names, rtt):
+    """旧 _update_image_tags と同じ順序・回数のクエリを発行する"""
+    def q(sql, params=None):
+        time.sleep(rtt)
+        cur = conn.execute(sql, params)
+        return cur.fetchall() if cur.description else None
+
+    q("delete from public.image_tags where image_id = %s", (image_id,))
+    existing = dict((n, i) for i, n in q("select id, name from public.tags where name = any(%s)", (names,)))
+    tag_ids = []
+    for name in names:
+        if name in existing:
+            tag_ids.append(existing[name])
+        else:
+            tag_ids.append(q("insert into public.tags (name) values (%s) returning id", (name,))[0][0])
+    q("insert into public.image_tags (image_id, tag_id) select %s, unnest(%s::bigint[]) returning image_id", (image_id, tag_ids))
+
+
+def rpc_update(conn, image_id, names, rtt):
+    time.sleep(rtt)
+    conn.execute("select public.set_image_tags(%s, %s)", (image_id, names)).fetchone()
+
+
+def run_concurrent(dsn, update, image_ids, names, rtt):
+    """image_ids ごとに別スレッド・別接続で同じタグ名を同時に設定し、失敗数を返す"""
+    errors = []
+    barrier = threading.Barrier(len(image_ids))
+
+    def worker(image_id):
+        conn = pg.connect(dsn)
+        barrier.wait()
+        try:
+            update(conn, image_id, names, rtt)
+        except Exception as e:  # noqa: BLE001 - 失敗の種類を集計する
+            errors.append(type(e).__name__)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in image_ids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=20.0)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    conn = pg.connect(args.dsn)
+    pg.reset_schema(conn)
+    pg.seed_images(conn, 1, args.threads + 2)
+    image_ids = [row[0] for row in conn.execute("select id from public.images order by id").fetchall()]
+
+    print(f"{'impl':<8} {'new tags ms':>12} {'existing ms':>12}")
+    for name, update in (("legacy", legacy_update), ("rpc", rpc_update)):
+        fresh, existing = [], []
+        for _ in range(args.repeat):
+            names = [f"{name}-{uuid.uuid4().hex[:8]}-{i}" for i in range(args.tags)]
+            started = time.perf_counter()
+            update(conn, image_ids[0], names, rtt)
+            fresh.append((time.perf_counter() - started) * 1000)
+            # 同じタグのまま他の画像へ (すべて既存タグ)
+            started = time.perf_counter()
+            update(conn, image_ids[1], names, rtt)
+            existing.append((time.perf_counter() - started) * 1000)
+        fresh.sort()
+        existing.sort()
+        print(f"{name:<8} {fresh[len(fresh) // 2]:12.1f} {existing[len(existing) // 2]:12.1f}")
+
+    print()
+    print(f"concurrent update: {args.threads} threads x {args.tags} new tags")
+    for name, update in (("legacy", legacy_update), ("rpc", rpc_update)):
+        names = [f"race-{name}-{i}" for i in range(args.tags)]
+        errors = run_concurrent(args.dsn, update, image_ids[2:], names, rtt=0)
+        (created,) = conn.execute("select count(*) from public.tags where name = any(%s)", (names,)).fetchone()
+        (links,) = conn.execute(
+            "select count(*) from public.image_tags it join public.tags t on t.id = it.tag_id where t.name = any(%s)",
+            (names,),
+        ).fetchone()
+        print(f"{name:<8} errors={len(errors)} {sorted(set(errors))} tags={created} links={links}"
+              f" (expected tags={args.tags} links={args.tags * args.threads})")
+
+
+if __name__ == "__main__":
+    main()
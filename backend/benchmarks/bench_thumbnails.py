@@ -0,0 +1,57 @@
+"""
+サムネイル生成のスループット (images/sec, images/sec/core) を計測する。
+
+    python -m benchmarks.bench_thumbnails [--images 48] [--width 4032] [--height 3024]
+
+ネットワークは使わず、合成した JPEG に対して render_derivatives を
+ワーカー数 1, 2, 4, ... (CPUコア数まで) のプロセスプールで実行する。
+"""
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+SIZES = {"marker": 96, "grid": 400, "preview": 1280}
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+    from PIL import Image
+
+    # 単色だと圧縮が効きすぎるため、グラデーションのノイズ画像にする
+    img = Image.effect_noise((width, height), 64).convert("RGB")
+    buf = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: 90度回転
+    img.save(buf, format="JPEG", quality=90, exif=exif)
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=48)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--format", default="WEBP")
+    args = parser.parse_args()
+
+    from app.services.imaging import render_derivatives
+
+    data = make_jpeg(args.width, args.height)
+    print(f"source: {args.width}x{args.height} JPEG, {len(data) / 1024 / 1024:.1f} MB, format={args.format}")
+
+    cores = os.cpu_count() or 1
+    workers = 1
+    while workers <= cores:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(render_derivatives, [data] * workers, [SIZES] * workers, [args.format] * workers))  # ウォームアップ
+            started = time.perf_counter()
+            list(pool.map(render_derivatives, [data] * args.images, [SIZES] * args.images, [args.format] * args.images))
+            elapsed = time.perf_counter() - started
+        rate = args.images / elapsed
+        print(f"workers={workers:<3} {rate:7.2f} images/sec  {rate / workers:6.2f} images/sec/core")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
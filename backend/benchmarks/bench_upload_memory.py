@@ -0,0 +1,102 @@
+"""
+POST /images の同時アップロード時のメモリ使用量を計測する。
+
+    python -m benchmarks.bench_upload_memory [--concurrency 8] [--size-mb 20]
+
+size-mb の JPEG を concurrency 件同時にアップロードし、
+tracemalloc のピーク (Python ヒープ) と ru_maxrss を表示する。
+ストリーミングが効いていれば、ピークは「件数 × ファイルサイズ」より大幅に小さくなる。
+"""
+import argparse
+import asyncio
+import io
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.stub_supabase import StubSupabase, postgrest_rows, configure_env
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+
+def make_large_jpeg(size_mb: int) -> str:
+    """小さな JPEG の後ろに詰め物をして指定サイズのファイルを作る (EXIF 解析はヘッダーのみ)"""
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), (120, 160, 200)).save(buf, format="JPEG")
+    fd, path = tempfile.mkstemp(suffix=".jpg")
+    with os.fdopen(fd, "wb") as f:
+        f.write(buf.getvalue())
+        padding = b"\0" * (1024 * 1024)
+        for _ in range(size_mb):
+            f.write(padding)
+    return path
+
+
+def build_stub() -> StubSupabase:
+    stub = StubSupabase()
+    counter = iter(range(1, 1_000_000))
+
+    def insert_image(req):
+        row = req.json()
+        row.update({"id": next(counter), "created_at": "2024-01-01T00:00:00+00:00", "title": None, "comment": None})
+        return 201, [row]
+
+    stub.route("POST", "/storage/v1/object/", lambda req: (200, {"Key": req.path}), keep_body=False)
+    # 重複チェック (content_hash の検索): 常に未登録
+    stub.route("GET", "/rest/v1/images", lambda req: postgrest_rows([], req))
+    stub.route("POST", "/rest/v1/images", insert_image)
+    stub.route("POST", "/rest/v1/locations", lambda req: (201, [req.json()]))
+    stub.route("POST", "/rest/v1/jobs", lambda req: (201, [req.json()]))
+    return stub
+
+
+async def run(concurrency: int, path: str) -> float:
+    import httpx
+    from app.api import deps
+    from app.core.security import AuthUser
+    from app.main import app
+
+    app.dependency_overrides[deps.get_current_user] = lambda: AuthUser(id=USER_ID)
+
+    async def upload(client):
+        with open(path, "rb") as f:
+            res = await client.post("/api/v1/images", files={"file": ("photo.jpg", f, "image/jpeg")})
+        assert res.status_code == 201, res.text
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(upload(client) for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=20)
+    args = parser.parse_args()
+
+    stub = build_stub()
+    configure_env(stub.start(), UPLOAD_MAX_BYTES=str((args.size_mb + 1) * 1024 * 1024))
+    path = make_large_jpeg(args.size_mb)
+
+    tracemalloc.start()
+    elapsed = asyncio.run(run(args.concurrency, path))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_mb = args.concurrency * os.path.getsize(path) / 1024 / 1024
+    maxrss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"uploads: {args.concurrency} x {args.size_mb} MB ({total_mb:.0f} MB total) in {elapsed:.2f}s")
+    print(f"tracemalloc peak: {peak / 1024 / 1024:.1f} MB")
+    print(f"ru_maxrss:        {maxrss_mb:.1f} MB")
+    os.unlink(path)
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+負荷試験用の Supabase 代替 (PostgREST / Auth / Storage をメモリ上で再現する)。
+
+StubSupabase の上に、アプリが実際に発行するクエリ・RPC だけを実装している。
+SQL の実行コストは再現しないため、計測されるのは API サーバー側の処理と
+往復回数 (LATENCY 秒/回) の影響になる。未対応のクエリは 400 を返す (黙って空を返さない)。
+"""
+import bisect
+import math
+import random
+import re
+import threading
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from benchmarks.stub_supabase import StubRequest, StubSupabase, postgrest_rows
+
+STORAGE_PREFIX = "/storage/v1/object/public/images/"
+
+_KEYSET_RE = re.compile(r'created_at\.lt\."([^"]+)",and\(created_at\.eq\."[^"]+",id\.lt\.(\d+)\)')
+
+
+def _bad_request(message: str) -> Tuple[int, object]:
+    return 400, {"code": "FAKE400", "message": message, "details": None, "hint": None}
+
+
+def _eq(value: str) -> str:
+    if not value.startswith("eq."):
+        raise ValueError(value)
+    return value[3:]
+
+
+def _in(value: str) -> List[str]:
+    if not (value.startswith("in.(") and value.endswith(")")):
+        raise ValueError(value)
+    return [v.strip('"') for v in value[4:-1].split(",") if v]
+
+
+class FakeSupabase(StubSupabase):
+    """
+    seed() で合成データを投入してから start() する。
+    データはすべてロック下のメモリ上の dict で、ユーザーごとに (created_at, id) 順の索引を持つ。
+    """
+
+    def __init__(self, latency: float = 0.0, base_url_for_images: str = "http://bench"):
+        super().__init__(latency=latency)
+        self.image_base_url = base_url_for_images
+        self.images: Dict[int, Dict[str, Any]] = {}
+        self.locations: Dict[int, Dict[str, Any]] = {}        # image_id -> 代表位置 (rank=1)
+        self.tags: Dict[str, int] = {}                         # name -> id
+        self.tag_names: Dict[int, str] = {}
+        self.image_tags: Dict[int, Set[int]] = defaultdict(set)
+        self.by_user: Dict[str, List[Tuple[str, int]]] = defaultdict(list)  # (created_at, id) 昇順
+        self.hashes: Dict[Tuple[str, str], int] = {}
+        self.users: Dict[str, str] = {}                        # access token -> user_id (remote 認証用)
+        self.jobs = 0
+        self.stored_bytes = 0
+        self._next_id = 1
+        self._clock = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self._data_lock = threading.Lock()
+        self._register_routes()
+
+    # ------------------------------------------------------------------
+    # データ
+    # ------------------------------------------------------------------
+    def _now(self) -> str:
+        # created_at は単調増加させる (同じ値の行も keyset で正しく扱えるように id で順序付け)
+        self._clock += timedelta(microseconds=1000)
+        return self._clock.isoformat(timespec="microseconds")
+
+    def _add_image(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        image_id = self._next_id
+        self._next_id += 1
+        created_at = self._now()
+        row = {
+            "title": None,
+            "comment": None,
+            "is_favorite": False,
+            "derivatives": None,
+            "content_hash": None,
+            "phash": None,
+            "taken_at": None,
+            **row,
+            "id": image_id,
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+        self.images[image_id] = row
+        self.by_user[row["user_id"]].append((created_at, image_id))
+        if row.get("content_hash"):
+            self.hashes[(row["user_id"], row["content_hash"])] = image_id
+        return row
+
+    def _add_location(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        location = {"geoname": None, "rank": 1, **row}
+        location.pop("geom", None)
+        self.locations[row["image_id"]] = location
+        return location
+
+    def _set_tags(self, image_id: int, names: List[str]) -> List[Dict[str, Any]]:
+        ids = set()
+        for name in dict.fromkeys(n.strip() for n in names if n and n.strip()):
+            if name not in self.tags:
+                tag_id = len(self.tags) + 1
+                self.tags[name] = tag_id
+                self.tag_names[tag_id] = name
+            ids.add(self.tags[name])
+        self.image_tags[image_id] = ids
+        return self._tags_of(image_id)
+
+    def _tags_of(self, image_id: int) -> List[Dict[str, Any]]:
+        return sorted(
+            ({"id": t, "name": self.tag_names[t]} for t in self.image_tags.get(image_id, ())),
+            key=lambda t: t["name"],
+        )
+
+    def seed(self, n_users: int, images_per_user: int, n_tags: int = 500, seed: int = 0) -> List[str]:
+        """
+        合成データを投入し、ユーザーIDの一覧を返す。
+        8割の画像に位置 (いくつかの「都市」の周辺) を、0〜3個のタグを付ける。
+        """
+        rng = random.Random(seed)
+        cities = [(rng.uniform(-50.0, 65.0), rng.uniform(-180.0, 180.0)) for _ in range(100)]
+        vocabulary = [f"tag{i:04d}" for i in range(n_tags)]
+        user_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(n_users)]
+        with self._data_lock:
+            for user_id in user_ids:
+                for i in range(images_per_user):
+                    url = f"{self.image_base_url}{STORAGE_PREFIX}{user_id}/{i}.jpg"
+                    has_gps = rng.random() < 0.8
+                    image = self._add_image({
+                        "user_id": user_id,
+                        "image_url": url,
+                        "thumbnail_url": url,
+                        "taken_at": f"20{rng.randint(15, 24)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00+00:00",
+                        "location_status": "EXIF_PRESENT" if has_gps else "NO_GPS",
+                        "content_hash": f"{rng.getrandbits(256):064x}",
+                    })
+                    if has_gps:
+                        lat0, lon0 = rng.choice(cities)
+                        self._add_location({
+                            "image_id": image["id"],
+                            "latitude": max(min(lat0 + rng.gauss(0, 0.5), 89.9), -89.9),
+                            "longitude": (lon0 + rng.gauss(0, 0.5) + 180) % 360 - 180,
+                            "source_type": "EXIF",
+                        })
+                    self._set_tags(image["id"], rng.sample(vocabulary, rng.randint(0, 3)))
+        return user_ids
+
+    def image_ids(self, user_id: str) -> List[int]:
+        with self._data_lock:
+            return [image_id for _, image_id in self.by_user[user_id]]
+
+    def cities_of(self, user_id: str, k: int, rng: random.Random) -> List[Tuple[float, float]]:
+        """地図操作シナリオ用: ユーザーの写真がある地点をいくつか返す"""
+        with self._data_lock:
+            points = [
+                (loc["latitude"], loc["longitude"])
+                for _, image_id in self.by_user[user_id]
+                if (loc := self.locations.get(image_id))
+            ]
+        return rng.sample(points, min(k, len(points)))
+
+    # ------------------------------------------------------------------
+    # PostgREST
+    # ------------------------------------------------------------------
+    def _embedded(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        location = self.locations.get(row["id"])
+        return {
+            **row,
+            "locations": [{k: location[k] for k in ("latitude", "longitude", "geoname", "rank")}] if location else [],
+            "image_tags": [{"tags": tag} for tag in self._tags_of(row["id"])],
+        }
+
+    def _detail(self, image_id: int, user_id: str) -> Optional[Dict[str, Any]]:
+        row = self.images.get(image_id)
+        if row is None or row["user_id"] != user_id:
+            return None
+        location = self.locations.get(image_id) or {}
+        return {
+            **row,
+            "latitude": location.get("latitude"),
+            "longitude": location.get("longitude"),
+            "geoname": location.get("geoname"),
+            "tags": self._tags_of(image_id),
+        }
+
+    def _select_images(self, req: StubRequest) -> Tuple[int, object]:
+        params = dict(req.query)
+        user_id = _eq(params["user_id"])
+        embed = "locations(" in params.get("select", "*")
+        limit = int(params.get("limit", 1000))
+        offset = int(params.get("offset", 0))
+
+        if "content_hash" in params:
+            ids = [self.hashes.get((user_id, h)) for h in _in(params["content_hash"])]
+            rows = [self.images[i] for i in ids if i is not None]
+        else:
+            if params.get("order") != "created_at.desc,id.desc":
+                return _bad_request(f"unsupported order: {params.get('order')}")
+            index = self.by_user[user_id]
+            end = len(index)
+            if "or" in params:
+                m = _KEYSET_RE.search(params["or"])
+                if m is None:
+                    return _bad_request(f"unsupported or filter: {params['or']}")
+                end = bisect.bisect_left(index, (m.group(1), int(m.group(2))))
+            picked = index[max(end - offset - limit, 0):max(end - offset, 0)]
+            rows = [self.images[image_id] for _, image_id in reversed(picked)]
+        return postgrest_rows([self._embedded(r) if embed else dict(r) for r in rows], req)
+
+    def _upsert_images(self, req: StubRequest) -> Tuple[int, object]:
+        body = req.json()
+        rows = body if isinstance(body, list) else [body]
+        ignore = "ignore-duplicates" in req.headers.get("prefer", "")
+        created = []
+        for row in rows:
+            key = (row["user_id"], row.get("content_hash"))
+            if row.get("content_hash") and key in self.hashes:
+                if ignore:
+                    continue
+                return 409, {"code": "23505", "message": "duplicate key value violates unique constraint"}
+            created.append(self._add_image(row))
+        return 201, created
+
+    def _insert_locations(self, req: StubRequest) -> Tuple[int, object]:
+        body = req.json()
+        rows = body if isinstance(body, list) else [body]
+        return 201, [self._add_location(row) for row in rows]
+
+    def _insert_jobs(self, req: StubRequest) -> Tuple[int, object]:
+        body = req.json()
+        rows = body if isinstance(body, list) else [body]
+        self.jobs += len(rows)
+        return 201, [{"id": self.jobs, **row} for row in rows]
+
+    def _select_tags(self, req: StubRequest) -> Tuple[int, object]:
+        params = dict(req.query)
+        after = int(params.get("id", "gt.0")[3:])
+        limit = int(params.get("limit", 1000))
+        rows = [{"id": i, "name": n} for i, n in sorted(self.tag_names.items()) if i > after][:limit]
+        return 200, rows
+
+    # --- RPC ---
+    def _rpc_image_detail(self, args: Dict[str, Any]):
+        return self._detail(args["p_image_id"], args["p_user_id"])
+
+    def _rpc_update_image_info(self, args: Dict[str, Any]):
+        row = self.images.get(args["p_image_id"])
+        if row is None or row["user_id"] != args["p_user_id"]:
+            return None
+        for key in ("title", "comment", "is_favorite"):
+            if key in args["p_fields"]:
+                row[key] = args["p_fields"][key]
+        row["updated_at"] = self._now()
+        return self._detail(row["id"], row["user_id"])
+
+    def _rpc_set_image_tags(self, args: Dict[str, Any]):
+        return self._set_tags(args["p_image_id"], args["p_names"])
+
+    def _rpc_user_tag_usage(self, args: Dict[str, Any]):
+        usage = Counter(
+            tag_id
+            for _, image_id in self.by_user[args["p_user_id"]]
+            for tag_id in self.image_tags.get(image_id, ())
+        )
+        return [{"id": t, "name": self.tag_names[t], "count": c} for t, c in usage.most_common()]
+
+    def _pins(self, args: Dict[str, Any]) -> List[Dict[str, Any]]:
+        statuses = set(args["p_statuses"])
+        min_lat, max_lat = args["p_min_lat"], args["p_max_lat"]
+        min_lon, max_lon = args["p_min_lon"], args["p_max_lon"]
+        wraps = min_lon > max_lon  # 180度線をまたぐ範囲
+        pins = []
+        for _, image_id in self.by_user[args["p_user_id"]]:
+            location = self.locations.get(image_id)
+            image = self.images[image_id]
+            if location is None or image["location_status"] not in statuses:
+                continue
+            lat, lon = location["latitude"], location["longitude"]
+            in_lon = (lon >= min_lon or lon <= max_lon) if wraps else (min_lon <= lon <= max_lon)
+            if min_lat <= lat <= max_lat and in_lon:
+                thumbnail = (image.get("derivatives") or {}).get("marker") or image["thumbnail_url"]
+                pins.append({
+                    "id": image_id, "latitude": lat, "longitude": lon,
+                    "thumbnail_url": thumbnail, "title": image["title"], "taken_at": image["taken_at"],
+                })
+        return pins
+
+    def _rpc_pins_in_bbox(self, args: Dict[str, Any]):
+        return [{k: v for k, v in pin.items() if k != "taken_at"} for pin in self._pins(args)]
+
+    def _rpc_pin_clusters(self, args: Dict[str, Any]):
+        cell = args["p_cell_deg"]
+        cells: Dict[Tuple[int, int], List[Dict[str, Any]]] = defaultdict(list)
+        for pin in self._pins(args):
+            cells[(math.floor(pin["longitude"] / cell), math.floor(pin["latitude"] / cell))].append(pin)
+        clusters = []
+        for pins in cells.values():
+            rep = max(pins, key=lambda p: (p["taken_at"] or "", p["id"]))
+            clusters.append({
+                "latitude": sum(p["latitude"] for p in pins) / len(pins),
+                "longitude": sum(p["longitude"] for p in pins) / len(pins),
+                "count": len(pins),
+                "image_id": rep["id"],
+                "thumbnail_url": rep["thumbnail_url"],
+                "title": rep["title"],
+            })
+        return clusters
+
+    def _rpc(self, req: StubRequest) -> Tuple[int, object]:
+        name = req.path.rsplit("/", 1)[-1]
+        handler = getattr(self, f"_rpc_{name}", None)
+        if handler is None:
+            return _bad_request(f"rpc not implemented in fake: {name}")
+        return 200, handler(req.json() or {})
+
+    # ------------------------------------------------------------------
+    # Auth / Storage
+    # ------------------------------------------------------------------
+    def _auth_user(self, req: StubRequest) -> Tuple[int, object]:
+        token = req.headers.get("authorization", "").removeprefix("Bearer ")
+        user_id = self.users.get(token)
+        if user_id is None:
+            return 401, {"code": 401, "msg": "invalid JWT"}
+        return 200, {
+            "id": user_id,
+            "aud": "authenticated",
+            "role": "authenticated",
+            "app_metadata": {},
+            "user_metadata": {},
+            "created_at": "2024-01-01T00:00:00Z",
+        }
+
+    def _store_object(self, req: StubRequest) -> Tuple[int, object]:
+        self.stored_bytes += req.body_size
+        return 200, {"Key": req.path.removeprefix("/storage/v1/object/")}
+
+    def _register_routes(self) -> None:
+        def locked(handler):
+            def run(req: StubRequest):
+                with self._data_lock:
+                    try:
+                        return handler(req)
+                    except (KeyError, ValueError) as e:
+                        return _bad_request(f"unsupported request {req.method} {req.path}: {e!r}")
+            return run
+
+        self.route("GET", "/rest/v1/images", locked(self._select_images))
+        self.route("POST", "/rest/v1/images", locked(self._upsert_images))
+        self.route("POST", "/rest/v1/locations", locked(self._insert_locations))
+        self.route("POST", "/rest/v1/jobs", locked(self._insert_jobs))
+        self.route("GET", "/rest/v1/tags", locked(self._select_tags))
+        self.route("POST", "/rest/v1/rpc/", locked(self._rpc))
+        self.route("GET", "/auth/v1/user", locked(self._auth_user))
+        self.route("POST", "/storage/v1/object/", locked(self._store_object), keep_body=False)
@@ -0,0 +1,319 @@
+"""
+API 全体の負荷試験 (メモリ上の Supabase 代替に対して実行する)。
+
+    python -m benchmarks.loadtest [--scenarios gallery_scroll map_pan ...] [--duration 10]
+        [--concurrency 16] [--latency 0.005] [--users 20] [--images-per-user 2000]
+        [--output results.json] [--compare baseline.json] [--no-read-cache]
+
+FakeSupabase (benchmarks/fake_supabase.py) に合成データを投入し、アプリを httpx.ASGITransport
+経由で同一プロセス内から呼ぶ (lifespan も実行する)。シナリオごとに RPS と
+p50 / p95 / p99 レイテンシ、1リクエストあたりの upstream 呼び出し回数、
+読み取りキャッシュのヒット率・304 の割合を JSON に出力する。
+GET は前回の ETag を If-None-Match で送る (ブラウザと同じ)。キャッシュの効果は
+--no-read-cache で出力した結果と --compare で比較する。
+乱数のシードを固定しているため、同じ引数なら同じリクエスト列になり、コミット間で比較できる。
+
+シナリオ:
+    upload_burst    POST /images (GPS 付き JPEG, 毎回内容が異なる)
+    gallery_scroll  GET /images を next_cursor でたどる (embed=true)
+    map_pan         GET /pin/images (写真のある地点の周辺、ズームはクラスタ/個別の両方)
+    detail_view     GET /images/{id}
+    tag_edit        PUT /images/{id} (タグの付け替え)
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List
+
+from benchmarks.fake_supabase import FakeSupabase
+from benchmarks.stub_supabase import configure_env
+
+JWT_SECRET = "stub-jwt-secret"
+
+
+class Session:
+    """1ワーカー (仮想ユーザー) の状態。シナリオはこれを受け取って1リクエストを送る"""
+
+    def __init__(self, client, fake: FakeSupabase, user_id: str, token: str, rng: random.Random):
+        self.client = client
+        self.fake = fake
+        self.user_id = user_id
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.rng = rng
+        self.image_ids = fake.image_ids(user_id)
+        self.points = fake.cities_of(user_id, 50, rng)
+        self.cursor = None
+        self.counter = 0
+        self.etags: Dict[str, str] = {}
+        self.next_cursors: Dict[Any, Any] = {}  # cursor -> そのページの next_cursor (304 のとき用)
+
+    async def get(self, path: str, params: Dict[str, Any] = None):
+        """条件付き GET (前回の ETag を If-None-Match で送る)"""
+        key = path + "?" + "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        headers = dict(self.headers)
+        if key in self.etags:
+            headers["If-None-Match"] = self.etags[key]
+        res = await self.client.get(path, headers=headers, params=params)
+        if "etag" in res.headers:
+            self.etags[key] = res.headers["etag"]
+        return res
+
+
+Scenario = Callable[[Session], Awaitable[Any]]
+
+
+def _jpeg_template() -> bytes:
+    from benchmarks.bench_batch_upload import make_gps_jpeg
+
+    return make_gps_jpeg(0)
+
+
+_JPEG = None
+
+
+async def upload_burst(s: Session):
+    global _JPEG
+    if _JPEG is None:
+        _JPEG = _jpeg_template()
+    s.counter += 1
+    # EOI 以降のデータはデコーダーに無視されるので、末尾を変えて内容ハッシュだけを毎回変える
+    data = _JPEG + f"{s.user_id}:{s.counter}".encode()
+    return await s.client.post(
+        "/api/v1/images", headers=s.headers, files={"file": (f"IMG_{s.counter:05d}.jpg", data, "image/jpeg")}
+    )
+
+
+async def gallery_scroll(s: Session):
+    params = {"limit": 30, "embed": "true"}
+    if s.cursor:
+        params["cursor"] = s.cursor
+    res = await s.get("/api/v1/images", params)
+    # 20ページ読んだら (または末尾に着いたら) 先頭から読み直す
+    s.counter += 1
+    if s.counter % 20 == 0 or res.status_code >= 400:
+        s.cursor = None
+    elif res.status_code == 200:
+        s.cursor = s.next_cursors[params.get("cursor")] = res.json().get("next_cursor")
+    else:
+        # 304: 前回と同じページなので、前回の next_cursor で続ける
+        s.cursor = s.next_cursors.get(params.get("cursor"))
+    return res
+
+
+async def map_pan(s: Session):
+    lat, lon = s.rng.choice(s.points) if s.points else (35.68, 139.76)
+    zoom = s.rng.choice((4, 8, 11, 14, 16))
+    half = 180.0 / 2 ** zoom * 2  # 画面幅 ~4タイル相当
+    params = {
+        "min_lat": max(lat - half / 2, -90), "max_lat": min(lat + half / 2, 90),
+        "min_lon": lon - half, "max_lon": lon + half, "zoom": zoom,
+    }
+    return await s.get("/api/v1/pin/images", params)
+
+
+async def detail_view(s: Session):
+    return await s.get(f"/api/v1/images/{s.rng.choice(s.image_ids)}")
+
+
+async def tag_edit(s: Session):
+    tags = [f"tag{s.rng.randrange(500):04d}" for _ in range(s.rng.randint(1, 4))]
+    return await s.client.put(
+        f"/api/v1/images/{s.rng.choice(s.image_ids)}", headers=s.headers, json={"tags": tags}
+    )
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "upload_burst": upload_burst,
+    "gallery_scroll": gallery_scroll,
+    "map_pan": map_pan,
+    "detail_view": detail_view,
+    "tag_edit": tag_edit,
+}
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+async def run_scenario(name: str, sessions: List[Session], fake: FakeSupabase, duration: float, warmup: float):
+    scenario = SCENARIOS[name]
+    from app.core.response_cache import CACHE_REQUESTS
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    not_modified = 0
+    measuring = False
+
+    async def worker(session: Session, deadline: float):
+        nonlocal not_modified
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            res = await scenario(session)
+            elapsed = time.perf_counter() - started
+            if not measuring:
+                continue
+            latencies.append(elapsed)
+            if res.status_code == 304:
+                not_modified += 1
+            elif res.status_code >= 400:
+                key = str(res.status_code)
+                errors[key] = errors.get(key, 0) + 1
+
+    if warmup:
+        await asyncio.gather(*(worker(s, time.perf_counter() + warmup) for s in sessions))
+
+    measuring = True
+    upstream_before = fake.request_count
+    hits_before = CACHE_REQUESTS.total(result="hit")
+    misses_before = CACHE_REQUESTS.total(result="miss")
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(s, started + duration) for s in sessions))
+    elapsed = time.perf_counter() - started
+    upstream = fake.request_count - upstream_before
+    hits = CACHE_REQUESTS.total(result="hit") - hits_before
+    lookups = hits + CACHE_REQUESTS.total(result="miss") - misses_before
+
+    ordered = sorted(latencies)
+    n = len(ordered)
+    return {
+        "requests": n,
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "rps": round(n / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        "upstream_calls_per_request": round(upstream / n, 2) if n else 0.0,
+        "cache_hit_ratio": round(hits / lookups, 3) if lookups else None,
+        "not_modified_ratio": round(not_modified / n, 3) if n else 0.0,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _make_token(user_id: str) -> str:
+    import jwt
+
+    claims = {"sub": user_id, "aud": "authenticated", "role": "authenticated", "exp": int(time.time()) + 24 * 3600}
+    return jwt.encode(claims, JWT_SECRET, algorithm="HS256")
+
+
+async def run(args, fake: FakeSupabase, user_ids: List[str]) -> Dict[str, Any]:
+    import httpx
+    from app.main import app
+
+    tokens = {}
+    for user_id in user_ids:
+        token = _make_token(user_id)
+        fake.users[token] = user_id
+        tokens[user_id] = token
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for name in args.scenarios:
+                rng = random.Random(args.seed)
+                sessions = [
+                    Session(client, fake, user_ids[i % len(user_ids)], tokens[user_ids[i % len(user_ids)]],
+                            random.Random(rng.getrandbits(64)))
+                    for i in range(args.concurrency)
+                ]
+                results[name] = await run_scenario(name, sessions, fake, args.duration, args.warmup)
+                r = results[name]
+                print(
+                    f"{name:15s} {r['rps']:9.1f} req/s  p50 {r['p50_ms']:8.2f}ms  p95 {r['p95_ms']:8.2f}ms  "
+                    f"p99 {r['p99_ms']:8.2f}ms  upstream/req {r['upstream_calls_per_request']:5.2f}  "
+                    f"cache hit {r['cache_hit_ratio'] or 0:5.1%}  304 {r['not_modified_ratio']:5.1%}  "
+                    f"errors {sum(r['errors'].values())}"
+                )
+    return results
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    print(f"\ncompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    print(f"{'scenario':15s} {'rps':>16s} {'p95 ms':>18s} {'p99 ms':>18s}")
+    for name, now in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+
+        def delta(key: str) -> str:
+            change = (now[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            return f"{now[key]:8.1f} ({change:+6.1f}%)"
+
+        print(f"{name:15s} {delta('rps'):>16s} {delta('p95_ms'):>18s} {delta('p99_ms'):>18s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="*", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=10.0, help="シナリオごとの計測時間 (秒)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="計測前の慣らし運転 (秒)")
+    parser.add_argument("--concurrency", type=int, default=16, help="同時に動かす仮想ユーザー数")
+    parser.add_argument("--latency", type=float, default=0.005, help="upstream 1往復の遅延 (秒)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--images-per-user", type=int, default=2000)
+    parser.add_argument("--auth", choices=["local", "remote"], default="local", help="AUTH_VERIFY_MODE")
+    parser.add_argument("--no-read-cache", action="store_true", help="読み取りキャッシュを無効にする (効果の比較用)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="loadtest_results.json")
+    parser.add_argument("--compare", help="比較対象の結果 JSON (以前のコミットで出力したもの)")
+    args = parser.parse_args()
+
+    fake = FakeSupabase(latency=args.latency)
+    started = time.perf_counter()
+    user_ids = fake.seed(args.users, args.images_per_user, seed=args.seed)
+    print(f"seeded {len(fake.images)} images / {len(fake.locations)} locations / {len(fake.tags)} tags "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    configure_env(
+        fake.start(),
+        AUTH_VERIFY_MODE=args.auth,
+        STORAGE_BACKEND="supabase",
+        TAG_INDEX_REFRESH_SECONDS="0",
+        METRICS_ENABLED="True",
+        PROFILE_ENABLED="False",
+        READ_CACHE_ENABLED=str(not args.no_read_cache),
+    )
+    try:
+        scenarios = asyncio.run(run(args, fake, user_ids))
+    finally:
+        fake.stop()
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "scenarios": scenarios,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
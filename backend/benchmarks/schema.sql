@@ -0,0 +1,43 @@
+-- ベンチマーク用のローカル Postgres に作る基本スキーマ。
+-- 本番では Supabase 上に作成済みのテーブルで、ここではアプリが参照する列だけを再現する。
+-- この後 migrations/*.sql を番号順に適用する (benchmarks/pg.py)。
+create extension if not exists postgis;
+
+drop table if exists public.jobs, public.image_tags, public.tags, public.locations, public.images cascade;
+
+create table public.images (
+    id              bigserial primary key,
+    user_id         uuid        not null,
+    image_url       text        not null,
+    thumbnail_url   text,
+    title           text,
+    comment         text,
+    is_favorite     boolean     not null default false,
+    location_status text        not null,
+    taken_at        timestamptz,
+    created_at      timestamptz not null default now(),
+    updated_at      timestamptz
+);
+create index on public.images (user_id, created_at desc);
+
+create table public.locations (
+    id          bigserial primary key,
+    image_id    bigint not null references public.images (id) on delete cascade,
+    latitude    double precision not null,
+    longitude   double precision not null,
+    geoname     text,
+    source_type text not null,
+    geom        geometry(Point, 4326)
+);
+create index on public.locations (image_id);
+
+create table public.tags (
+    id   bigserial primary key,
+    name text not null unique
+);
+
+create table public.image_tags (
+    image_id bigint not null references public.images (id) on delete cascade,
+    tag_id   bigint not null references public.tags (id) on delete cascade,
+    primary key (image_id, tag_id)
+);
@@ -0,0 +1,140 @@
+"""
+ベンチマーク用の Supabase スタブサーバー。
+実プロジェクトの代わりに 127.0.0.1 上で起動し、ネットワーク往復のコストを
+LATENCY 秒の待ち時間で再現する。
+"""
+import json
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+
+@dataclass
+class StubRequest:
+    method: str
+    path: str
+    query: List[Tuple[str, str]]
+    headers: Dict[str, str]
+    body: bytes
+    body_size: int = 0
+
+    def json(self) -> Any:
+        return json.loads(self.body) if self.body else None
+
+    @property
+    def wants_object(self) -> bool:
+        # postgrest の single() / maybe_single() は object を要求する
+        return "vnd.pgrst.object" in self.headers.get("accept", "")
+
+
+# handler(request) -> (status, json_body)
+Handler = Callable[[StubRequest], Tuple[int, object]]
+
+
+def postgrest_rows(rows: List[Dict[str, Any]], request: StubRequest) -> Tuple[int, object]:
+    """行リストを PostgREST と同じ形 (配列 or 単一オブジェクト) で返す"""
+    if request.wants_object:
+        if len(rows) != 1:
+            return 406, {
+                "code": "PGRST116",
+                "details": f"The result contains {len(rows)} rows",
+                "hint": None,
+                "message": "JSON object requested, multiple (or no) rows returned",
+            }
+        return 200, rows[0]
+    return 200, rows
+
+
+class StubSupabase:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.request_count = 0
+        self._routes: List[Tuple[str, str, Handler, bool]] = []
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._lock = threading.Lock()
+
+    def route(self, method: str, path_prefix: str, handler: Handler, keep_body: bool = True) -> None:
+        """keep_body=False のルートは本文を読み捨て、サイズ (body_size) だけを渡す"""
+        self._routes.append((method, path_prefix, handler, keep_body))
+
+    def _match(self, method: str, path: str):
+        for m, prefix, handler, keep_body in self._routes:
+            if m == method and path.startswith(prefix):
+                return handler, keep_body
+        return None, True
+
+    def _dispatch(self, request: StubRequest) -> Tuple[int, object]:
+        with self._lock:
+            self.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        handler, _ = self._match(request.method, request.path)
+        if handler is None:
+            return 404, {"message": f"No stub for {request.method} {request.path}"}
+        return handler(request)
+
+    def start(self) -> str:
+        stub = self
+
+        class _RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                path, _, query = self.path.partition("?")
+                _, keep_body = stub._match(self.command, path)
+                if keep_body:
+                    body = self.rfile.read(length) if length else b""
+                else:
+                    body = b""
+                    remaining = length
+                    while remaining > 0:
+                        remaining -= len(self.rfile.read(min(remaining, 64 * 1024)))
+                request = StubRequest(
+                    method=self.command,
+                    path=path,
+                    query=parse_qsl(query, keep_blank_values=True),
+                    headers={k.lower(): v for k, v in self.headers.items()},
+                    body=body,
+                    body_size=length,
+                )
+                status, payload = stub._dispatch(request)
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _RequestHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def configure_env(base_url: str, **overrides: str) -> None:
+    """app をインポートする前に、接続先をスタブに向ける"""
+    import os
+
+    env: Dict[str, str] = {
+        "SUPABASE_URL": base_url,
+        "SUPABASE_KEY": "stub-anon-key",
+        "SECRET_KEY": "stub-jwt-secret",
+        "DEBUG": "False",
+    }
+    env.update(overrides)
+    os.environ.update(env)
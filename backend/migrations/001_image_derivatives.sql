@@ -0,0 +1,9 @@
+-- サイズ別の派生画像 (サムネイル) のURLを保持する
+-- 例: {"marker": "https://.../UUID_marker.webp", "grid": "...", "preview": "..."}
+alter table public.images
+    add column if not exists derivatives jsonb;
+
+-- バックフィル対象 (未生成) を素早く引けるようにする
+create index if not exists images_derivatives_missing_idx
+    on public.images (id)
+    where derivatives is null;
@@ -0,0 +1,13 @@
+-- AI (GeoCLIP) 推定の候補を複数行 (rank 1..k) で保持する
+-- EXIF / 手動入力の位置は rank = 1 の1行のみ
+alter table public.locations
+    add column if not exists rank smallint not null default 1,
+    add column if not exists confidence real;
+
+create index if not exists locations_image_id_rank_idx
+    on public.locations (image_id, rank);
+
+-- 推定待ちの画像をワーカーが素早く取得できるようにする
+create index if not exists images_no_gps_idx
+    on public.images (id)
+    where location_status = 'NO_GPS';
@@ -0,0 +1,80 @@
+-- アップロード後の後続処理 (サムネイル生成など) を行う永続ジョブキュー
+create table if not exists public.jobs (
+    id           bigserial primary key,
+    type         text        not null,
+    payload      jsonb       not null default '{}'::jsonb,
+    status       text        not null default 'queued',  -- queued / running / done / failed
+    attempts     integer     not null default 0,
+    max_attempts integer     not null default 5,
+    run_at       timestamptz not null default now(),     -- この時刻以降に実行可能 (リトライのバックオフ)
+    locked_until timestamptz,                            -- 実行中ジョブの可視性タイムアウト
+    last_error   text,
+    created_at   timestamptz not null default now(),
+    started_at   timestamptz,
+    finished_at  timestamptz
+);
+
+create index if not exists jobs_ready_idx
+    on public.jobs (type, run_at)
+    where status in ('queued', 'running');
+
+-- 実行可能なジョブを最大 p_limit 件取得して running にする。
+-- SKIP LOCKED により複数ワーカーが同時に呼んでも同じジョブは1つのワーカーにしか渡らない。
+-- 可視性タイムアウトを過ぎた running ジョブ (ワーカー停止など) も再取得の対象になる。
+create or replace function public.claim_jobs(
+    p_type text,
+    p_limit integer,
+    p_visibility_timeout_seconds integer
+)
+returns setof public.jobs
+language plpgsql
+as $$
+begin
+    -- 試行回数を使い切ったまま放置されたジョブは failed にする
+    update public.jobs
+       set status = 'failed',
+           finished_at = now(),
+           last_error = coalesce(last_error, 'visibility timeout exceeded')
+     where type = p_type
+       and status = 'running'
+       and locked_until < now()
+       and attempts >= max_attempts;
+
+    return query
+    update public.jobs j
+       set status = 'running',
+           attempts = j.attempts + 1,
+           locked_until = now() + make_interval(secs => p_visibility_timeout_seconds),
+           started_at = coalesce(j.started_at, now())
+     where j.id in (
+            select id
+              from public.jobs
+             where type = p_type
+               and attempts < max_attempts
+               and ((status = 'queued' and run_at <= now())
+                 or (status = 'running' and locked_until < now()))
+             order by run_at
+             limit p_limit
+               for update skip locked
+           )
+    returning j.*;
+end;
+$$;
+
+-- キューの深さとジョブのレイテンシ (直近1時間に完了したジョブ)
+create or replace view public.job_queue_stats as
+select
+    type,
+    count(*) filter (where status = 'queued')  as queued,
+    count(*) filter (where status = 'running') as running,
+    count(*) filter (where status = 'failed')  as failed,
+    extract(epoch from now() - min(run_at) filter (where status = 'queued' and run_at <= now()))
+        as oldest_ready_age_seconds,
+    percentile_cont(0.5) within group (order by extract(epoch from finished_at - created_at))
+        filter (where status = 'done' and finished_at > now() - interval '1 hour')
+        as p50_latency_seconds,
+    percentile_cont(0.95) within group (order by extract(epoch from finished_at - created_at))
+        filter (where status = 'done' and finished_at > now() - interval '1 hour')
+        as p95_latency_seconds
+from public.jobs
+group by type;
@@ -0,0 +1,54 @@
+-- 地図の低ズーム時に、表示範囲内のピンをグリッド (p_cell_deg 度四方) 単位で集約する
+-- 各クラスタは件数・重心・代表画像 (最新の撮影日時) を返す
+create or replace function public.pin_clusters(
+    p_user_id  uuid,
+    p_min_lat  double precision,
+    p_max_lat  double precision,
+    p_min_lon  double precision,
+    p_max_lon  double precision,
+    p_cell_deg double precision,
+    p_statuses text[]
+)
+returns table (
+    latitude      double precision,
+    longitude     double precision,
+    count         bigint,
+    image_id      bigint,
+    thumbnail_url text,
+    title         text
+)
+language sql
+stable
+as $$
+    with pts as (
+        select
+            l.latitude,
+            l.longitude,
+            i.id,
+            coalesce(i.derivatives ->> 'marker', i.thumbnail_url) as thumbnail_url,
+            i.title,
+            i.taken_at,
+            floor(l.longitude / p_cell_deg)::bigint as cx,
+            floor(l.latitude  / p_cell_deg)::bigint as cy
+        from public.locations l
+        join public.images i on i.id = l.image_id
+        where i.user_id = p_user_id
+          and i.location_status = any(p_statuses)
+          and l.rank = 1
+          and l.latitude  between p_min_lat and p_max_lat
+          and l.longitude between p_min_lon and p_max_lon
+    ),
+    agg as (
+        select cx, cy, avg(latitude) as latitude, avg(longitude) as longitude, count(*) as count
+        from pts
+        group by cx, cy
+    ),
+    rep as (
+        select distinct on (cx, cy) cx, cy, id, thumbnail_url, title
+        from pts
+        order by cx, cy, taken_at desc nulls last, id desc
+    )
+    select agg.latitude, agg.longitude, agg.count, rep.id, rep.thumbnail_url, rep.title
+    from agg
+    join rep using (cx, cy);
+$$;
@@ -0,0 +1,90 @@
+-- 地図ピンの範囲検索を geom の GiST インデックスで行う
+-- (緯度・経度の範囲比較4つでは GiST を使えず、180度線をまたぐ表示範囲も扱えないため)
+create index if not exists locations_geom_gist_idx
+    on public.locations using gist (geom);
+
+-- 表示範囲内のピン。p_min_lon > p_max_lon の場合は180度線をまたぐ範囲とみなし、
+-- [p_min_lon, 180] と [-180, p_max_lon] の2つの矩形に分割して検索する。
+create or replace function public.pins_in_bbox(
+    p_user_id  uuid,
+    p_min_lat  double precision,
+    p_max_lat  double precision,
+    p_min_lon  double precision,
+    p_max_lon  double precision,
+    p_statuses text[]
+)
+returns table (
+    id            bigint,
+    latitude      double precision,
+    longitude     double precision,
+    thumbnail_url text,
+    title         text
+)
+language sql
+stable
+as $$
+    select
+        i.id,
+        l.latitude,
+        l.longitude,
+        coalesce(i.derivatives ->> 'marker', i.thumbnail_url),
+        i.title
+    from public.locations l
+    join public.images i on i.id = l.image_id
+    where (
+            l.geom && st_makeenvelope(
+                p_min_lon, p_min_lat,
+                case when p_min_lon > p_max_lon then 180 else p_max_lon end, p_max_lat,
+                4326)
+         or (p_min_lon > p_max_lon
+             and l.geom && st_makeenvelope(-180, p_min_lat, p_max_lon, p_max_lat, 4326))
+          )
+      and l.rank = 1
+      and i.user_id = p_user_id
+      and i.location_status = any(p_statuses);
+$$;
+
+-- クラスタ集約も同じ条件 (geom + 180度線の分割) で範囲を絞る
+create or replace function public.pin_clusters(
+    p_user_id  uuid,
+    p_min_lat  double precision,
+    p_max_lat  double precision,
+    p_min_lon  double precision,
+    p_max_lon  double precision,
+    p_cell_deg double precision,
+    p_statuses text[]
+)
+returns table (
+    latitude      double precision,
+    longitude     double precision,
+    count         bigint,
+    image_id      bigint,
+    thumbnail_url text,
+    title         text
+)
+language sql
+stable
+as $$
+    with pts as (
+        select
+            p.*,
+            floor(p.longitude / p_cell_deg)::bigint as cx,
+            floor(p.latitude  / p_cell_deg)::bigint as cy,
+            i.taken_at
+        from public.pins_in_bbox(p_user_id, p_min_lat, p_max_lat, p_min_lon, p_max_lon, p_statuses) p
+        join public.images i on i.id = p.id
+    ),
+    agg as (
+        select cx, cy, avg(latitude) as latitude, avg(longitude) as longitude, count(*) as count
+        from pts
+        group by cx, cy
+    ),
+    rep as (
+        select distinct on (cx, cy) cx, cy, id, thumbnail_url, title
+        from pts
+        order by cx, cy, taken_at desc nulls last, id desc
+    )
+    select agg.latitude, agg.longitude, agg.count, rep.id, rep.thumbnail_url, rep.title
+    from agg
+    join rep using (cx, cy);
+$$;
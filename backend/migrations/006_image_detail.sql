@@ -0,0 +1,49 @@
+-- 画像詳細 (画像本体 + 代表位置 + タグ) を1回の呼び出しで返す
+-- 該当なし (存在しない / 他ユーザーの画像) の場合は null
+create or replace function public.image_detail(p_image_id bigint, p_user_id uuid)
+returns json
+language sql
+stable
+as $$
+    select to_json(d)
+    from (
+        select
+            i.*,
+            l.latitude,
+            l.longitude,
+            l.geoname,
+            coalesce(
+                (select json_agg(json_build_object('id', t.id, 'name', t.name) order by t.name)
+                   from public.image_tags it
+                   join public.tags t on t.id = it.tag_id
+                  where it.image_id = i.id),
+                '[]'::json
+            ) as tags
+        from public.images i
+        left join public.locations l on l.image_id = i.id and l.rank = 1
+        where i.id = p_image_id
+          and i.user_id = p_user_id
+    ) d;
+$$;
+
+-- 画像のメタ情報を更新し、更新後の詳細を返す (PUT で再取得の往復を省く)
+-- p_fields に含まれるキー (title / comment / is_favorite) のみ更新する
+create or replace function public.update_image_info(p_image_id bigint, p_user_id uuid, p_fields jsonb)
+returns json
+language plpgsql
+as $$
+begin
+    update public.images
+       set title       = case when p_fields ? 'title'       then p_fields ->> 'title'                  else title end,
+           comment     = case when p_fields ? 'comment'     then p_fields ->> 'comment'                else comment end,
+           is_favorite = case when p_fields ? 'is_favorite' then (p_fields ->> 'is_favorite')::boolean else is_favorite end,
+           updated_at  = now()
+     where id = p_image_id
+       and user_id = p_user_id;
+
+    if not found then
+        return null;
+    end if;
+    return public.image_detail(p_image_id, p_user_id);
+end;
+$$;
@@ -0,0 +1,3 @@
+-- ギャラリーのキーセットページネーション (created_at, id の降順) 用
+create index if not exists images_user_created_id_idx
+    on public.images (user_id, created_at desc, id desc);
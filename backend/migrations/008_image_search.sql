@@ -0,0 +1,102 @@
+-- ギャラリーの絞り込み・検索 (撮影日範囲 / タグ / お気に入り / 位置ステータス / キーワード)
+create extension if not exists pg_trgm;
+
+-- 撮影日の範囲指定 ("2024年の写真")
+create index if not exists images_user_taken_at_idx
+    on public.images (user_id, taken_at desc);
+
+-- お気に入りのみの一覧
+create index if not exists images_user_favorite_idx
+    on public.images (user_id, created_at desc, id desc)
+    where is_favorite;
+
+-- タグからの逆引き (主キー (image_id, tag_id) は画像側からしか引けない)
+create index if not exists image_tags_tag_id_idx
+    on public.image_tags (tag_id, image_id);
+
+-- キーワード検索 (部分一致)。日本語も扱えるよう全文検索ではなくトライグラムを使う
+create index if not exists images_text_trgm_idx
+    on public.images using gin ((coalesce(title, '') || ' ' || coalesce(comment, '')) gin_trgm_ops);
+create index if not exists locations_geoname_trgm_idx
+    on public.locations using gin (geoname gin_trgm_ops);
+
+-- 条件に一致する画像を新しい順 (created_at, id の降順) に返す。
+-- 各行は image_detail と同じ形 (代表位置・タグ込み)。null の条件は指定なしとして扱う。
+-- p_tag_mode: 'any' = いずれかのタグを含む / 'all' = すべてのタグを含む
+create or replace function public.search_images(
+    p_user_id          uuid,
+    p_taken_from       timestamptz default null,
+    p_taken_to         timestamptz default null,
+    p_tags             text[]      default null,
+    p_tag_mode         text        default 'any',
+    p_is_favorite      boolean     default null,
+    p_statuses         text[]      default null,
+    p_query            text        default null,
+    p_after_created_at timestamptz default null,
+    p_after_id         bigint      default null,
+    p_limit            integer     default 20,
+    p_offset           integer     default 0
+)
+returns json
+language sql
+stable
+as $$
+    with wanted as (
+        select array_agg(distinct t.id) as tag_ids,
+               count(distinct t.id)     as found,
+               cardinality(array(select distinct unnest(p_tags))) as requested
+          from public.tags t
+         where t.name = any(p_tags)
+    ),
+    pattern as (
+        select '%' || replace(replace(replace(p_query, '\', '\\'), '%', '\%'), '_', '\_') || '%' as value
+    )
+    select coalesce(json_agg(d order by d.created_at desc, d.id desc), '[]'::json)
+    from (
+        select
+            i.*,
+            l.latitude,
+            l.longitude,
+            l.geoname,
+            coalesce(
+                (select json_agg(json_build_object('id', t.id, 'name', t.name) order by t.name)
+                   from public.image_tags it
+                   join public.tags t on t.id = it.tag_id
+                  where it.image_id = i.id),
+                '[]'::json
+            ) as tags
+        from public.images i
+        left join public.locations l on l.image_id = i.id and l.rank = 1
+        cross join wanted w
+        cross join pattern p
+        where i.user_id = p_user_id
+          and (p_taken_from is null or i.taken_at >= p_taken_from)
+          and (p_taken_to   is null or i.taken_at <  p_taken_to)
+          and (p_is_favorite is null or i.is_favorite = p_is_favorite)
+          and (p_statuses    is null or i.location_status = any(p_statuses))
+          and (
+                p_tags is null
+             or (p_tag_mode = 'all'
+                 and w.found = w.requested
+                 and (select count(*) from public.image_tags it
+                       where it.image_id = i.id and it.tag_id = any(w.tag_ids)) = w.found)
+             or (p_tag_mode <> 'all'
+                 and exists (select 1 from public.image_tags it
+                              where it.image_id = i.id and it.tag_id = any(w.tag_ids)))
+              )
+          and (
+                p_query is null
+             or (coalesce(i.title, '') || ' ' || coalesce(i.comment, '')) ilike p.value
+             or i.id in (select lo.image_id from public.locations lo
+                          where lo.rank = 1 and lo.geoname ilike p.value)
+              )
+          and (
+                p_after_created_at is null
+             or i.created_at < p_after_created_at
+             or (i.created_at = p_after_created_at and i.id < p_after_id)
+              )
+        order by i.created_at desc, i.id desc
+        limit p_limit
+        offset p_offset
+    ) d;
+$$;
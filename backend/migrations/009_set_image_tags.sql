@@ -0,0 +1,47 @@
+-- 画像のタグをまとめて更新する (タグの作成・紐付けの追加/削除を1回の呼び出しで行う)
+-- ON CONFLICT で同名タグの同時作成を扱うため name の一意制約が前提
+create unique index if not exists tags_name_key on public.tags (name);
+
+-- p_names のタグを画像に紐付け、それ以外の紐付けを外す。紐付け後のタグ ({"id", "name"} の配列) を返す
+-- 名前は前後の空白を除去し、空文字と重複は無視する
+create or replace function public.set_image_tags(p_image_id bigint, p_names text[])
+returns json
+language plpgsql
+as $$
+declare
+    v_names   text[];
+    v_tag_ids bigint[];
+begin
+    select coalesce(array_agg(distinct n), '{}')
+      into v_names
+      from (select btrim(x) as n from unnest(p_names) x) s
+     where n <> '';
+
+    -- 未登録のタグを作成 (他のリクエストが同時に作成した名前は無視される)
+    insert into public.tags (name)
+    select unnest(v_names)
+    on conflict (name) do nothing;
+
+    -- 別の文で引き直すことで、同時に作成されコミットされたタグも参照できる
+    select coalesce(array_agg(id), '{}')
+      into v_tag_ids
+      from public.tags
+     where name = any(v_names);
+
+    -- 差分のみ反映
+    delete from public.image_tags
+     where image_id = p_image_id
+       and tag_id <> all(v_tag_ids);
+
+    insert into public.image_tags (image_id, tag_id)
+    select p_image_id, unnest(v_tag_ids)
+    on conflict do nothing;
+
+    return coalesce(
+        (select json_agg(json_build_object('id', t.id, 'name', t.name) order by t.name)
+           from public.tags t
+          where t.id = any(v_tag_ids)),
+        '[]'::json
+    );
+end;
+$$;
@@ -0,0 +1,17 @@
+-- ユーザーが自分の画像に付けたタグと使用回数 (タグ入力補完の「自分のタグ」用)
+create or replace function public.user_tag_usage(p_user_id uuid)
+returns table (
+    id    bigint,
+    name  text,
+    count bigint
+)
+language sql
+stable
+as $$
+    select t.id, t.name, count(*)
+    from public.image_tags it
+    join public.images i on i.id = it.image_id
+    join public.tags t on t.id = it.tag_id
+    where i.user_id = p_user_id
+    group by t.id, t.name;
+$$;
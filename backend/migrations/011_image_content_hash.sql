@@ -0,0 +1,47 @@
+-- 同じ画像の再アップロードを検出するための内容ハッシュ (SHA-256, 16進) と知覚ハッシュ (dHash 64bit)
+alter table public.images
+    add column if not exists content_hash text,
+    add column if not exists phash bigint;
+
+-- ユーザー単位で同じ内容の画像は1枚だけ (NULL 同士は重複扱いにならない)
+-- INSERT ... ON CONFLICT (user_id, content_hash) で使うため部分インデックスにはしない
+create unique index if not exists images_user_content_hash_key
+    on public.images (user_id, content_hash);
+
+-- バックフィル対象 (未計算) を素早く引けるようにする
+create index if not exists images_content_hash_missing_idx
+    on public.images (id)
+    where content_hash is null;
+
+-- 見た目が近い画像 (知覚ハッシュのハミング距離が p_max_distance 以下) を近い順に返す
+create or replace function public.similar_images(
+    p_image_id     bigint,
+    p_user_id      uuid,
+    p_max_distance integer default 8,
+    p_limit        integer default 20
+)
+returns table (
+    id            bigint,
+    image_url     text,
+    thumbnail_url text,
+    distance      integer
+)
+language sql
+stable
+as $$
+    select o.id, o.image_url, o.thumbnail_url, d.distance
+    from public.images src
+    join public.images o
+      on o.user_id = src.user_id
+     and o.id <> src.id
+     and o.phash is not null
+    cross join lateral (
+        select length(replace(((o.phash # src.phash)::bit(64))::text, '0', '')) as distance
+    ) d
+    where src.id = p_image_id
+      and src.user_id = p_user_id
+      and src.phash is not null
+      and d.distance <= p_max_distance
+    order by d.distance, o.id
+    limit p_limit;
+$$;
@@ -0,0 +1,3 @@
+-- EXIF の GPSAltitude (メートル, 海面下は負)
+alter table public.locations
+    add column if not exists altitude double precision;
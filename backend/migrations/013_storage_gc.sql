@@ -0,0 +1,36 @@
+-- ストレージの孤立オブジェクト回収 (python -m app.commands.gc_storage) 用
+
+-- image_url の前方一致 (範囲検索) 用
+create index if not exists images_image_url_pattern_idx
+    on public.images (image_url text_pattern_ops);
+
+-- p_keys (バケット内のパスから拡張子を除いたもの。例: USER_ID/UUID) のうち、
+-- image_url が p_url_prefix || key || '.' で始まる画像が存在するものを返す。
+-- 派生画像 (USER_ID/thumbs/UUID_grid.webp) は元画像のキー (USER_ID/UUID) で問い合わせる。
+-- '.' の次の文字は '/' なので [key || '.', key || '/') の範囲検索になり、インデックスを使える。
+create or replace function public.referenced_storage_keys(p_url_prefix text, p_keys text[])
+returns setof text
+language sql
+stable
+as $$
+    select k
+      from unnest(p_keys) as k
+     where exists (
+            select 1
+              from public.images i
+             where i.image_url ~>=~ (p_url_prefix || k || '.')
+               and i.image_url ~<~ (p_url_prefix || k || '/')
+           );
+$$;
+
+-- p_url_prefix で始まらない image_url の件数
+-- (公開URLの形式が変わっている場合、参照中のオブジェクトを孤立と誤判定しないよう GC を中止する)
+create or replace function public.count_foreign_image_urls(p_url_prefix text)
+returns bigint
+language sql
+stable
+as $$
+    select count(*)
+      from public.images
+     where left(image_url, length(p_url_prefix)) <> p_url_prefix;
+$$;
@@ -0,0 +1,21 @@
+-- locations.geoname (撮影地の地名) の一括設定 (python -m app.commands.backfill_geonames) 用
+
+-- 未設定の行を id 順にたどるための部分インデックス
+create index if not exists locations_geoname_missing_idx
+    on public.locations (id)
+    where geoname is null;
+
+-- p_ids[i] の行の geoname を p_geonames[i] にする。更新した行数を返す
+create or replace function public.set_location_geonames(p_ids bigint[], p_geonames text[])
+returns integer
+language sql
+as $$
+    with updated as (
+        update public.locations l
+           set geoname = u.geoname
+          from unnest(p_ids, p_geonames) as u(id, geoname)
+         where l.id = u.id
+        returning 1
+    )
+    select count(*)::integer from updated;
+$$;
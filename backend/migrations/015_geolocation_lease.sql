@@ -0,0 +1,54 @@
+-- AI 位置推定の取得に可視性タイムアウトを設ける (003_jobs.sql の claim_jobs と同じ考え方)
+-- AI_PROCESSING に変えたワーカーが停止すると画像がそのまま残っていたため、
+-- 処理開始から一定時間を過ぎた AI_PROCESSING の画像は再取得の対象にする
+alter table public.images
+    add column if not exists processing_started_at timestamptz,
+    add column if not exists geolocation_attempts integer not null default 0;
+
+-- 適用前から AI_PROCESSING のまま残っている画像は、適用時刻からタイムアウト後に再取得する
+update public.images
+   set processing_started_at = now()
+ where location_status = 'AI_PROCESSING'
+   and processing_started_at is null;
+
+create index if not exists images_ai_processing_idx
+    on public.images (processing_started_at)
+    where location_status = 'AI_PROCESSING';
+
+-- 推定待ちの画像を最大 p_limit 件取得して AI_PROCESSING にする。
+-- SKIP LOCKED により複数ワーカーが同時に呼んでも同じ画像は1つのワーカーにしか渡らない。
+create or replace function public.claim_geolocation(
+    p_limit integer,
+    p_timeout_seconds integer,
+    p_max_attempts integer
+)
+returns setof public.images
+language plpgsql
+as $$
+begin
+    -- 試行回数を使い切ったまま放置された画像は AI_FAILED にする
+    update public.images
+       set location_status = 'AI_FAILED',
+           processing_started_at = null
+     where location_status = 'AI_PROCESSING'
+       and processing_started_at < now() - make_interval(secs => p_timeout_seconds)
+       and geolocation_attempts >= p_max_attempts;
+
+    return query
+    update public.images i
+       set location_status = 'AI_PROCESSING',
+           processing_started_at = now(),
+           geolocation_attempts = i.geolocation_attempts + 1
+     where i.id in (
+            select id
+              from public.images
+             where location_status = 'NO_GPS'
+                or (location_status = 'AI_PROCESSING'
+                    and processing_started_at < now() - make_interval(secs => p_timeout_seconds))
+             order by id
+             limit p_limit
+               for update skip locked
+           )
+    returning i.*;
+end;
+$$;
@@ -0,0 +1,102 @@
+-- search_images のキーワード検索でトライグラム索引 (008_image_search.sql) を使えるようにする。
+-- 008 ではパターンを CTE から結合して参照し、タイトル・コメントの ILIKE と地名のサブクエリを
+-- OR でつないでいたため、どちらの GIN 索引も使われずユーザーの全画像を走査していた。
+-- パターンは変数 (プランナーからは単なるパラメータ) に入れ、一致する画像 id を
+-- 「タイトル・コメント」と「地名」それぞれの索引で求めた UNION で絞り込む。
+-- 引数・返り値は 008 と同じ。
+create or replace function public.search_images(
+    p_user_id          uuid,
+    p_taken_from       timestamptz default null,
+    p_taken_to         timestamptz default null,
+    p_tags             text[]      default null,
+    p_tag_mode         text        default 'any',
+    p_is_favorite      boolean     default null,
+    p_statuses         text[]      default null,
+    p_query            text        default null,
+    p_after_created_at timestamptz default null,
+    p_after_id         bigint      default null,
+    p_limit            integer     default 20,
+    p_offset           integer     default 0
+)
+returns json
+language plpgsql
+stable
+as $$
+declare
+    v_pattern text;
+    v_result  json;
+begin
+    if p_query is not null then
+        v_pattern := '%' || replace(replace(replace(p_query, '\', '\\'), '%', '\%'), '_', '\_') || '%';
+    end if;
+
+    with wanted as (
+        select array_agg(distinct t.id) as tag_ids,
+               count(distinct t.id)     as found,
+               cardinality(array(select distinct unnest(p_tags))) as requested
+          from public.tags t
+         where t.name = any(p_tags)
+    )
+    select coalesce(json_agg(d order by d.created_at desc, d.id desc), '[]'::json)
+      into v_result
+    from (
+        select
+            i.*,
+            l.latitude,
+            l.longitude,
+            l.geoname,
+            coalesce(
+                (select json_agg(json_build_object('id', t.id, 'name', t.name) order by t.name)
+                   from public.image_tags it
+                   join public.tags t on t.id = it.tag_id
+                  where it.image_id = i.id),
+                '[]'::json
+            ) as tags
+        from public.images i
+        left join public.locations l on l.image_id = i.id and l.rank = 1
+        cross join wanted w
+        where i.user_id = p_user_id
+          and (p_taken_from is null or i.taken_at >= p_taken_from)
+          and (p_taken_to   is null or i.taken_at <  p_taken_to)
+          and (p_is_favorite is null or i.is_favorite = p_is_favorite)
+          and (p_statuses    is null or i.location_status = any(p_statuses))
+          and (
+                p_tags is null
+             or (p_tag_mode = 'all'
+                 and w.found = w.requested
+                 and (select count(*) from public.image_tags it
+                       where it.image_id = i.id and it.tag_id = any(w.tag_ids)) = w.found)
+             or (p_tag_mode <> 'all'
+                 and exists (select 1 from public.image_tags it
+                              where it.image_id = i.id and it.tag_id = any(w.tag_ids)))
+              )
+          -- 一致する id の集合は1度だけ求めてハッシュで引く (images_text_trgm_idx / locations_geoname_trgm_idx)
+          and (
+                v_pattern is null
+             or i.id in (
+                    select m.id
+                      from public.images m
+                     where m.user_id = p_user_id
+                       and (coalesce(m.title, '') || ' ' || coalesce(m.comment, '')) ilike v_pattern
+                    union
+                    select lo.image_id
+                      from public.locations lo
+                      join public.images m on m.id = lo.image_id
+                     where m.user_id = p_user_id
+                       and lo.rank = 1
+                       and lo.geoname ilike v_pattern
+                )
+              )
+          and (
+                p_after_created_at is null
+             or i.created_at < p_after_created_at
+             or (i.created_at = p_after_created_at and i.id < p_after_id)
+              )
+        order by i.created_at desc, i.id desc
+        limit p_limit
+        offset p_offset
+    ) d;
+
+    return v_result;
+end;
+$$;
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+# app.core.config の必須設定 (テストは外部サービスに接続しない)
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_KEY", "test-anon-key")
+os.environ.setdefault("SECRET_KEY", "test-jwt-secret-for-local-verification")
+os.environ.setdefault("DEBUG", "False")
+
+# backend/ をインポートパスに入れる (python -m pytest をどこから実行しても app を import できるように)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def pg_dsn():
+    """
+    ローカル Postgres (PostGIS) の接続先。PINALY_TEST_DSN に使い捨てのデータベースを
+    指定した場合だけ実行する (スキーマを作り直すため)。
+    """
+    dsn = os.environ.get("PINALY_TEST_DSN")
+    if not dsn:
+        pytest.skip("PINALY_TEST_DSN is not set")
+    pytest.importorskip("psycopg")
+    return dsn
+
+
+@pytest.fixture
+def pg(pg_dsn):
+    """マイグレーションを適用したデータベースへの接続 (autocommit)"""
+    from benchmarks import pg as bench_pg
+
+    conn = bench_pg.connect(pg_dsn)
+    bench_pg.reset_schema(conn)
+    try:
+        yield conn
+    finally:
+        conn.close()
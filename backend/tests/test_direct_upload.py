@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+
+import pytest
+from postgrest.exceptions import APIError
+
+from app.core.config import settings
+from app.db import storage
+from app.services import content_hash_service, image_service
+from app.worker.jobs import CONTENT_HASH, THUMBNAILS
+
+USER_ID = "user-1"
+PATH = f"{USER_ID}/photo.jpg"
+DATA = b"\xff\xd8\xff\xd9" + bytes(range(256)) * 5000  # DIRECT_UPLOAD_HEAD_BYTES より大きい
+
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "local")
+    monkeypatch.setattr(settings, "STORAGE_LOCAL_ROOT", str(tmp_path))
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_BYTES", 64 * 1024)
+    monkeypatch.setattr(storage, "_backend", None)
+    target = tmp_path / settings.STORAGE_BUCKET / PATH
+    target.parent.mkdir(parents=True)
+    target.write_bytes(DATA)
+    yield target
+    storage._backend = None
+
+
+def test_complete_reads_only_the_head(stored, monkeypatch):
+    ranges, registered, jobs = [], [], []
+    download = storage.download
+
+    async def ranged_download(bucket, path, byte_range=None):
+        ranges.append(byte_range)
+        return await download(bucket, path, byte_range)
+
+    async def full_download(bucket, path):
+        raise AssertionError("finalize must not read the whole object")
+        yield b""  # pragma: no cover
+
+    async def insert_image(row):
+        registered.append(row["content_hash"])
+        return {"id": 1, **row}
+
+    async def enqueue(job_type, payload, max_attempts=None):
+        jobs.append((job_type, payload))
+
+    async def bump(user_id):
+        pass
+
+    monkeypatch.setattr(storage, "download", ranged_download)
+    monkeypatch.setattr(storage, "download_stream", full_download)
+    monkeypatch.setattr(image_service.image_repository, "insert_image", insert_image)
+    monkeypatch.setattr(image_service.task_queue, "enqueue", enqueue)
+    monkeypatch.setattr(image_service.response_cache, "bump", bump)
+
+    asyncio.run(image_service.complete_direct_upload(USER_ID, PATH))
+    assert ranges == [(0, image_service.DIRECT_UPLOAD_HEAD_BYTES)]
+    # 申告値は使わず NULL で登録し、ハッシュはジョブで求める
+    assert registered == [None]
+    payload = {"image_id": 1, "user_id": USER_ID, "bucket": settings.STORAGE_BUCKET, "path": PATH}
+    assert jobs == [(THUMBNAILS, payload), (CONTENT_HASH, payload)]
+
+
+def test_hash_job_stores_content_hash(stored, monkeypatch):
+    updates = []
+
+    async def update_image(image_id, user_id, data):
+        updates.append((image_id, data))
+        return [{"id": image_id}]
+
+    monkeypatch.setattr(content_hash_service.image_repository, "update_image", update_image)
+    digest = asyncio.run(content_hash_service.hash_uploaded_image(1, USER_ID, settings.STORAGE_BUCKET, PATH))
+    assert digest == hashlib.sha256(DATA).hexdigest()
+    assert updates == [(1, {"content_hash": digest})]
+    assert stored.exists()
+
+
+def test_hash_job_removes_duplicate_upload(stored, monkeypatch):
+    deleted = []
+    thumb = stored.parent / "thumbs" / "photo_grid.webp"
+    thumb.parent.mkdir()
+    thumb.write_bytes(b"thumb")
+
+    async def update_image(image_id, user_id, data):
+        raise APIError({"code": "23505", "message": "duplicate key", "details": None, "hint": None})
+
+    async def delete_images(image_ids, user_id):
+        deleted.extend(image_ids)
+        return [{"id": 1, "derivatives": {"grid": storage.get_public_url(settings.STORAGE_BUCKET, f"{USER_ID}/thumbs/photo_grid.webp")}}]
+
+    monkeypatch.setattr(content_hash_service.image_repository, "update_image", update_image)
+    monkeypatch.setattr(content_hash_service.image_repository, "delete_images", delete_images)
+    assert asyncio.run(content_hash_service.hash_uploaded_image(1, USER_ID, settings.STORAGE_BUCKET, PATH)) is None
+    assert deleted == [1]
+    assert not stored.exists()
+    assert not thumb.exists()
@@ -0,0 +1,53 @@
+import uuid
+
+USER_ID = str(uuid.uuid4())
+
+
+def insert_images(pg, statuses):
+    rows = pg.execute(
+        "insert into public.images (user_id, image_url, location_status) "
+        "select %s, 'http://test/' || s, s from unnest(%s::text[]) s returning id",
+        (USER_ID, statuses),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def claim(pg, limit=10, timeout=600, max_attempts=3):
+    rows = pg.execute("select id from public.claim_geolocation(%s, %s, %s)", (limit, timeout, max_attempts))
+    return sorted(row[0] for row in rows.fetchall())
+
+
+def status(pg, image_id):
+    return pg.execute("select location_status from public.images where id = %s", (image_id,)).fetchone()[0]
+
+
+def test_claims_pending_images_once(pg):
+    pending, done = insert_images(pg, ["NO_GPS", "EXIF_PRESENT"])
+    assert claim(pg) == [pending]
+    assert status(pg, pending) == "AI_PROCESSING"
+    assert status(pg, done) == "EXIF_PRESENT"
+    # 処理中の画像はタイムアウトまで再取得されない
+    assert claim(pg) == []
+
+
+def test_reclaims_images_after_timeout(pg):
+    (image_id,) = insert_images(pg, ["NO_GPS"])
+    assert claim(pg) == [image_id]
+    # ワーカーが停止したまま時間が経った
+    pg.execute(
+        "update public.images set processing_started_at = now() - interval '1 hour' where id = %s", (image_id,)
+    )
+    assert claim(pg) == [image_id]
+    attempts = pg.execute("select geolocation_attempts from public.images where id = %s", (image_id,)).fetchone()[0]
+    assert attempts == 2
+
+
+def test_gives_up_after_max_attempts(pg):
+    (image_id,) = insert_images(pg, ["NO_GPS"])
+    for _ in range(2):
+        assert claim(pg, max_attempts=2) == [image_id]
+        pg.execute(
+            "update public.images set processing_started_at = now() - interval '1 hour' where id = %s", (image_id,)
+        )
+    assert claim(pg, max_attempts=2) == []
+    assert status(pg, image_id) == "AI_FAILED"
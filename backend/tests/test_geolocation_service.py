@@ -0,0 +1,97 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from app.core.config import settings
+from app.db import storage
+from app.repositories import image_repository, location_repository
+from app.services import geolocation_service, geoname_service
+from app.services.geolocation_service import STATUS_AI_FAILED, STATUS_AI_PREDICTED, GeolocationWorker
+
+USER_ID = "user-1"
+
+
+def _jpeg() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def update_image(image_id, user_id, data):
+        calls.append(("update_image", image_id, data))
+        return [data]
+
+    async def delete_ai_locations(image_id):
+        calls.append(("delete_ai_locations", image_id))
+
+    async def insert_locations(rows):
+        calls.append(("insert_locations", [row["rank"] for row in rows]))
+        return rows
+
+    async def fill_geonames(rows):
+        pass
+
+    async def bump(user_id):
+        pass
+
+    monkeypatch.setattr(image_repository, "update_image", update_image)
+    monkeypatch.setattr(location_repository, "delete_ai_locations", delete_ai_locations)
+    monkeypatch.setattr(location_repository, "insert_locations", insert_locations)
+    monkeypatch.setattr(geoname_service, "fill_geonames", fill_geonames)
+    monkeypatch.setattr(geolocation_service.response_cache, "bump", bump)
+    monkeypatch.setattr(storage, "path_from_public_url", lambda bucket, url: "user-1/a.jpg")
+    return calls
+
+
+def _process(monkeypatch, download, attempts):
+    async def predict(image):
+        return [(35.0, 139.0, 0.9), (34.0, 135.0, 0.1)]
+
+    monkeypatch.setattr(storage, "download", download)
+    worker = GeolocationWorker(locator=None)
+    worker.batcher.submit = predict
+    row = {"id": 1, "user_id": USER_ID, "image_url": "http://test/a.jpg", "geolocation_attempts": attempts}
+    asyncio.run(worker.process(row))
+
+
+def test_transient_failure_is_left_for_reclaim(monkeypatch, calls):
+    async def download(bucket, path):
+        raise ConnectionError("storage unavailable")
+
+    _process(monkeypatch, download, attempts=1)
+    # AI_PROCESSING のまま残し、タイムアウト後に再取得させる
+    assert calls == []
+
+
+def test_transient_failure_on_last_attempt_marks_failed(monkeypatch, calls):
+    async def download(bucket, path):
+        raise ConnectionError("storage unavailable")
+
+    _process(monkeypatch, download, attempts=settings.GEOCLIP_MAX_ATTEMPTS)
+    assert calls == [("update_image", 1, {"location_status": STATUS_AI_FAILED, "processing_started_at": None})]
+
+
+def test_undecodable_image_marks_failed_immediately(monkeypatch, calls):
+    async def download(bucket, path):
+        return b"not an image"
+
+    _process(monkeypatch, download, attempts=1)
+    assert calls == [("update_image", 1, {"location_status": STATUS_AI_FAILED, "processing_started_at": None})]
+
+
+def test_predictions_replace_rows_from_earlier_attempt(monkeypatch, calls):
+    async def download(bucket, path):
+        return _jpeg()
+
+    _process(monkeypatch, download, attempts=2)
+    assert calls == [
+        ("delete_ai_locations", 1),
+        ("insert_locations", [1, 2]),
+        ("update_image", 1, {"location_status": STATUS_AI_PREDICTED}),
+    ]
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.db import storage
+from app.services import image_service
+from app.services.metadata import PhotoMetadata
+from app.worker.jobs import STORAGE_CLEANUP
+
+USER_ID = "user-1"
+PATH = f"{USER_ID}/photo.jpg"
+
+
+@pytest.fixture
+def stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "local")
+    monkeypatch.setattr(settings, "STORAGE_LOCAL_ROOT", str(tmp_path))
+    monkeypatch.setattr(storage, "_backend", None)
+    target = tmp_path / settings.STORAGE_BUCKET / PATH
+    target.parent.mkdir(parents=True)
+    target.write_bytes(b"\xff\xd8\xff\xd9")
+    yield target
+    storage._backend = None
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    jobs = []
+
+    async def enqueue(job_type, payload, max_attempts=None):
+        jobs.append((job_type, payload))
+
+    async def bump(user_id):
+        pass
+
+    monkeypatch.setattr(image_service.task_queue, "enqueue", enqueue)
+    monkeypatch.setattr(image_service.response_cache, "bump", bump)
+    return jobs
+
+
+def _register():
+    return asyncio.run(image_service._register_image(USER_ID, PATH, "hash", None, PhotoMetadata()))
+
+
+def test_insert_error_removes_stored_original(stored, jobs, monkeypatch):
+    async def insert_image(row):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(image_service.image_repository, "insert_image", insert_image)
+
+    with pytest.raises(RuntimeError):
+        _register()
+    assert not stored.exists()
+    assert jobs == []
+
+
+def test_error_after_insert_rolls_back_row_and_original(stored, monkeypatch):
+    deleted = []
+
+    async def insert_image(row):
+        return {"id": 1, **row}
+
+    async def delete_images(image_ids, user_id):
+        deleted.append(image_ids)
+        return []
+
+    async def enqueue(job_type, payload, max_attempts=None):
+        raise RuntimeError("queue unavailable")
+
+    monkeypatch.setattr(image_service.image_repository, "insert_image", insert_image)
+    monkeypatch.setattr(image_service.image_repository, "delete_images", delete_images)
+    monkeypatch.setattr(image_service.task_queue, "enqueue", enqueue)
+
+    with pytest.raises(RuntimeError):
+        _register()
+    assert deleted == [[1]]
+    assert not stored.exists()
+
+
+def test_failed_removal_is_left_to_cleanup_job(stored, jobs, monkeypatch):
+    async def insert_image(row):
+        raise RuntimeError("insert failed")
+
+    async def remove(bucket, paths):
+        raise ConnectionError("storage unavailable")
+
+    monkeypatch.setattr(image_service.image_repository, "insert_image", insert_image)
+    monkeypatch.setattr(storage, "remove", remove)
+
+    with pytest.raises(RuntimeError):
+        _register()
+    assert jobs == [(STORAGE_CLEANUP, {"bucket": settings.STORAGE_BUCKET, "paths": [PATH]})]
+
+
+def test_batch_insert_error_removes_uploaded_originals(stored, jobs, monkeypatch):
+    async def insert_images(rows):
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(image_service.image_repository, "insert_images", insert_images)
+
+    results = [{"filename": "photo.jpg", "status": "failed"}]
+    uploaded = [(0, PATH, "http://test/photo.jpg", "hash", None, PhotoMetadata())]
+    asyncio.run(image_service._register_batch(uploaded, USER_ID, results))
+
+    assert results[0]["error"].startswith("Database insert failed")
+    assert not stored.exists()
@@ -0,0 +1,75 @@
+import uuid
+
+import pytest
+
+USER_ID = str(uuid.uuid4())
+OTHER_USER_ID = str(uuid.uuid4())
+
+
+@pytest.fixture
+def seeded(pg):
+    """1ユーザーに写真 2000 枚。キーワードに一致するのは一部だけ (索引が有利になる件数)"""
+    pg.execute(
+        """
+        insert into public.images (user_id, image_url, location_status, title, comment)
+        select %s, 'http://test/' || g, 'EXIF_PRESENT', 'photo ' || g,
+               case when g %% 500 = 0 then 'mountain hike' when g = 7 then '100%% sunny_day' end
+          from generate_series(1, 2000) g
+        """,
+        (USER_ID,),
+    )
+    pg.execute(
+        "insert into public.images (user_id, image_url, location_status, comment) "
+        "values (%s, 'http://test/other', 'EXIF_PRESENT', 'mountain hike')",
+        (OTHER_USER_ID,),
+    )
+    pg.execute(
+        """
+        insert into public.locations (image_id, latitude, longitude, source_type, geoname)
+        select id, 35.66, 139.70, 'EXIF',
+               case when id %% 400 = 1 then 'Shibuya, Tokyo, JP' else 'Place ' || id end
+          from public.images
+        """
+    )
+    pg.execute("analyze public.images; analyze public.locations;")
+    return pg
+
+
+def search(pg, query):
+    (rows,) = pg.execute(
+        "select public.search_images(p_user_id => %s, p_query => %s, p_limit => 100)", (USER_ID, query)
+    ).fetchone()
+    return rows
+
+
+def test_matches_title_comment_and_geoname(seeded):
+    assert {row["comment"] for row in search(seeded, "mountain")} == {"mountain hike"}
+    assert len(search(seeded, "mountain")) == 4  # 他のユーザーの画像は含まない
+    assert {row["geoname"] for row in search(seeded, "shibuya")} == {"Shibuya, Tokyo, JP"}
+    assert len(search(seeded, "photo 1999")) == 1
+
+
+def test_escapes_like_wildcards(seeded):
+    assert [row["comment"] for row in search(seeded, "100%")] == ["100% sunny_day"]
+    assert [row["comment"] for row in search(seeded, "y_d")] == ["100% sunny_day"]
+    assert search(seeded, "_%") == []
+
+
+def test_keyword_search_uses_trigram_indexes(seeded):
+    """関数内のクエリの実行計画 (auto_explain) にトライグラム索引が現れること"""
+    try:
+        seeded.execute("load 'auto_explain'")
+    except Exception as e:
+        pytest.skip(f"auto_explain is not available: {e}")
+    notices = []
+    seeded.add_notice_handler(lambda diag: notices.append(diag.message_primary or ""))
+    seeded.execute("set auto_explain.log_min_duration = 0")
+    seeded.execute("set auto_explain.log_nested_statements = on")
+    seeded.execute("set client_min_messages = log")
+    try:
+        search(seeded, "mountain")
+    finally:
+        seeded.execute("reset client_min_messages")
+    plan = "\n".join(notices)
+    assert "images_text_trgm_idx" in plan
+    assert "locations_geoname_trgm_idx" in plan
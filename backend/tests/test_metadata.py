@@ -0,0 +1,244 @@
+"""
+app.services.metadata.read_metadata のテスト。
+
+- 型・長さが仕様外のタグを持つ EXIF (手で組み立てた TIFF) でも例外にせず、読めない項目は空にする
+- Pillow で書き出した JPEG / PNG / HEIC のコーパス (緯度0・海面下・タイムゾーン付き・EXIFなし など)
+"""
+import io
+import struct
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services import metadata
+from app.services.metadata import PhotoMetadata, read_metadata
+
+JST = timezone(timedelta(hours=9))
+
+ASCII, BYTE, SHORT, LONG, RATIONAL, UNDEFINED, SRATIONAL, IFD = 2, 1, 3, 4, 5, 7, 10, 13
+_FORMATS = {BYTE: "B", ASCII: "s", SHORT: "H", LONG: "L", RATIONAL: "LL", UNDEFINED: "s", SRATIONAL: "ll", IFD: "L"}
+
+
+def entry(tag, type_, values):
+    """(tag, type, count, 値のバイト列) を作る。values は ASCII/UNDEFINED なら bytes、それ以外は数値のリスト"""
+    if type_ in (ASCII, UNDEFINED):
+        return tag, type_, len(values), values
+    flat = [v for value in values for v in (value if isinstance(value, tuple) else (value,))]
+    return tag, type_, len(values), struct.pack("<" + _FORMATS[type_] * len(values), *flat)
+
+
+def build_tiff(ifd0, gps=None, exif=None, gps_type=LONG):
+    """リトルエンディアンの TIFF を組み立てる (IFD0 -> GPS IFD -> Exif IFD -> 値の領域の順に並べる)"""
+    ifds = [list(ifd0)]
+    if gps is not None:
+        ifds.append(list(gps))
+    if exif is not None:
+        ifds.append(list(exif))
+    sizes = [2 + 12 * (len(entries) + (1 if i == 0 else 0) * ((gps is not None) + (exif is not None))) + 4
+             for i, entries in enumerate(ifds)]
+    offsets = [8]
+    for size in sizes[:-1]:
+        offsets.append(offsets[-1] + size)
+    pointers = []
+    if gps is not None:
+        pointers.append(entry(metadata.TAG_GPS_IFD, gps_type, [offsets[1]]))
+    if exif is not None:
+        pointers.append(entry(metadata.TAG_EXIF_IFD, LONG, [offsets[-1]]))
+    ifds[0] = ifds[0] + pointers
+
+    data_offset = offsets[-1] + sizes[-1]
+    out, data = bytearray(b"II*\x00" + struct.pack("<L", 8)), bytearray()
+    for entries in ifds:
+        out += struct.pack("<H", len(entries))
+        for tag, type_, count, raw in sorted(entries):
+            if len(raw) <= 4:
+                value = raw.ljust(4, b"\x00")
+            else:
+                value = struct.pack("<L", data_offset + len(data))
+                data += raw + b"\x00" * (len(raw) % 2)
+            out += struct.pack("<HHL", tag, type_, count) + value
+        out += b"\x00\x00\x00\x00"
+    return bytes(out + data)
+
+
+def jpeg_with_tiff(tiff: bytes) -> io.BytesIO:
+    app1 = b"Exif\x00\x00" + tiff
+    return io.BytesIO(b"\xff\xd8" + b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + b"\xff\xd9")
+
+
+def gps_entries(lat=(35, 1), lat_type=RATIONAL, alt=None, alt_type=RATIONAL, ref=b"N\x00"):
+    entries = [
+        entry(metadata.GPS_LATITUDE_REF, ASCII, ref),
+        entry(metadata.GPS_LATITUDE, lat_type, [lat, (0, 1), (0, 1)] if lat_type in (RATIONAL, SRATIONAL) else [lat, 0, 0]),
+        entry(metadata.GPS_LONGITUDE_REF, ASCII, b"E\x00"),
+        entry(metadata.GPS_LONGITUDE, RATIONAL, [(139, 1), (30, 1), (0, 1)]),
+    ]
+    if alt is not None:
+        entries.append(entry(metadata.GPS_ALTITUDE, alt_type, [alt]))
+    return entries
+
+
+def test_rational_gps():
+    got = read_metadata(jpeg_with_tiff(build_tiff([], gps=gps_entries(alt=(40, 1)))))
+    assert got.latitude == 35.0 and got.longitude == 139.5 and got.altitude == 40.0
+
+
+@pytest.mark.parametrize("lat_type", [LONG, SHORT])
+def test_gps_latitude_stored_as_integer(lat_type):
+    got = read_metadata(jpeg_with_tiff(build_tiff([], gps=gps_entries(lat=35, lat_type=lat_type))))
+    assert got.latitude == 35.0 and got.longitude == 139.5
+
+
+@pytest.mark.parametrize("alt_type", [LONG, SHORT])
+def test_gps_altitude_stored_as_integer(alt_type):
+    got = read_metadata(jpeg_with_tiff(build_tiff([], gps=gps_entries(alt=120, alt_type=alt_type))))
+    assert got.altitude == 120.0 and got.has_gps
+
+
+def test_gps_latitude_stored_as_ascii():
+    gps = gps_entries()
+    gps[1] = entry(metadata.GPS_LATITUDE, ASCII, b"35/1,0/1,0/1\x00")
+    assert read_metadata(jpeg_with_tiff(build_tiff([], gps=gps))) == PhotoMetadata()
+
+
+def test_gps_ref_stored_as_undefined():
+    got = read_metadata(jpeg_with_tiff(build_tiff([], gps=gps_entries(ref=b"S\x00"))))
+    assert got.latitude == -35.0
+
+
+def test_gps_pointer_with_ifd_type():
+    got = read_metadata(jpeg_with_tiff(build_tiff([], gps=gps_entries(), gps_type=IFD)))
+    assert got.has_gps
+
+
+def test_gps_pointer_stored_as_ascii():
+    tiff = build_tiff([entry(metadata.TAG_GPS_IFD, ASCII, b"abc\x00")])
+    assert read_metadata(jpeg_with_tiff(tiff)) == PhotoMetadata()
+
+
+def test_datetime_stored_as_undefined():
+    exif = [
+        entry(metadata.TAG_DATETIME_ORIGINAL, UNDEFINED, b"2024:05:01 10:20:30\x00"),
+        entry(metadata.TAG_OFFSET_TIME_ORIGINAL, UNDEFINED, b"+09:00\x00"),
+    ]
+    got = read_metadata(jpeg_with_tiff(build_tiff([], exif=exif)))
+    assert got.taken_at == datetime(2024, 5, 1, 10, 20, 30, tzinfo=JST)
+
+
+def test_datetime_stored_as_number():
+    exif = [entry(metadata.TAG_DATETIME_ORIGINAL, LONG, [20240501])]
+    assert read_metadata(jpeg_with_tiff(build_tiff([], exif=exif))).taken_at is None
+
+
+def test_datetime_digitized_is_used_without_original():
+    exif = [
+        entry(metadata.TAG_DATETIME_DIGITIZED, ASCII, b"2024:05:01 10:20:30\x00"),
+        entry(metadata.TAG_OFFSET_TIME_DIGITIZED, ASCII, b"+09:00\x00"),
+    ]
+    got = read_metadata(jpeg_with_tiff(build_tiff([], exif=exif)))
+    assert got.taken_at == datetime(2024, 5, 1, 10, 20, 30, tzinfo=JST)
+
+
+def test_ifd0_datetime_is_not_taken_at():
+    # IFD0 の DateTime (0x0132) はファイルの更新日時
+    tiff = build_tiff([entry(0x0132, ASCII, b"2024:05:01 10:20:30\x00")])
+    assert read_metadata(jpeg_with_tiff(tiff)).taken_at is None
+
+
+def test_out_of_range_time_offset_keeps_local_time():
+    exif = [
+        entry(metadata.TAG_DATETIME_ORIGINAL, ASCII, b"2024:05:01 10:20:30\x00"),
+        entry(metadata.TAG_OFFSET_TIME_ORIGINAL, ASCII, b"+99:00\x00"),
+    ]
+    got = read_metadata(jpeg_with_tiff(build_tiff([], gps=gps_entries(), exif=exif)))
+    assert got.taken_at == datetime(2024, 5, 1, 10, 20, 30) and got.has_gps
+
+
+@pytest.mark.parametrize("data", [
+    b"\xff\xd8\xff\xe1\x00\x08Exif\x00\x00",            # APP1 の途中で終わる
+    b"\xff\xd8\xff\xe1\x00\x10Exif\x00\x00XX*\x00\x08\x00\x00\x00",  # TIFF のバイト順が不正
+    b"\x00\x00\x00\x18ftypheic\x00\x00\x00\x00heicmif1"
+    b"\x00\x00\x00\x1cmeta\x00\x00\x00\x00\x00\x00\x00\x10iloc\x03\x00\x00\x00",  # iloc の version / サイズが不正
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\x04eXIfMM\x00",    # eXIf が短すぎる
+])
+def test_truncated_or_corrupt_containers(data):
+    f = io.BytesIO(data)
+    assert read_metadata(f) == PhotoMetadata()
+    assert f.tell() == 0
+
+
+def test_unsupported_field_size_is_value_error():
+    with pytest.raises(ValueError):
+        metadata._read_uint(b"\x00" * 8, 0, 3)
+
+
+# --- Pillow で書き出したファイルのコーパス ---
+
+def _dms(value):
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round((value - degrees - minutes / 60) * 3600, 4)
+    return (float(degrees), float(minutes), seconds)
+
+
+def make_exif(Image, lat=None, lon=None, alt=None, taken=None, offset=None):
+    exif = Image.Exif()
+    exif_ifd = {}
+    if taken:
+        exif_ifd[0x9003] = taken
+    if offset:
+        exif_ifd[0x9011] = offset
+    if exif_ifd:
+        exif[0x8769] = exif_ifd
+    if lat is not None:
+        gps = {
+            1: "N" if lat >= 0 else "S", 2: _dms(abs(lat)),
+            3: "E" if lon >= 0 else "W", 4: _dms(abs(lon)),
+        }
+        if alt is not None:
+            gps[5] = b"\x01" if alt < 0 else b"\x00"
+            gps[6] = abs(alt)
+        exif[0x8825] = gps
+    return exif
+
+
+CORPUS = [
+    ("jpeg tokyo +09:00", "JPEG", dict(lat=35.6812, lon=139.7671, alt=40.0, taken="2024:05:01 10:20:30", offset="+09:00"),
+     PhotoMetadata(35.6812, 139.7671, 40.0, datetime(2024, 5, 1, 10, 20, 30, tzinfo=JST))),
+    ("jpeg equator (lat 0)", "JPEG", dict(lat=0.0, lon=-78.4678, taken="2023:01:02 03:04:05"),
+     PhotoMetadata(0.0, -78.4678, None, datetime(2023, 1, 2, 3, 4, 5))),
+    ("jpeg greenwich (lon 0)", "JPEG", dict(lat=51.4779, lon=0.0),
+     PhotoMetadata(51.4779, 0.0, None, None)),
+    ("jpeg dead sea (alt < 0)", "JPEG", dict(lat=31.5, lon=35.5, alt=-430.0),
+     PhotoMetadata(31.5, 35.5, -430.0, None)),
+    ("jpeg blank datetime", "JPEG", dict(taken="0000:00:00 00:00:00"), PhotoMetadata()),
+    ("jpeg no exif", "JPEG", None, PhotoMetadata()),
+    ("png sydney", "PNG", dict(lat=-33.8568, lon=151.2153, taken="2022:12:31 23:59:59", offset="+11:00"),
+     PhotoMetadata(-33.8568, 151.2153, None, datetime(2022, 12, 31, 23, 59, 59, tzinfo=timezone(timedelta(hours=11))))),
+    ("heic new york -05:00", "HEIF", dict(lat=40.7484, lon=-73.9857, taken="2021:07:04 21:00:00", offset="-05:00"),
+     PhotoMetadata(40.7484, -73.9857, None, datetime(2021, 7, 4, 21, 0, 0, tzinfo=timezone(timedelta(hours=-5))))),
+]
+
+
+def _close(a, b):
+    return (a is None and b is None) or (a is not None and b is not None and abs(a - b) < 1e-4)
+
+
+@pytest.mark.parametrize("name, fmt, params, expected", CORPUS, ids=[case[0] for case in CORPUS])
+def test_corpus(name, fmt, params, expected):
+    Image = pytest.importorskip("PIL.Image")
+    if fmt == "HEIF":
+        pillow_heif = pytest.importorskip("pillow_heif")
+        pillow_heif.register_heif_opener()
+    buf = io.BytesIO()
+    try:
+        options = {"exif": make_exif(Image, **params)} if params else {}
+        Image.new("RGB", (64, 48), (40, 90, 160)).save(buf, format=fmt, **options)
+    except (KeyError, OSError) as e:
+        pytest.skip(f"{fmt} の書き込みに未対応: {e}")
+
+    got = read_metadata(io.BytesIO(buf.getvalue()))
+    assert _close(got.latitude, expected.latitude)
+    assert _close(got.longitude, expected.longitude)
+    assert _close(got.altitude, expected.altitude)
+    assert got.taken_at == expected.taken_at
@@ -0,0 +1,27 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api import deps
+from app.core.config import settings
+
+
+def test_metrics_are_disabled_by_default():
+    assert type(settings).model_fields["METRICS_ENABLED"].default is False
+
+
+def test_token_is_not_required_when_unset(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+    deps.verify_metrics_token(None)
+
+
+@pytest.mark.parametrize("authorization", [None, "", "Bearer wrong", "secret", "Bearer ｓｅｃｒｅｔ"])
+def test_wrong_token_is_rejected(monkeypatch, authorization):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "secret")
+    with pytest.raises(HTTPException) as e:
+        deps.verify_metrics_token(authorization)
+    assert e.value.status_code == 401
+
+
+def test_matching_token_is_accepted(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "secret")
+    deps.verify_metrics_token("Bearer secret")
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from app.core.middleware import BodySizeLimitMiddleware
+
+
+async def echo_app(scope, receive, send):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": body})
+
+
+def call(content_length, body=b"", max_bytes=10):
+    middleware = BodySizeLimitMiddleware(echo_app, max_bytes=max_bytes)
+    headers = [] if content_length is None else [(b"content-length", content_length)]
+    scope = {"type": "http", "path": "/upload", "headers": headers}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"]
+
+
+@pytest.mark.parametrize("value", [b"abc", b"", b"-1", b"10, 10", b"1e3", b" 5"])
+def test_invalid_content_length_is_bad_request(value):
+    assert call(value) == 400
+
+
+def test_content_length_over_limit_is_rejected():
+    assert call(b"11") == 413
+
+
+def test_body_within_limit_passes():
+    assert call(b"5", b"hello") == 200
+    assert call(None, b"hello") == 200
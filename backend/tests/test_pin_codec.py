@@ -0,0 +1,40 @@
+import json
+
+from app.services import pin_codec
+
+URL = "https://example.supabase.co/storage/v1/object/public/images/user-1/thumbs/"
+
+
+def pin(image_id, title):
+    return {
+        "id": image_id,
+        "latitude": 35.681236,
+        "longitude": 139.767125,
+        "thumbnail_url": f"{URL}{image_id}_marker.webp",
+        "title": title,
+    }
+
+
+def test_binary_round_trip():
+    pins = [pin(3, "東京駅"), pin(1, None), pin(2, "")]
+    decoded = pin_codec.decode_binary(pin_codec.encode_binary(pins))
+    assert [(p["id"], p["title"], p["thumbnail_url"]) for p in decoded] == [
+        (1, None, f"{URL}1_marker.webp"),
+        (2, "", f"{URL}2_marker.webp"),
+        (3, "東京駅", f"{URL}3_marker.webp"),
+    ]
+    assert decoded[0]["latitude"] == 35.681236
+
+
+def test_long_title_is_truncated_on_a_character_boundary():
+    # 3バイトの文字を u16 の上限をまたぐ長さで並べる (バイト数で切ると文字の途中になる)
+    title = "あ" * 30000
+    [decoded] = pin_codec.decode_binary(pin_codec.encode_binary([pin(1, title)]))
+    assert title.startswith(decoded["title"])
+    assert len(decoded["title"].encode()) == (0xFFFF - 1) // 3 * 3
+
+
+def test_columnar_keeps_titles():
+    body = json.loads(pin_codec.encode_columnar([pin(1, "東京駅"), pin(2, None)]))
+    assert body["title"] == ["東京駅", None]
+    assert body["thumbnail_prefixes"] == [URL]
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from app.core import response_cache
+from app.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def reset_backend(monkeypatch):
+    monkeypatch.setattr(response_cache, "_backend", None)
+    yield
+    response_cache._backend = None
+
+
+@pytest.mark.parametrize("enabled, redis_url, expected", [
+    (None, "", False),
+    (None, "redis://localhost:6379/0", True),
+    (True, "", True),
+    (False, "redis://localhost:6379/0", False),
+])
+def test_enabled_defaults_to_redis_only(monkeypatch, enabled, redis_url, expected):
+    monkeypatch.setattr(settings, "READ_CACHE_ENABLED", enabled)
+    monkeypatch.setattr(settings, "READ_CACHE_REDIS_URL", redis_url)
+    assert response_cache.enabled() is expected
+
+
+def test_loader_runs_every_time_when_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "READ_CACHE_ENABLED", None)
+    monkeypatch.setattr(settings, "READ_CACHE_REDIS_URL", "")
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return {"items": []}
+
+    async def scenario():
+        for _ in range(2):
+            await response_cache.get_or_load("images", "user-1", {}, loader)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_local_generations_are_bounded():
+    backend = response_cache.LocalBackend(maxsize=3, ttl=60)
+
+    async def scenario():
+        await backend.bump("user-0")
+        stale = await backend.generation("user-0")
+        await backend.set(f"images:user-0:{stale}:x", ("etag", "old"))
+        for i in range(1, 5):
+            await backend.bump(f"user-{i}")
+        assert len(backend._generations) <= 3
+        # 捨てた後の世代番号で古いエントリが見えないこと
+        fresh = await backend.generation("user-0")
+        assert fresh != stale
+        assert await backend.get(f"images:user-0:{fresh}:x") is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,135 @@
+import asyncio
+import hashlib
+import io
+
+import httpx
+import pytest
+from PIL import Image
+
+from app.api import deps
+from app.core.config import settings
+from app.core.security import AuthUser
+from app.db import storage
+from app.main import app
+from app.services import image_service
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+
+def make_jpeg(padding: int) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), (10, 120, 200)).save(buf, format="JPEG")
+    # 末尾のパディングは JPEG としては無視される
+    return buf.getvalue() + bytes(range(256)) * (padding // 256)
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """ストレージはローカルディレクトリ、DB はリポジトリ関数を差し替えて記録する"""
+    monkeypatch.setattr(settings, "STORAGE_BACKEND", "local")
+    monkeypatch.setattr(settings, "STORAGE_LOCAL_ROOT", str(tmp_path / "storage"))
+    monkeypatch.setattr(settings, "UPLOAD_SESSION_DIR", str(tmp_path / "sessions"))
+    monkeypatch.setattr(storage, "_backend", None)
+    inserted, jobs = [], []
+
+    async def find_by_content_hashes(user_id, hashes):
+        return []
+
+    async def insert_image(row):
+        inserted.append(row)
+        return {**row, "id": len(inserted), "created_at": "2024-01-01T00:00:00+00:00"}
+
+    async def enqueue(job_type, payload, max_attempts=None):
+        jobs.append(job_type)
+
+    monkeypatch.setattr(image_service.image_repository, "find_by_content_hashes", find_by_content_hashes)
+    monkeypatch.setattr(image_service.image_repository, "insert_image", insert_image)
+    monkeypatch.setattr(image_service.task_queue, "enqueue", enqueue)
+    app.dependency_overrides[deps.get_current_user] = lambda: AuthUser(id=USER_ID)
+    yield tmp_path, inserted, jobs
+    app.dependency_overrides.pop(deps.get_current_user, None)
+    storage._backend = None
+
+
+def run(scenario):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test/api/v1") as client:
+            return await scenario(client)
+
+    return asyncio.run(main())
+
+
+def test_resumable_upload_end_to_end(env):
+    tmp_path, inserted, jobs = env
+    data = make_jpeg(300_000)
+    chunk_size = 64 * 1024
+
+    async def scenario(client):
+        res = await client.post("/uploads", json={"filename": "large.jpg", "size": len(data)})
+        assert res.status_code == 201, res.text
+        upload_id = res.json()["id"]
+        assert res.headers["Upload-Offset"] == "0"
+
+        # 揃う前の complete と、オフセットのずれた PUT は 409
+        assert (await client.post(f"/uploads/{upload_id}/complete")).status_code == 409
+        res = await client.put(f"/uploads/{upload_id}", content=b"x", headers={"Upload-Offset": "1"})
+        assert res.status_code == 409
+
+        offset, interrupted = 0, False
+        while offset < len(data):
+            chunk = data[offset:offset + chunk_size]
+            if not interrupted and offset > 0:
+                # 回線断: チャンクの途中までしか届かない
+                chunk, interrupted = chunk[:1000], True
+            res = await client.put(f"/uploads/{upload_id}", content=chunk, headers={"Upload-Offset": str(offset)})
+            assert res.status_code == 200, res.text
+            # 再開時と同じく、サーバーの受信済みサイズから続ける
+            head = await client.head(f"/uploads/{upload_id}")
+            offset = int(head.headers["Upload-Offset"])
+
+        res = await client.post(f"/uploads/{upload_id}/complete")
+        assert res.status_code == 201, res.text
+        assert (await client.head(f"/uploads/{upload_id}")).status_code == 404
+        return res.json()
+
+    image = run(scenario)
+    assert image["id"] == 1
+    assert inserted[0]["content_hash"] == hashlib.sha256(data).hexdigest()
+    assert jobs == ["thumbnails"]
+    [stored] = (tmp_path / "storage" / settings.STORAGE_BUCKET / USER_ID).iterdir()
+    assert stored.read_bytes() == data
+    assert not list((tmp_path / "sessions").iterdir())
+
+
+def test_chunk_beyond_declared_size_is_rejected(env):
+    async def scenario(client):
+        res = await client.post("/uploads", json={"filename": "a.jpg", "size": 10})
+        upload_id = res.json()["id"]
+        res = await client.put(f"/uploads/{upload_id}", content=b"x" * 11, headers={"Upload-Offset": "0"})
+        return res.status_code
+
+    assert run(scenario) == 413
+
+
+def test_abort_removes_session(env):
+    tmp_path, _, _ = env
+
+    async def scenario(client):
+        res = await client.post("/uploads", json={"filename": "a.jpg", "size": 10})
+        upload_id = res.json()["id"]
+        assert (await client.delete(f"/uploads/{upload_id}")).status_code == 204
+        return (await client.get(f"/uploads/{upload_id}")).status_code
+
+    assert run(scenario) == 404
+    assert not list((tmp_path / "sessions").iterdir())
+
+
+def test_other_users_upload_is_not_found(env):
+    async def scenario(client):
+        res = await client.post("/uploads", json={"filename": "a.jpg", "size": 10})
+        upload_id = res.json()["id"]
+        app.dependency_overrides[deps.get_current_user] = lambda: AuthUser(id="someone-else")
+        return (await client.get(f"/uploads/{upload_id}")).status_code
+
+    assert run(scenario) == 404
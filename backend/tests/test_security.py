@@ -0,0 +1,63 @@
+import time
+from types import SimpleNamespace
+
+import jwt
+import pytest
+
+from app.core import security
+from app.core.config import settings
+
+
+def _token(**claims) -> str:
+    claims = {"sub": "user-1", "aud": "authenticated", "exp": int(time.time()) + 3600, **claims}
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+@pytest.fixture
+def remote_calls(monkeypatch):
+    calls = []
+
+    def get_user(token):
+        calls.append(token)
+        return SimpleNamespace(user=SimpleNamespace(id="user-1"))
+
+    monkeypatch.setattr(security.supabase.auth, "get_user", get_user)
+    security.token_cache.clear()
+    yield calls
+    security.token_cache.clear()
+
+
+def test_remote_mode_does_not_cache(monkeypatch, remote_calls):
+    # ログアウト・失効したセッションを次のリクエストで拒否できるよう、毎回問い合わせる
+    monkeypatch.setattr(settings, "AUTH_VERIFY_MODE", "remote")
+    token = _token()
+
+    security.authenticate(token)
+    security.authenticate(token)
+
+    assert len(remote_calls) == 2
+    assert len(security.token_cache) == 0
+
+
+def test_local_mode_caches_locally_verified_tokens(monkeypatch, remote_calls):
+    monkeypatch.setattr(settings, "AUTH_VERIFY_MODE", "local")
+    token = _token()
+
+    first = security.authenticate(token)
+    second = security.authenticate(token)
+
+    assert first.id == "user-1"
+    assert second is first
+    assert remote_calls == []
+
+
+def test_local_mode_does_not_cache_remote_fallback(monkeypatch, remote_calls):
+    monkeypatch.setattr(settings, "AUTH_VERIFY_MODE", "local")
+    # ローカルで検証できない (未対応のアルゴリズム) トークンは Supabase に問い合わせる
+    token = jwt.encode({"sub": "user-1"}, None, algorithm="none")
+
+    security.authenticate(token)
+    security.authenticate(token)
+
+    assert len(remote_calls) == 2
+    assert len(security.token_cache) == 0
@@ -0,0 +1,63 @@
+import threading
+import uuid
+
+from benchmarks import pg as bench_pg
+
+USER_ID = str(uuid.uuid4())
+
+
+def insert_images(pg, n):
+    rows = pg.execute(
+        "insert into public.images (user_id, image_url, location_status) "
+        "select %s, 'http://test/' || g, 'NO_GPS' from generate_series(1, %s) g returning id",
+        (USER_ID, n),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def set_tags(conn, image_id, names):
+    (tags,) = conn.execute("select public.set_image_tags(%s, %s)", (image_id, names)).fetchone()
+    return tags
+
+
+def test_replaces_tags_with_trimmed_unique_names(pg):
+    (image_id,) = insert_images(pg, 1)
+    assert [tag["name"] for tag in set_tags(pg, image_id, ["sea", " sky ", "sea", ""])] == ["sea", "sky"]
+    assert [tag["name"] for tag in set_tags(pg, image_id, ["sky", "mountain"])] == ["mountain", "sky"]
+    (links,) = pg.execute("select count(*) from public.image_tags where image_id = %s", (image_id,)).fetchone()
+    assert links == 2
+    assert set_tags(pg, image_id, []) == []
+
+
+def test_concurrent_updates_with_the_same_new_tags(pg, pg_dsn):
+    """同じ新規タグ名を複数の接続から同時に設定しても、失敗も重複タグも出ない"""
+    threads, n_tags = 8, 50
+    image_ids = insert_images(pg, threads)
+    names = [f"race-{i}" for i in range(n_tags)]
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def worker(image_id):
+        conn = bench_pg.connect(pg_dsn)
+        try:
+            barrier.wait()
+            set_tags(conn, image_id, names)
+        except Exception as e:  # noqa: BLE001 - スレッド内の例外をテスト側で検証する
+            errors.append(repr(e))
+        finally:
+            conn.close()
+
+    workers = [threading.Thread(target=worker, args=(image_id,)) for image_id in image_ids]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+    assert errors == []
+    (created,) = pg.execute("select count(*) from public.tags where name = any(%s)", (names,)).fetchone()
+    (links,) = pg.execute(
+        "select count(*) from public.image_tags it join public.tags t on t.id = it.tag_id where t.name = any(%s)",
+        (names,),
+    ).fetchone()
+    assert created == n_tags
+    assert links == n_tags * threads
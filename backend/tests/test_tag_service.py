@@ -0,0 +1,29 @@
+import asyncio
+
+from app.core.config import settings
+from app.services import tag_service
+
+
+def test_user_index_is_rebuilt_after_register_tags(monkeypatch):
+    # 読み取りキャッシュが無効 (response_cache の世代番号が変わらない) でも作り直されること
+    monkeypatch.setattr(settings, "READ_CACHE_ENABLED", False)
+    usage = [{"id": 1, "name": "sea", "count": 3}]
+    calls = []
+
+    async def list_user_tag_usage(user_id):
+        calls.append(user_id)
+        return list(usage)
+
+    monkeypatch.setattr(tag_service.tag_repository, "list_user_tag_usage", list_user_tag_usage)
+
+    def suggest(prefix):
+        return asyncio.run(tag_service.suggest_for_user("user-1", prefix, 10))
+
+    assert [tag["name"] for tag in suggest("s")] == ["sea"]
+    assert [tag["name"] for tag in suggest("s")] == ["sea"]
+    assert len(calls) == 1
+
+    usage.append({"id": 2, "name": "sky", "count": 5})
+    tag_service.register_tags("user-1", [{"id": 2, "name": "sky"}])
+    assert [tag["name"] for tag in suggest("s")] == ["sky", "sea"]
+    assert len(calls) == 2
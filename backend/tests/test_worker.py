@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.worker import __main__ as worker
+from app.worker import queue
+
+
+class _Stop(Exception):
+    pass
+
+
+def test_consume_survives_claim_errors(monkeypatch):
+    claims = []
+    sleeps = []
+
+    async def claim(job_type, limit):
+        claims.append(job_type)
+        if len(claims) < 3:
+            raise ConnectionError("database unavailable")
+        return []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 3:
+            raise _Stop
+
+    monkeypatch.setattr(queue, "claim", claim)
+    monkeypatch.setattr(worker.asyncio, "sleep", sleep)
+    monkeypatch.setattr(settings, "WORKER_POLL_INTERVAL_SECONDS", 1.0)
+
+    with pytest.raises(_Stop):
+        asyncio.run(worker._consume("thumbnails", worker.WorkerMetrics()))
+
+    # 取得に失敗している間は間隔を広げ、成功したら通常のポーリング間隔に戻る
+    assert claims == ["thumbnails"] * 3
+    assert sleeps == [1.0, 2.0, 1.0]